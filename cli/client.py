@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Thin `ai` client for the llmcui daemon (runners/daemon.py).
+
+Forwards argv, the working directory and (for `ai batch`) piped stdin
+over a Unix socket and streams stdout/stderr back; the exit code is the
+daemon's. Imports nothing beyond the standard library's basics, so
+dispatch costs only interpreter start-up. Without a running daemon, or for the interactive
+menu, the request runs in this process like `ai`.
+
+Wire format, both directions: frames of one kind byte, a 4-byte
+big-endian length and the payload.
+"""
+import os
+import socket
+import struct
+import sys
+
+FRAME = struct.Struct("!cI")
+NEEDS_TTY = 75      # mirrors cli.main.NEEDS_TTY
+STDIN_CHUNK = 1 << 16
+
+
+def socket_path():
+    root = os.environ.get("LLMCUI_ROOT") or os.path.expanduser("~/.llmcui")
+    return os.environ.get("LLMCUI_SOCKET") or os.path.join(root, "daemon.sock")
+
+
+def send_frame(sock, kind: bytes, payload: bytes = b""):
+    sock.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+
+def _read_exact(rfile, n):
+    data = rfile.read(n)
+    if len(data) < n:
+        return None
+    return data
+
+
+def recv_frame(rfile):
+    """(kind, payload), or (None, None) when the peer closed the stream."""
+    header = _read_exact(rfile, FRAME.size)
+    if header is None:
+        return None, None
+    kind, length = FRAME.unpack(header)
+    payload = _read_exact(rfile, length) if length else b""
+    if payload is None:
+        return None, None
+    return kind, payload
+
+
+# options of `ai batch` that take a value (the next token)
+BATCH_VALUE_OPTIONS = ("-o", "--output", "-j", "--concurrency", "-p", "--project",
+                       "--commit-every")
+
+
+def reads_stdin(argv):
+    """
+    Only `ai batch` without an input file reads stdin; anything else must
+    leave it alone (think `while read l; do aic "$l"; done`).
+    """
+    if argv[:1] != ["batch"]:
+        return False
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in BATCH_VALUE_OPTIONS:
+            next(args, None)
+        elif arg == "-" or not arg.startswith("-"):
+            return arg == "-"
+    return True
+
+
+def _run_locally(argv):
+    from cli.main import main as local_main
+
+    return local_main(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return _run_locally(argv)
+
+    with sock:
+        send_frame(sock, b"c", os.getcwd().encode("utf-8"))
+        send_frame(sock, b"a", "\0".join(argv).encode("utf-8"))
+        if reads_stdin(argv) and not sys.stdin.isatty():
+            stdin = sys.stdin.buffer if hasattr(sys.stdin, "buffer") else None
+            while stdin is not None:
+                chunk = stdin.read(STDIN_CHUNK)
+                if not chunk:
+                    break
+                send_frame(sock, b"i", chunk)
+        send_frame(sock, b".")
+
+        rfile = sock.makefile("rb")
+        while True:
+            kind, payload = recv_frame(rfile)
+            if kind is None:
+                print("ai: daemon closed the connection", file=sys.stderr)
+                return 1
+            if kind == b"x":
+                rc = int(payload or b"1")
+                break
+            stream = sys.stdout if kind == b"o" else sys.stderr
+            stream.write(payload.decode("utf-8", errors="replace"))
+            stream.flush()
+
+    if rc == NEEDS_TTY and sys.stdin.isatty():
+        return _run_locally(argv)  # the interactive menu needs this terminal
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 # cli/commands/admin.py
 
 import time
-import uuid
 from core.db.database import Database
 
 
@@ -18,6 +17,7 @@ def _create_chat_sql(db: Database, project_name: str) -> str:
         raise ValueError(f"Project not found: {project_name}")
 
     project_id = p["id"]
+    import uuid
     chat_id = "chat-" + uuid.uuid4().hex[:8]
     now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
@@ -32,6 +32,16 @@ def _create_chat_sql(db: Database, project_name: str) -> str:
     return chat_id
 
 
+def print_search_hits(hits):
+    if not hits:
+        print("No matches.")
+        return
+    for i, h in enumerate(hits):
+        who = "You" if h.role == "user" else "AI"
+        print(f"{i}. {h.project} / {h.chat_title} [{h.chat_id}] @ {h.ts} ({who})")
+        print(f"   {h.snippet}")
+
+
 def handle_admin_commands(args, db, project_svc, chat_svc) -> bool:
     """
     Executes admin commands and returns True if command was handled.
@@ -65,7 +75,7 @@ def handle_admin_commands(args, db, project_svc, chat_svc) -> bool:
 
         conn = db.connect()
         rows = conn.execute(
-            "SELECT id, title, created_at, last_used FROM chats "
+            "SELECT id, title, created_at, last_used, archived_at FROM chats "
             "WHERE project_id = (SELECT id FROM projects WHERE name = ?) "
             "ORDER BY last_used DESC",
             (project,)
@@ -78,8 +88,9 @@ def handle_admin_commands(args, db, project_svc, chat_svc) -> bool:
             print(f"Chats for project '{project}':")
             for r in rows:
                 title = r["title"] if r["title"] else "(untitled)"
+                archived = " | archived" if r["archived_at"] else ""
                 print(
-                    f"- {r['id']} | {title} | last used: {r['last_used']}"
+                    f"- {r['id']} | {title} | last used: {r['last_used']}{archived}"
                 )
 
         return True
@@ -129,5 +140,83 @@ def handle_admin_commands(args, db, project_svc, chat_svc) -> bool:
 
         return True
 
+    # ------------------------------
+    # LIST FILES (what -f selectors refer to)
+    # ------------------------------
+    if getattr(args, "list_files", None):
+        from core.services.file_index_service import FileIndexService
+
+        index = FileIndexService(db)
+        if args.list_files == ".":
+            for i, name in enumerate(index.list_files()):
+                print(f"{i}. {name}")
+        else:
+            try:
+                for path in index.select(args.list_files):
+                    print(path)
+            except ValueError as e:
+                print(f"Selector error: {e}")
+        return True
+
+    # ------------------------------
+    # SEARCH MESSAGES
+    # ------------------------------
+    if args.search:
+        from core.services.search_service import SearchService
+
+        hits = SearchService(db).search(args.search, project=args.project)
+        print_search_hits(hits)
+        return True
+
+    # ------------------------------
+    # RESPONSE CACHE STATS
+    # ------------------------------
+    if getattr(args, "cache_stats", False):
+        from core.services.response_cache import ResponseCache
+
+        stats = ResponseCache(db).stats()
+        asked = stats["hits"] + stats["misses"]
+        rate = f"{100 * stats['hits'] / asked:.0f}%" if asked else "n/a"
+        print(
+            f"Response cache: {stats['entries']} entries, "
+            f"{stats['hits']} hits, {stats['misses']} misses (hit rate {rate})"
+        )
+        return True
+
+    # ------------------------------
+    # ARCHIVE IDLE CHATS
+    # ------------------------------
+    if getattr(args, "archive", None) is not None:
+        from core.services.archive_service import ArchiveService, after_days
+        from core.services.settings_service import SettingsService
+
+        days = args.archive if args.archive >= 0 else after_days(SettingsService(db))
+        if days is None:
+            print("Archiving is off (archive.after_days); pass DAYS to archive anyway.")
+            return True
+        archive = ArchiveService(db)
+        moved = archive.archive_idle(days)
+        stats = archive.stats()
+        print(f"Archived {moved} chat(s) unused for {days} days.")
+        print(
+            f"Archive: {stats['chats']} chats, {stats['messages']} messages, "
+            f"{stats['stored_bytes']} bytes stored ({stats['raw_bytes']} uncompressed)"
+        )
+        return True
+
+    # ------------------------------
+    # COMPACT SUMMARY HISTORY
+    # ------------------------------
+    if getattr(args, "compact", False):
+        from core.services.retention_service import RetentionService
+
+        deleted = RetentionService(db).compact(vacuum=True)
+        print(
+            "Compacted: "
+            + ", ".join(f"{n} {table} rows" for table, n in deleted.items())
+            + " removed."
+        )
+        return True
+
     # No admin command matched → continue main
     return False
@@ -1,8 +1,9 @@
 # cli/commands/banner.py
 
-def show_status_banner(settings, db, project, chat_id):
+def show_status_banner(settings, db, project, chat_id, context_report=None):
     """
-    Print the status banner if enabled.
+    Print the status banner if enabled, with how the prompt's token
+    budget was spent when a context report is given.
     """
 
     if not settings.get_bool("show_status", False):
@@ -16,4 +17,6 @@ def show_status_banner(settings, db, project, chat_id):
     chat_title = row["title"] if row and row["title"] else "(untitled)"
 
     print(f"[project: {project} | {chat_title}]")
+    if context_report is not None:
+        print(f"[{context_report.summary()}]")
     print()
@@ -0,0 +1,259 @@
+# cli/commands/batch.py
+"""
+ai batch: run many prompts in one process.
+
+Input is JSONL (a file, or stdin when omitted or "-"), one object per line:
+    {"prompt": "...", "project": "p", "chat": "chat-1a2b3c4d", "id": "anything",
+     "attach": ["path", ...]}
+Only "prompt" is required. Results are written as JSONL in completion
+order, one line per input line.
+
+Prompts run on a thread pool of --concurrency workers. Items that share a
+chat run in input order so each sees the previous answer; different chats
+run in parallel. Messages are written by the main thread in group
+commits: every result that is ready is stored in one transaction.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_COMMIT_EVERY = 50
+
+
+def read_items(stream):
+    """[(line_no, item or None, error or None)] for the non-blank lines."""
+    items = []
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict) or not str(item.get("prompt") or "").strip():
+                raise ValueError('expected an object with a "prompt"')
+        except ValueError as e:
+            items.append((n, None, f"invalid input: {e}"))
+            continue
+        items.append((n, item, None))
+    return items
+
+
+def _groups(items, project_svc, chat_svc, default_project, new_chats):
+    """
+    Resolve each item's project and chat; group items by chat, in input
+    order. Archived chats are restored here, before any worker reads them.
+    """
+    from core.services.archive_service import ArchiveService
+
+    archive = ArchiveService(chat_svc.db)
+    groups, order = {}, []
+    for n, item, error in items:
+        if error is not None:
+            order.append([(n, item, None, None, error)])
+            continue
+        project = item.get("project") or default_project or project_svc.get_or_create_default()
+        project = project_svc.get_or_create(project)
+        chat = item.get("chat")
+        if not chat:
+            chat = chat_svc.force_new_chat(project) if new_chats else chat_svc.get_or_create_first(project)
+        entry = (n, item, project, chat, None)
+        if chat not in groups:
+            archive.ensure_hot(chat)
+            groups[chat] = [entry]
+            order.append(groups[chat])
+        else:
+            groups[chat].append(entry)
+    return order
+
+
+def _run_item(db, services, llm, n, item, project, chat):
+    from cli.commands.prompt_builder import build_prompt_with_report, resolve_attachments
+    from core.services.llm_backends import LLMError
+
+    project_svc, chat_svc, msg_svc, settings = services
+    args = SimpleNamespace(
+        prompt=item["prompt"], filemode=False, selector=None, attach=item.get("attach"),
+    )
+    result = {"line": n, "id": item.get("id"), "project": project, "chat": chat}
+
+    start = time.perf_counter()
+    attachments = resolve_attachments(args, db, settings)
+    prompt, _ = build_prompt_with_report(
+        args, db, project, chat, project_svc, chat_svc,
+        msg_svc=msg_svc, settings=settings, attachments=attachments,
+    )
+    try:
+        response = "".join(llm.stream_prompt(prompt)).strip()
+        error = None
+    except LLMError as e:
+        response, error = None, str(e)
+
+    metrics = llm.last_metrics
+    result.update(
+        response=response,
+        error=error,
+        latency_s=round(time.perf_counter() - start, 3),
+        ttft_s=round(metrics.ttft, 3) if metrics and metrics.ttft is not None else None,
+    )
+    messages = [(chat, "user", item["prompt"], attachments[0])]
+    if response is not None:
+        messages.append((chat, "assistant", response, ()))
+    return result, messages
+
+
+def run_batch(db, items, out, concurrency=DEFAULT_CONCURRENCY,
+              commit_every=DEFAULT_COMMIT_EVERY, project=None, new_chats=False,
+              make_llm=None, use_cache=True):
+    """
+    Run parsed items (see read_items) and write one JSON line per item to
+    out. Returns (succeeded, failed, chats touched).
+    """
+    from core.services.chat_service import ChatService
+    from core.services.llm_service import LLMService
+    from core.services.message_service import MessageService
+    from core.services.project_service import ProjectService
+    from core.services.settings_service import SettingsService
+
+    from core.services.response_cache import ResponseCache
+
+    services = (ProjectService(db), ChatService(db), MessageService(db), SettingsService(db))
+    cache = ResponseCache.from_settings(db, services[3]) if use_cache else None
+    make_llm = make_llm or (lambda: LLMService(cache=cache))
+    groups = _groups(items, services[0], services[1], project, new_chats)
+
+    # workers put (result, messages, committed); the main thread stores the
+    # messages and sets committed so the chat's next item sees them
+    ready = queue.Queue()
+
+    cancelled = threading.Event()
+
+    def run_group(entries):
+        llm = None  # one per group: last_metrics describes its latest call
+        for n, item, proj, chat, error in entries:
+            if cancelled.is_set():
+                return
+            if error is not None:
+                result, messages = {"line": n, "id": None, "error": error}, []
+            else:
+                try:
+                    llm = llm or make_llm()
+                    result, messages = _run_item(db, services, llm, n, item, proj, chat)
+                except Exception as e:
+                    result = {"line": n, "id": item.get("id"), "project": proj,
+                              "chat": chat, "error": f"{e.__class__.__name__}: {e}"}
+                    messages = []
+            committed = threading.Event()
+            ready.put((result, messages, committed))
+            committed.wait()
+
+    ok = failed = 0
+    chats = set()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run_group, g) for g in groups]
+        remaining = sum(len(g) for g in groups)
+        batch = []
+        try:
+            while remaining:
+                batch = [ready.get()]
+                while len(batch) < commit_every:
+                    try:
+                        batch.append(ready.get_nowait())
+                    except queue.Empty:
+                        break
+
+                services[2].add_messages([m for _, messages, _ in batch for m in messages])
+                for result, messages, committed in batch:
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    if result.get("error"):
+                        failed += 1
+                    else:
+                        ok += 1
+                    if messages:
+                        chats.add((result["project"], result["chat"]))
+                    committed.set()
+                out.flush()
+                remaining -= len(batch)
+        except BaseException:
+            # a failed write must not leave workers waiting on a commit
+            # that will never come: release them and let them stop
+            cancelled.set()
+            for _, _, committed in batch:
+                committed.set()
+            while not all(f.done() for f in futures):
+                try:
+                    ready.get(timeout=0.1)[2].set()
+                except queue.Empty:
+                    pass
+            raise
+
+        for f in futures:
+            f.result()
+    return ok, failed, chats
+
+
+def batch_main(argv, db_path):
+    parser = argparse.ArgumentParser(prog="ai batch", description="Run prompts from JSONL")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file (default: stdin)")
+    parser.add_argument("-o", "--output", help="write results here (default: stdout)")
+    parser.add_argument("-j", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"prompts in flight at once (default {DEFAULT_CONCURRENCY})")
+    parser.add_argument("-p", "--project", help="project for items without one")
+    parser.add_argument("--new-chat", action="store_true",
+                        help="start a new chat for every item without a chat")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="most results stored per transaction")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the model, even if the response cache is on")
+    args = parser.parse_args(argv)
+
+    from core.db.database import Database, init_db
+
+    init_db(db_path)
+    db = Database(db_path)
+
+    if args.input == "-":
+        items = read_items(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as fh:
+            items = read_items(fh)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        ok, failed, chats = run_batch(
+            db, items, out,
+            concurrency=args.concurrency,
+            commit_every=max(1, args.commit_every),
+            project=args.project,
+            new_chats=args.new_chat,
+            use_cache=not args.no_cache,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    _enqueue_distill(db, db_path, chats)
+    print(f"batch: {ok} ok, {failed} failed", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+def _enqueue_distill(db, db_path, chats):
+    import os
+
+    if not chats or "PYTEST_CURRENT_TEST" in os.environ:
+        return
+    try:
+        from core.services.job_service import JobService
+        from runners.distill import JOB_KIND, ensure_worker
+
+        jobs = JobService(db)
+        for project, chat in sorted(chats):
+            jobs.enqueue(JOB_KIND, project, chat)
+        ensure_worker(db_path)
+    except Exception as e:
+        print(f"batch: distill enqueue failed: {e}", file=sys.stderr)
@@ -1,35 +1,72 @@
 # cli/commands/prompt_builder.py
 
-import os
+from core.services.attachment_service import AttachmentService
+from core.services.context_service import ContextAssembler, ContextSnapshotService
+from core.services.embedding_service import EmbeddingService
+from core.services.file_index_service import FileIndexService
+from core.utils.ingest import MAX_FILE_BYTES, MAX_TOTAL_BYTES, BinaryFileError, truncate_middle
+from core.utils.tokens import (
+    CHARS_PER_TOKEN, FALLBACK_CONTEXT_WINDOW, OUTPUT_RESERVE, context_budget, context_window,
+    current_model,
+)
+
+MAX_SELECTED_FILES = 200
+
+RESPONSE_STYLE_GUIDE = """
+### RESPONSE_STYLE_GUIDE
+- Provide the best possible direct answer to the user's request.
+- Do NOT ask clarifying questions unless the user explicitly asks for options.
+- Produce full, detailed, high-quality answers when the user expects real content.
+- Only produce code if the user explicitly requests code.
+- When code is requested, output full runnable code.
+- Avoid placeholders like “sources: to be filled”.
+- If the user requests articles, include actual sources (as text, not URLs if model cannot browse).
+- Do not be excessively concise; respond naturally according to user request.
+"""
 
 
-def build_prompt(args, db, project, chat_id, project_svc, chat_svc):
+def build_prompt(args, db, project, chat_id, project_svc, chat_svc,
+                 msg_svc=None, settings=None, attachments=None):
     """
     Build the full LLM prompt, cleanly separated from main.
     """
+    prompt, _ = build_prompt_with_report(
+        args, db, project, chat_id, project_svc, chat_svc,
+        msg_svc=msg_svc, settings=settings, attachments=attachments,
+    )
+    return prompt
 
-    project_summary = project_svc.get_distilled_project(project)
-    chat_summary = chat_svc.get_distilled_chat(chat_id)
 
-    parts = []
+def build_prompt_with_report(args, db, project, chat_id, project_svc, chat_svc,
+                             msg_svc=None, settings=None, attachments=None):
+    """
+    Build the prompt within the model's token budget.
+    Returns (prompt, ContextReport).
 
-    # -----------------------------
-    # PROJECT SUMMARY
-    # -----------------------------
-    if project_summary:
-        parts.append(f"[PROJECT_CONTEXT]\n{project_summary}\n")
+    attachments: (attachments, errors) from resolve_attachments(); resolved
+    from args when omitted. File content comes from the attachment store,
+    capped in total by file_budget().
 
-    # -----------------------------
-    # CHAT SUMMARY
-    # -----------------------------
-    if chat_summary:
-        parts.append(f"[CHAT_CONTEXT]\n{chat_summary}\n")
+    The current message, style guide and selected files are always included;
+    summaries, recent turns (when msg_svc is given) and past messages
+    related to the current one fill what is left.
+    """
+    model = current_model()
+    assembler = ContextAssembler(
+        project_svc, chat_svc, msg_svc,
+        budget=context_budget(model, settings),
+        model=model,
+        snapshots=ContextSnapshotService(db, project_svc, chat_svc, msg_svc),
+        retriever=EmbeddingService(db),
+    )
+
+    required = []
 
     # -----------------------------
     # MAIN USER MESSAGE
     # -----------------------------
-    parts.append("### CURRENT_USER_MESSAGE")
-    parts.append(args.prompt)
+    required.append(("message", "### CURRENT_USER_MESSAGE"))
+    required.append(("message", args.prompt))
 
     # -----------------------------
     # RESPONSE BEHAVIOR RULES
@@ -40,46 +77,104 @@ def build_prompt(args, db, project, chat_id, project_svc, chat_svc):
     # - attempts to get confirmation before answering
     # - overly concise / code-oriented replies
     #
-    parts.append(
-        """
-### RESPONSE_STYLE_GUIDE
-- Provide the best possible direct answer to the user's request.
-- Do NOT ask clarifying questions unless the user explicitly asks for options.
-- Produce full, detailed, high-quality answers when the user expects real content.
-- Only produce code if the user explicitly requests code.
-- When code is requested, output full runnable code.
-- Avoid placeholders like “sources: to be filled”.
-- If the user requests articles, include actual sources (as text, not URLs if model cannot browse).
-- Do not be excessively concise; respond naturally according to user request.
-"""
+    required.append(("style", RESPONSE_STYLE_GUIDE))
+
+    if attachments is None:
+        attachments = resolve_attachments(args, db, settings)
+    limit = file_budget(settings, model)
+    for part in _file_parts(db, *attachments, limit):
+        required.append(("files", part))
+
+    # -----------------------------
+    # PROJECT / CHAT SUMMARIES + RELATED + RECENT TURNS (budgeted)
+    # -----------------------------
+    context, required_parts, report = assembler.assemble(
+        project, chat_id, required, query=args.prompt
     )
 
+    return "\n\n".join(context + required_parts), report
+
+
+def selected_files(args, db=None):
+    """
+    Paths the prompt should carry: --attach paths, then the files picked by
+    the --filemode selector (see FileIndexService.select; db caches the
+    directory listings). Raises ValueError for a selector matching nothing.
+    """
+    paths = list(getattr(args, "attach", None) or [])
+
     # -----------------------------
     # FILE SELECTION MODE
     # -----------------------------
     if args.filemode and args.selector:
-        try:
-            sel = args.selector
+        paths += FileIndexService(db).select(args.selector)
 
-            if "-" in sel:
-                a, b = sel.split("-", 1)
-                files = range(int(a), int(b) + 1)
-            else:
-                files = [int(x) for x in sel.split(",")]
+    return paths
 
-            cwd_files = [
-                f for f in os.listdir(".")
-                if os.path.isfile(f)
-            ]
 
-            for idx in files:
-                if 0 <= idx < len(cwd_files):
-                    fname = cwd_files[idx]
-                    with open(fname, "r", errors="ignore") as fh:
-                        parts.append(f"### FILE: {fname}\n{fh.read()}\n")
+def _setting_int(settings, key, default):
+    raw = settings.get(key) if settings is not None else None
+    try:
+        return int(raw) if raw is not None else default
+    except ValueError:
+        return default
 
-        except Exception as ex:
-            parts.append(f"[FILE_SELECTION_ERROR] {ex}")
 
-    return "\n\n".join(parts)
+def resolve_attachments(args, db, settings=None):
+    """
+    Store the selected files in the attachment store (read in parallel,
+    at most files.max_file_bytes each; binaries are skipped).
+    Returns (attachments, errors); errors are prompt-ready notes.
+    """
+    try:
+        paths = selected_files(args, db)
+    except Exception as ex:
+        return [], [f"[FILE_SELECTION_ERROR] {ex}"]
+
+    errors = []
+    if len(paths) > MAX_SELECTED_FILES:
+        errors.append(
+            f"[FILE_SELECTION_ERROR] {len(paths)} files selected; "
+            f"only the first {MAX_SELECTED_FILES} are included"
+        )
+        paths = paths[:MAX_SELECTED_FILES]
+
+    max_bytes = _setting_int(settings, "files.max_file_bytes", MAX_FILE_BYTES)
+    attachments = []
+    for path, result in AttachmentService(db).add_files(paths, max_bytes):
+        if isinstance(result, BinaryFileError):
+            errors.append(f"[FILE_SKIPPED] {path}: {result}")
+        elif isinstance(result, OSError):
+            errors.append(f"[FILE_SELECTION_ERROR] {path}: {result.strerror or result}")
+        else:
+            attachments.append(result)
+    return attachments, errors
+
+
+def file_budget(settings=None, model=None):
+    """
+    Characters all files of one prompt may take: files.max_total_bytes,
+    and never more than half of the model's context window, taken as
+    FALLBACK_CONTEXT_WINDOW when the model is not known. Files are required
+    parts, so the (much smaller) context budget for summaries and history
+    does not limit them.
+    """
+    limit = _setting_int(settings, "files.max_total_bytes", MAX_TOTAL_BYTES)
+    window = context_window(model) or FALLBACK_CONTEXT_WINDOW
+    limit = min(limit, (window - OUTPUT_RESERVE) * CHARS_PER_TOKEN // 2)
+    return max(limit, 0)
+
 
+def _file_parts(db, attachments, errors, limit):
+    """
+    Yield one "### FILE" part per attachment, content read back from the
+    store. Each file gets an equal share of what is left of limit; text
+    over its share keeps head and tail.
+    """
+    store = AttachmentService(db)
+    for i, a in enumerate(attachments):
+        share = limit // (len(attachments) - i)
+        text, _ = truncate_middle(store.text(a.hash), share)
+        limit -= min(len(text), share)
+        yield f"### FILE: {a.name}\n{text}\n"
+    yield from errors
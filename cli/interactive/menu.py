@@ -1,5 +1,6 @@
 # cli/interactive/menu.py
 import os
+import sys
 import time
 
 from core.services.project_service import ProjectService
@@ -82,7 +83,7 @@ def select_chat(db, chat_svc: ChatService, project: str) -> str:
     conn = db.connect()
     rows = conn.execute(
         """
-        SELECT chats.id, chats.title, chats.last_used
+        SELECT chats.id, chats.title, chats.last_used, chats.archived_at
         FROM chats
         JOIN projects ON chats.project_id = projects.id
         WHERE projects.name = ?
@@ -109,7 +110,8 @@ def select_chat(db, chat_svc: ChatService, project: str) -> str:
 
     for i, r in enumerate(rows):
         title = r["title"] or "(untitled)"
-        print(f"{i}. {title}   [{r['id']}]   last used: {r['last_used']}")
+        archived = "   (archived)" if r["archived_at"] else ""
+        print(f"{i}. {title}   [{r['id']}]   last used: {r['last_used']}{archived}")
 
     print("n. Create new chat")
     print("x. Cancel")
@@ -132,23 +134,147 @@ def select_chat(db, chat_svc: ChatService, project: str) -> str:
 
 
 # -----------------------------------------------------------
-# VIEW FULL CHAT HISTORY
+# CHAT HISTORY (paginated, newest page first)
 # -----------------------------------------------------------
-def show_chat_history(msg_svc: MessageService, chat_id: str):
+HISTORY_PAGE_SIZE = 10
+PREVIEW_CHARS = 400
+PREVIEW_LINES = 8
+
+
+def _preview(text: str):
+    """(preview, truncated) for one message body."""
+    text = text or ""
+    lines = text.splitlines()
+    if len(text) <= PREVIEW_CHARS and len(lines) <= PREVIEW_LINES:
+        return text, False
+    return "\n".join(lines[:PREVIEW_LINES])[:PREVIEW_CHARS].rstrip() + " …", True
+
+
+def _format_message(r, text=None, label="") -> str:
+    role = "You" if r["role"] == "user" else "AI"
+    body = r["content"] if text is None else text
+    return f"\n{label}[{role} @ {r['ts']}]\n{body}\n" + "-" * 40 + "\n"
+
+
+def show_chat_history(msg_svc: MessageService, chat_id: str,
+                      page_size: int = HISTORY_PAGE_SIZE):
+    """
+    Show the newest page of a chat with truncated previews. When there is
+    more to see, offer older/newer pages, expanding a message and paging
+    the whole chat; Enter returns.
+    """
     print("\n=== Chat History ===")
-    rows = msg_svc.get_messages(chat_id)
+    newer = []          # before_id cursors of the pages we paged away from
+    before = None
 
-    if not rows:
-        print("(empty)")
+    while True:
+        rows = msg_svc.page(chat_id, before_id=before, limit=page_size + 1)
+        has_older = len(rows) > page_size
+        rows = list(reversed(rows[:page_size]))  # chronological on screen
+
+        if not rows:
+            print("(empty)")
+            return
+
+        truncated = False
+        for n, r in enumerate(rows, 1):
+            text, cut = _preview(r["content"])
+            truncated = truncated or cut
+            print(_format_message(r, text, label=f"#{n} "), end="")
+
+        if not (has_older or newer or truncated):
+            return
+
+        options = []
+        if has_older:
+            options.append("o → older")
+        if newer:
+            options.append("n → newer")
+        options += ["e N → expand #N", "p → open chat in pager", "Enter → done"]
+        print("   ".join(options))
+
+        while True:
+            sel = ask("\nHistory: ").lower()
+            if sel in ("", "x"):
+                return
+            if sel == "o" and has_older:
+                newer.append(before)
+                before = rows[0]["id"]
+                break
+            if sel == "n" and newer:
+                before = newer.pop()
+                break
+            if sel == "p":
+                page_chat(msg_svc, chat_id)
+                continue
+            if sel.startswith("e") and sel[1:].strip().isdigit():
+                n = int(sel[1:].strip())
+                if 1 <= n <= len(rows):
+                    print(_format_message(rows[n - 1], label=f"#{n} "), end="")
+                    continue
+            print("Invalid choice.")
+
+
+def page_chat(msg_svc: MessageService, chat_id: str):
+    """
+    Stream the full chat, oldest first, into $PAGER (default less -R).
+    Messages are fetched page by page as the pager reads them.
+    """
+    chunks = (_format_message(r) for r in msg_svc.iter_messages(chat_id))
+
+    if not sys.stdout.isatty():
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+        return
+
+    import shlex
+    import subprocess
+
+    try:
+        pager = subprocess.Popen(
+            shlex.split(os.environ.get("PAGER") or "less -R"),
+            stdin=subprocess.PIPE, text=True, encoding="utf-8",
+        )
+    except OSError:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
         return
 
-    for r in rows:
-        role = "You" if r["role"] == "user" else "AI"
-        ts = r["ts"]
-        content = r["content"]
-        print(f"\n[{role} @ {ts}]")
-        print(content)
-        print("-" * 40)
+    try:
+        for chunk in chunks:
+            pager.stdin.write(chunk)
+        pager.stdin.close()
+    except BrokenPipeError:
+        pass  # the user quit the pager early
+    pager.wait()
+
+
+# -----------------------------------------------------------
+# FULL-TEXT SEARCH
+# -----------------------------------------------------------
+def search_messages(db):
+    """Search all messages; returns (project, chat_id) of a picked hit or None."""
+    from cli.commands.admin import print_search_hits
+    from core.services.search_service import SearchService
+
+    query = ask("Search for: ")
+    if not query:
+        return None
+
+    hits = SearchService(db).search(query)
+    print(f"\n=== Results for '{query}' ===")
+    print_search_hits(hits)
+    if not hits:
+        return None
+
+    while True:
+        sel = ask("\nOpen result (Enter to go back): ").lower()
+        if sel in ("", "x"):
+            return None
+        if sel.isdigit() and 0 <= int(sel) < len(hits):
+            hit = hits[int(sel)]
+            return hit.project, hit.chat_id
+        print("Invalid choice.")
 
 
 # -----------------------------------------------------------
@@ -162,6 +288,7 @@ def interactive_entry(db, project_svc, chat_svc, msg_svc, llm, settings):
     print("  0 → Start a new project")
     print("  1 → Browse existing projects")
     print("  2 → Use default project")
+    print("  s → Search messages")
     print("  x → Exit")
     print("========================================")
 
@@ -197,6 +324,7 @@ def interactive_entry(db, project_svc, chat_svc, msg_svc, llm, settings):
             chat = select_chat(db, chat_svc, project)
             if not chat:
                 continue
+            restore_chat(db, chat)
 
             show_chat_history(msg_svc, chat)
 
@@ -223,14 +351,37 @@ def interactive_entry(db, project_svc, chat_svc, msg_svc, llm, settings):
             project = project_svc.get_or_create_default()
             chat = chat_svc.get_or_create_first(project)
 
+            restore_chat(db, chat)
             show_chat_history(msg_svc, chat)
             prompt = ask("Your message: ")
 
             return _return_interactive_choice(project, chat, prompt)
 
+        # ----------------------------------------
+        # SEARCH ALL MESSAGES
+        # ----------------------------------------
+        if choice == "s":
+            picked = search_messages(db)
+            if not picked:
+                continue
+
+            project, chat = picked
+            restore_chat(db, chat)
+            show_chat_history(msg_svc, chat)
+            prompt = ask("Your message: ")
+            return _return_interactive_choice(project, chat, prompt)
+
         print("Invalid choice. Try again.")
 
 
+def restore_chat(db, chat_id):
+    """Bring an archived chat back before its history is shown."""
+    from core.services.archive_service import ArchiveService
+
+    if ArchiveService(db).ensure_hot(chat_id):
+        print("(restored from the archive)")
+
+
 # -----------------------------------------------------------
 # Return interactive choice back to main.py
 # -----------------------------------------------------------
@@ -22,6 +22,7 @@ def post_response_menu(
             interactive_project
             interactive_chat
             interactive_prompt
+            interactive_attachments (optional: file paths to send)
     """
 
     while True:
@@ -50,18 +51,15 @@ def post_response_menu(
                 print("Invalid file path.")
                 continue
 
-            with open(path, "r", errors="ignore") as fh:
-                content = fh.read()
-
+            # stored once in the attachment store when the prompt is built
             question = M.ask("Your question about this file: ")
-            combined = f"### FILE: {path}\n{content}\n\n{question}"
-
-            return rerun_llm(current_project, current_chat, combined)
+            return rerun_llm(current_project, current_chat, question, attachments=[path])
 
         # SWITCH CHAT
         if choice == "c":
             chat = M.select_chat(db, chat_svc, current_project)
             if chat:
+                M.restore_chat(db, chat)
                 M.show_chat_history(msg_svc, chat)
                 prompt = M.ask("Your message: ")
                 return rerun_llm(current_project, chat, prompt)
@@ -73,6 +71,7 @@ def post_response_menu(
             if proj:
                 chat = M.select_chat(db, chat_svc, proj)
                 if chat:
+                    M.restore_chat(db, chat)
                     M.show_chat_history(msg_svc, chat)
                     prompt = M.ask("Your message: ")
                     return rerun_llm(proj, chat, prompt)
@@ -81,10 +80,13 @@ def post_response_menu(
         print("Invalid choice.")
 
 
-def rerun_llm(project, chat_id, prompt):
+def rerun_llm(project, chat_id, prompt, attachments=None):
     """Return dict matching test expectations."""
-    return {
+    result = {
         "interactive_project": project,
         "interactive_chat": chat_id,
         "interactive_prompt": prompt,
     }
+    if attachments:
+        result["interactive_attachments"] = attachments
+    return result
@@ -1,31 +1,21 @@
 #!/usr/bin/env python3
 import argparse
 import os
-import subprocess
+import sys
 import time
-import traceback
 
-from core.db.database import Database, init_db
-from core.services.project_service import ProjectService
-from core.services.chat_service import ChatService
-from core.services.message_service import MessageService
-from core.services.llm_service import LLMService
-from core.services.settings_service import SettingsService
-from cli.commands.admin import handle_admin_commands
-from cli.commands.prompt_builder import build_prompt
-from cli.commands.banner import show_status_banner
-from cli.interactive.menu import interactive_entry
-from cli.interactive.post_response import post_response_menu
+# Startup budget: only argparse/os/sys/time load at import. Services, menus,
+# the LLM client and subprocess are imported inside the code paths that
+# need them, so admin commands such as --list-projects stay cheap.
 
 
 ROOT = os.path.expanduser("~/.llmcui")
-os.makedirs(ROOT, exist_ok=True)
 os.environ.setdefault("LLMCUI_ROOT", ROOT)
 
 DB_PATH = os.path.join(ROOT, "ai.db")
 
 
-def ensure_first_run_status_on(settings: SettingsService):
+def ensure_first_run_status_on(settings):
     if settings.get("show_status") is None:
         settings.set("show_status", "true")
 
@@ -34,7 +24,7 @@ def running_under_pytest() -> bool:
     return "PYTEST_CURRENT_TEST" in os.environ
 
 
-def _log_debug(db: Database, chat_id: str, info: str):
+def _log_debug(db, chat_id: str, info: str):
     try:
         conn = db.connect()
         cur = conn.cursor()
@@ -48,49 +38,121 @@ def _log_debug(db: Database, chat_id: str, info: str):
         pass
 
 
-def main(argv=None):
+class _HelpFormatter(argparse.HelpFormatter):
+    """
+    argparse builds a formatter for every add_argument() and each one
+    imports shutil just to read the terminal width; ask os directly.
+    """
+
+    def __init__(self, prog, width=None, **kwargs):
+        if width is None:
+            try:
+                width = int(os.environ["COLUMNS"])
+            except (KeyError, ValueError):
+                try:
+                    width = os.get_terminal_size().columns
+                except OSError:
+                    width = 80
+            width -= 2
+        super().__init__(prog, width=width, **kwargs)
+
+
+# exit code when a request needs a terminal (interactive menu) but has none
+NEEDS_TTY = 75
+
+
+def main(argv=None, interactive=True):
+    """
+    Entry point. interactive=False (the daemon) answers a single prompt and
+    never opens a menu.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["batch"]:
+        from cli.commands.batch import batch_main
+
+        return batch_main(argv[1:], DB_PATH)
+
     parser = argparse.ArgumentParser(
         prog="ai",
-        description="llmcui MVP wrapper for llm"
+        description="llmcui MVP wrapper for llm",
+        epilog="Run many prompts from JSONL: ai batch --help",
+        formatter_class=_HelpFormatter,
     )
 
     parser.add_argument("-p", "--project", help="project name")
     parser.add_argument("-c", "--chat", help="chat id")
     parser.add_argument("-r", "--reset", action="store_true", help="reset chat")
     parser.add_argument("-f", "--filemode", action="store_true", help="file mode")
+    parser.add_argument("-a", "--attach", action="append", metavar="PATH",
+                        help="send a file with the prompt (repeatable)")
     parser.add_argument("--toggle-status", action="store_true", help="toggle banner")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the model, even if the response cache is on")
 
     parser.add_argument("--list-projects", action="store_true")
     parser.add_argument("--list-chats", action="store_true")
     parser.add_argument("--new-project")
     parser.add_argument("--new-chat", action="store_true")
+    parser.add_argument("--list-files", nargs="?", const=".", metavar="SELECTOR",
+                        help="list files (numbered) or what a file-mode selector picks")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="full-text search all messages (-p limits to one project)")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="show response cache entries and hit/miss counts")
+    parser.add_argument("--archive", nargs="?", type=int, const=-1, metavar="DAYS",
+                        help="move chats unused for DAYS (default: archive.after_days "
+                             "setting, else 90) to the archive database")
+    parser.add_argument("--compact", action="store_true",
+                        help="prune old summary versions and reclaim the space")
 
     parser.add_argument("prompt", nargs="?", help="prompt")
     parser.add_argument("selector", nargs="?", help="file selector")
 
     args = parser.parse_args(argv)
 
+    from core.db.database import Database, init_db
+    from core.services.project_service import ProjectService
+    from core.services.chat_service import ChatService
+
     init_db(DB_PATH)
     db = Database(DB_PATH)
     project_svc = ProjectService(db)
     chat_svc = ChatService(db)
+
+    if (
+        args.list_projects
+        or args.list_chats
+        or args.new_project
+        or args.new_chat
+        or args.search
+        or args.list_files
+        or args.cache_stats
+        or args.archive is not None
+        or args.compact
+    ):
+        from cli.commands.admin import handle_admin_commands
+
+        if handle_admin_commands(args, db, project_svc, chat_svc):
+            return 0
+
+    from core.services.message_service import MessageService
+    from core.services.llm_service import LLMService
+    from core.services.settings_service import SettingsService
+
+    from core.services.response_cache import ResponseCache
+
     msg_svc = MessageService(db)
-    llm = LLMService()
     settings = SettingsService(db)
+    llm = LLMService(cache=None if args.no_cache else ResponseCache.from_settings(db, settings))
 
     ensure_first_run_status_on(settings)
 
-    if handle_admin_commands(args, db, project_svc, chat_svc):
-        return 0
+    if not args.prompt and not args.toggle_status:
+        if not interactive:
+            return NEEDS_TTY
+
+        from cli.interactive.menu import interactive_entry
 
-    if (
-        not args.prompt
-        and not args.list_projects
-        and not args.list_chats
-        and not args.new_project
-        and not args.new_chat
-        and not args.toggle_status
-    ):
         inter = interactive_entry(
             db, project_svc, chat_svc, msg_svc, llm, settings
         )
@@ -105,88 +167,241 @@ def main(argv=None):
         parser.print_usage()
         return 1
 
-    project = args.project or project_svc.get_or_create_default()
-    chat_id = args.chat or chat_svc.get_or_create_first(project)
+    session = Session(db, project_svc, chat_svc, msg_svc, llm, settings)
+    try:
+        return run_session(session, args, interactive)
+    finally:
+        session.close()
+
+
+# -----------------------------------------------------------
+# Session: one process, many turns
+# -----------------------------------------------------------
+class Session:
+    """
+    What every turn needs, created once per process: the database, the
+    services, settings and the LLM backend stay warm across turns. While
+    the user reads an answer and types the next message, prefetch()
+    rebuilds the chat's materialized context in the background.
+    """
+
+    def __init__(self, db, project_svc, chat_svc, msg_svc, llm, settings):
+        self.db = db
+        self.project_svc = project_svc
+        self.chat_svc = chat_svc
+        self.msg_svc = msg_svc
+        self.llm = llm
+        self.settings = settings
+        self._prefetcher = None
+        self._pending = None
+
+    def prefetch(self, project, chat_id):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if self._prefetcher is None:
+            # one long-lived thread, so it keeps its pooled connection
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-prefetch")
+        self._pending = self._prefetcher.submit(self._warm, project, chat_id)
+
+    def _warm(self, project, chat_id):
+        from core.services.context_service import ContextSnapshotService
+        from core.utils.tokens import current_model, estimate_tokens
+
+        ContextSnapshotService(
+            self.db, self.project_svc, self.chat_svc, self.msg_svc
+        ).load(project, chat_id)
+        estimate_tokens("warm up", current_model())  # loads the tokenizer once
+
+    def settle(self):
+        """Wait for a running prefetch. A failed prefetch only costs time."""
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        try:
+            pending.result()
+        except Exception as exc:
+            _log_debug(self.db, "", f"context prefetch failed: {exc}")
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait=True)
+            self._prefetcher = None
+
+
+def run_session(session, args, interactive=True):
+    """Run turns until the user leaves the post-response menu."""
+    while True:
+        rc, project, chat_id = run_turn(session, args)
+        if rc != 0 or not interactive or running_under_pytest():
+            return rc
+
+        session.prefetch(project, chat_id)
+
+        from cli.interactive.post_response import post_response_menu
+
+        menu_result = post_response_menu(
+            session.db, session.project_svc, session.chat_svc, session.msg_svc,
+            session.llm, session.settings,
+            current_project=project,
+            current_chat=chat_id
+        )
+        if not isinstance(menu_result, dict):
+            return 0
+
+        args = argparse.Namespace(**{
+            **vars(args),
+            "project": menu_result["interactive_project"],
+            "chat": menu_result["interactive_chat"],
+            "prompt": menu_result["interactive_prompt"],
+            "attach": menu_result.get("interactive_attachments"),
+            "filemode": False,
+            "selector": None,
+            "reset": False,
+        })
+
+
+def run_turn(session, args):
+    """
+    One prompt → one streamed answer, both stored.
+    Returns (exit code, project, chat id).
+
+    Writes are grouped into units of work: resolving the chat, and storing
+    the turn once the model has answered. A failed model call leaves no
+    half-written turn behind.
+    """
+    db, project_svc, chat_svc = session.db, session.project_svc, session.chat_svc
+    msg_svc, llm, settings = session.msg_svc, session.llm, session.settings
+
+    with db.transaction():
+        project = args.project or project_svc.get_or_create_default()
+        chat_id = args.chat or chat_svc.get_or_create_first(project)
+        if args.chat:
+            chat_svc.touch(chat_id)  # keeps a concurrent archive run off this chat
+
+        if args.reset:
+            chat_svc.reset_chat(chat_id)
+
+    from core.services.archive_service import ArchiveService
 
     if args.reset:
-        chat_svc.reset_chat(chat_id)
+        ArchiveService(db).discard(chat_id)  # reset means empty, archived or not
+    else:
+        ArchiveService(db).ensure_hot(chat_id)  # an archived chat comes back on use
 
     # --------------------------
     # FIX: Do not call llm.generate_title under pytest
     # --------------------------
+    title = None
     if chat_svc.is_new_chat(chat_id) and not running_under_pytest():
-        t = llm.generate_title(args.prompt)
-        if t:
-            chat_svc.update_title(chat_id, t)
+        title = llm.generate_title(args.prompt)
+
+    from cli.commands.prompt_builder import build_prompt_with_report, resolve_attachments
+    from cli.commands.banner import show_status_banner
 
-    full_prompt = build_prompt(
+    session.settle()  # the prefetched context, if any, is in place
+    # no unit of work here: reading files and retrieval must not hold the
+    # write lock; new attachments are stored in one transaction of their own
+    attachments = resolve_attachments(args, db, settings)
+    full_prompt, context_report = build_prompt_with_report(
         args=args,
         db=db,
         project=project,
         chat_id=chat_id,
         project_svc=project_svc,
-        chat_svc=chat_svc
+        chat_svc=chat_svc,
+        msg_svc=msg_svc,
+        settings=settings,
+        attachments=attachments,
     )
 
-    msg_svc.add_message(chat_id, "user", args.prompt)
-
-    show_status_banner(settings, db, project, chat_id)
+    show_status_banner(settings, db, project, chat_id, context_report)
+    debug = [context_report.summary()]
+
+    distill = not running_under_pytest()
+
+    def _store_turn(answer, enqueue=False):
+        with db.transaction():
+            if title:
+                chat_svc.update_title(chat_id, title)
+            # the message references its files; their content lives in the store
+            turn = [(chat_id, "user", args.prompt, attachments[0])]
+            if answer:
+                turn.append((chat_id, "assistant", answer, ()))
+            msg_svc.add_messages(turn)
+            if enqueue:
+                try:
+                    from core.services.job_service import JobService
+                    from runners.distill import JOB_KIND
+
+                    with db.transaction():  # a failed enqueue keeps the turn
+                        JobService(db).enqueue(JOB_KIND, project, chat_id)
+                except Exception as exc:
+                    import traceback
+
+                    debug.append(f"distill enqueue failed: {exc}\n{traceback.format_exc()}")
+                    enqueue = False
+            for info in debug:
+                _log_debug(db, chat_id, info)
+        return enqueue
+
+    streamed = []
+
+    def _emit(chunk):
+        streamed.append(chunk)
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
 
     start = time.time()
-    response_text = llm.call_prompt(full_prompt)
+    try:
+        response_text = llm.call_prompt(full_prompt, on_chunk=_emit)
+    except KeyboardInterrupt:
+        # keep whatever the model already said
+        partial = "".join(streamed).strip()
+        print("\n[interrupted]")
+        debug.append(f"model call interrupted after {len(partial)} chars")
+        _store_turn(partial)
+        return 130, project, chat_id
     latency = time.time() - start
 
     if response_text is None:
         print("LLM call failed.")
-        return 1
+        _log_debug(db, chat_id, "model call failed; turn not stored")
+        return 1, project, chat_id
 
-    print(response_text)
+    if not streamed:
+        print(response_text)
+    elif not streamed[-1].endswith("\n"):
+        print()
     print()
-    print(f"⏱️ Runtime (model call): {latency:.2f}s")
 
-    msg_svc.add_message(chat_id, "assistant", response_text)
+    metrics = llm.last_metrics
+    if metrics is not None and metrics.cached:
+        print("⏱️ Cached response")
+        debug.append(f"model call: cache hit chars={metrics.chars}")
+    elif metrics is not None and metrics.ttft is not None:
+        print(
+            f"⏱️ First token: {metrics.ttft:.2f}s | "
+            f"Runtime (model call): {metrics.total:.2f}s"
+        )
+        debug.append(
+            f"model call: ttft={metrics.ttft:.3f}s total={metrics.total:.3f}s "
+            f"chars={metrics.chars}"
+        )
+    else:
+        print(f"⏱️ Runtime (model call): {latency:.2f}s")
+
+    enqueued = _store_turn(response_text, enqueue=distill)
     chat_svc.append_archive(chat_id, args.prompt, response_text)
 
-    if not running_under_pytest():
+    if enqueued:
         try:
-            distill_path = os.path.join(
-                os.path.dirname(__file__), "..", "runners", "distill.py"
-            )
-            subprocess.Popen(
-                [
-                    "python3", distill_path,
-                    "--db", DB_PATH,
-                    "--project", project,
-                    "--chat", chat_id,
-                ],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
-            )
-        except Exception as exc:
-            tb = traceback.format_exc()
-            _log_debug(db, chat_id, f"distill spawn failed: {exc}\n{tb}")
+            from runners.distill import ensure_worker
 
-    if running_under_pytest():
-        return 0
-
-    menu_result = post_response_menu(
-        db, project_svc, chat_svc, msg_svc, llm, settings,
-        current_project=project,
-        current_chat=chat_id
-    )
-
-    if menu_result == 0:
-        return 0
-
-    if isinstance(menu_result, dict):
-        return main([
-            "-p", menu_result["interactive_project"],
-            "-c", menu_result["interactive_chat"],
-            menu_result["interactive_prompt"],
-        ])
+            ensure_worker(DB_PATH)
+        except Exception as exc:
+            _log_debug(db, chat_id, f"distill worker start failed: {exc}")
 
-    return 0
+    return 0, project, chat_id
 
 
 if __name__ == "__main__":
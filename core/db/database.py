@@ -1,92 +1,207 @@
+import contextlib
 import sqlite3
 import os
+import re
+import threading
+
+from core.utils.compression import unpack
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+_MIGRATE_MARKER = re.compile(r"^-- migrate: (\d+)\s*$", re.MULTILINE)
+
+
+def load_migrations(path=SCHEMA_PATH):
+    """
+    Split schema.sql into [(version, sql), ...] on its "-- migrate: N" markers.
+    Versions must be strictly increasing.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        text = fh.read()
+
+    markers = list(_MIGRATE_MARKER.finditer(text))
+    migrations = []
+    for i, m in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        version = int(m.group(1))
+        if migrations and version <= migrations[-1][0]:
+            raise ValueError(f"schema.sql: migration {version} is out of order")
+        migrations.append((version, text[m.end():end]))
+    return migrations
+
+
+def _statements(sql):
+    """Yield complete SQL statements (trigger bodies included) from a script."""
+    buf = ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            yield buf
+            buf = ""
+    leftover = [l for l in buf.splitlines() if l.strip() and not l.strip().startswith("--")]
+    if leftover:
+        raise ValueError(f"schema.sql: incomplete statement: {buf.strip()[:60]}")
+
+
+def migrate(conn, migrations=None):
+    """
+    Apply every migration newer than PRAGMA user_version, one transaction
+    each. The version is re-read under the write lock, so concurrent
+    processes never apply the same block twice. Returns the schema version.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, sql in migrations:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > current:
+                for stmt in _statements(sql):
+                    conn.execute(stmt)
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return current
 
-SCHEMA = """
-PRAGMA foreign_keys = ON;
-
-CREATE TABLE IF NOT EXISTS projects (
-  id INTEGER PRIMARY KEY,
-  name TEXT UNIQUE,
-  created_at TEXT
-);
-
-CREATE TABLE IF NOT EXISTS chats (
-  id TEXT PRIMARY KEY,
-  project_id INTEGER,
-  title TEXT,
-  created_at TEXT,
-  last_used TEXT,
-  FOREIGN KEY(project_id) REFERENCES projects(id)
-);
-
-CREATE TABLE IF NOT EXISTS messages (
-  id INTEGER PRIMARY KEY,
-  chat_id TEXT,
-  role TEXT,
-  content TEXT,
-  ts TEXT
-);
-
--- Legacy distilled table (kept for backward compatibility).
-CREATE TABLE IF NOT EXISTS distilled (
-  id INTEGER PRIMARY KEY,
-  project_name TEXT,
-  chat_id TEXT,
-  summary TEXT,
-  created_at TEXT
-);
-
--- New structured chat-level summaries (for richer/LLM-friendly distillation)
-CREATE TABLE IF NOT EXISTS chat_summaries (
-  id INTEGER PRIMARY KEY,
-  chat_id TEXT,
-  summary TEXT,
-  distill_meta TEXT,     -- optional JSON or small metadata string
-  created_at TEXT
-);
-
--- New structured project-level summaries (higher-level memory)
-CREATE TABLE IF NOT EXISTS project_summaries (
-  id INTEGER PRIMARY KEY,
-  project_name TEXT,
-  summary TEXT,
-  distill_meta TEXT,     -- optional JSON or small metadata string
-  created_at TEXT
-);
-
-CREATE TABLE IF NOT EXISTS debug_log (
-  id INTEGER PRIMARY KEY,
-  chat_id TEXT,
-  info TEXT,
-  ts TEXT
-);
-
-CREATE TABLE IF NOT EXISTS settings (
-  key TEXT PRIMARY KEY,
-  value TEXT
-);
-"""
 
 def init_db(db_path):
     """
-    Create DB directory and apply schema. Safe to call multiple times.
+    Create DB directory and apply pending migrations. Safe to call multiple times.
     """
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-    conn = sqlite3.connect(db_path)
-    # Ensure we get simple text rows; other modules set row_factory when connecting.
-    conn.executescript(SCHEMA)
-    conn.commit()
+    conn = Database(db_path).connect()
+    migrate(conn)
     conn.close()
 
 
+# Per-connection tuning applied once when a pooled connection is opened.
+# WAL lets the CLI, the background distill runner and long-lived modes read
+# while another process writes; NORMAL sync is durable under WAL.
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -16000;",      # ~16 MB page cache
+    "PRAGMA mmap_size = 134217728;",    # 128 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY;",
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection owned by the pool.
+
+    close() only hands the connection back: uncommitted work is rolled back
+    (matching what a real close would do) but the handle stays open for the
+    next caller on the same thread. Database.close() really closes it.
+
+    Inside Database.transaction() commit() and close() leave the open
+    transaction alone; the unit of work commits or rolls back at its end.
+    """
+
+    uow_depth = 0
+
+    def commit(self):
+        if not self.uow_depth:
+            sqlite3.Connection.commit(self)
+
+    def close(self):
+        if self.in_transaction and not self.uow_depth:
+            self.rollback()
+
+    def _really_close(self):
+        sqlite3.Connection.close(self)
+
+
+# Process-wide pool: one connection per (thread, db_path).
+# Thread-local, so a pool dies with its thread and forked children start clean.
+_local = threading.local()
+
+
+def _thread_pool():
+    pool = getattr(_local, "pool", None)
+    if pool is None or _local.pid != os.getpid():
+        # fresh thread, or a forked child that must not share the parent's handles
+        pool = _local.pool = {}
+        _local.pid = os.getpid()
+    return pool
+
+
 class Database:
     def __init__(self, db_path):
         self.db_path = db_path
 
     def connect(self):
-        conn = sqlite3.connect(self.db_path, timeout=30)
+        """
+        Return this thread's pooled connection, opening it on first use.
+        Callers keep the connect()/close() pattern; close() is a cheap release.
+        """
+        pool = _thread_pool()
+        conn = pool.get(self.db_path)
+        if conn is None:
+            conn = self._open()
+            pool[self.db_path] = conn
+        return conn
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path, timeout=30, factory=PooledConnection
+        )
         conn.row_factory = sqlite3.Row
-        # Ensure foreign keys are enforced for every connection.
-        conn.execute("PRAGMA foreign_keys = ON;")
+        # unpack(content, fmt): message text whether or not it is compressed
+        conn.create_function("unpack", 2, unpack, deterministic=True)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
         return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Unit of work on this thread's connection: every service write inside
+        the block lands in one transaction, committed when the outermost
+        block exits and rolled back entirely if it raises. The write lock is
+        taken on entry (BEGIN IMMEDIATE), so keep model calls outside.
+        Nested blocks are savepoints: an exception undoes only their writes.
+        """
+        conn = self.connect()
+        if conn.uow_depth:
+            name = f"uow_{conn.uow_depth}"
+            conn.execute(f"SAVEPOINT {name}")
+            conn.uow_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {name}")
+                raise
+            finally:
+                conn.uow_depth -= 1
+                conn.execute(f"RELEASE {name}")
+            return
+
+        if conn.in_transaction:
+            conn.commit()  # nothing may leak into or out of the unit
+        conn.execute("BEGIN IMMEDIATE")
+        conn.uow_depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.uow_depth = 0
+            conn.rollback()
+            raise
+        conn.uow_depth = 0
+        conn.commit()
+
+    def close(self):
+        """Really close the calling thread's connection to this database."""
+        conn = _thread_pool().pop(self.db_path, None)
+        if conn is not None:
+            conn._really_close()
+
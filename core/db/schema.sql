@@ -0,0 +1,373 @@
+-- llmcui schema: the single source of truth for the database layout.
+--
+-- The file is a sequence of numbered migrations. Each block starts with a
+-- "-- migrate: N" marker and runs exactly once, in order, inside its own
+-- transaction; PRAGMA user_version records the last block applied. Never
+-- edit a released block: append a new one instead.
+
+-- migrate: 1
+-- Baseline layout (databases created before versioning already have it,
+-- hence IF NOT EXISTS throughout).
+
+CREATE TABLE IF NOT EXISTS projects (
+  id INTEGER PRIMARY KEY,
+  name TEXT UNIQUE,
+  created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS chats (
+  id TEXT PRIMARY KEY,
+  project_id INTEGER,
+  title TEXT,
+  created_at TEXT,
+  last_used TEXT,
+  FOREIGN KEY(project_id) REFERENCES projects(id)
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+  id INTEGER PRIMARY KEY,
+  chat_id TEXT,
+  role TEXT,
+  content TEXT,
+  ts TEXT
+);
+
+-- Legacy distilled table (kept for backward compatibility).
+CREATE TABLE IF NOT EXISTS distilled (
+  id INTEGER PRIMARY KEY,
+  project_name TEXT,
+  chat_id TEXT,
+  summary TEXT,
+  created_at TEXT
+);
+
+-- New structured chat-level summaries (for richer/LLM-friendly distillation)
+CREATE TABLE IF NOT EXISTS chat_summaries (
+  id INTEGER PRIMARY KEY,
+  chat_id TEXT,
+  summary TEXT,
+  distill_meta TEXT,     -- optional JSON or small metadata string
+  created_at TEXT
+);
+
+-- New structured project-level summaries (higher-level memory)
+CREATE TABLE IF NOT EXISTS project_summaries (
+  id INTEGER PRIMARY KEY,
+  project_name TEXT,
+  summary TEXT,
+  distill_meta TEXT,     -- optional JSON or small metadata string
+  created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS debug_log (
+  id INTEGER PRIMARY KEY,
+  chat_id TEXT,
+  info TEXT,
+  ts TEXT
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+
+-- migrate: 2
+-- Secondary indexes for the hot lookups. Each one matches both the filter
+-- and the sort of its queries, so SQLite never sorts or scans the table.
+
+-- last_messages / get_messages (ORDER BY id) and COUNT in is_new_chat
+CREATE INDEX IF NOT EXISTS idx_messages_chat_id
+  ON messages(chat_id, id);
+
+-- get_or_create_first and chat listings (ORDER BY last_used DESC)
+CREATE INDEX IF NOT EXISTS idx_chats_project_last_used
+  ON chats(project_id, last_used);
+
+-- latest chat summary (ORDER BY created_at DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_distilled_chat_created
+  ON distilled(chat_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_chat_summaries_chat_created
+  ON chat_summaries(chat_id, created_at);
+
+-- latest project summary (ORDER BY created_at DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_project_summaries_name_created
+  ON project_summaries(project_name, created_at);
+
+-- migrate: 3
+-- Durable background job queue (distillation worker).
+-- status: pending | running | done | failed | merged
+-- A merged job was folded into job merged_into and needs no work of its own.
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY,
+  kind TEXT NOT NULL,
+  project_name TEXT,
+  chat_id TEXT,
+  status TEXT NOT NULL DEFAULT 'pending',
+  merged_into INTEGER,
+  created_at TEXT,
+  started_at TEXT,
+  finished_at TEXT,
+  duration_ms INTEGER,
+  error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status
+  ON jobs(status, kind, id);
+
+-- migrate: 4
+-- Every distillation policy decision, for inspection. upto_message_id is the
+-- newest message the decision looked at; the latest 'run' row per chat is
+-- the baseline the next decision measures new content against.
+
+CREATE TABLE IF NOT EXISTS distill_decisions (
+  id INTEGER PRIMARY KEY,
+  chat_id TEXT,
+  project_name TEXT,
+  decision TEXT NOT NULL,       -- run | skip
+  reason TEXT,
+  new_chars INTEGER,
+  new_turns INTEGER,
+  upto_message_id INTEGER,
+  created_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_distill_decisions_chat
+  ON distill_decisions(chat_id, decision, id);
+
+-- migrate: 5
+-- Materialized prompt context per chat: everything build_prompt needs in
+-- one primary-key lookup. Summary writers push new text into it; message
+-- writes clear recent_turns (NULL = rebuild on next read).
+
+CREATE TABLE IF NOT EXISTS chat_context (
+  chat_id TEXT PRIMARY KEY,
+  project_name TEXT,
+  project_summary TEXT,
+  chat_summary TEXT,
+  recent_turns TEXT,      -- JSON [[role, content], ...] oldest first
+  updated_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_context_project
+  ON chat_context(project_name);
+
+-- migrate: 6
+-- Full-text index over messages.content (rowid = messages.id), kept in sync
+-- by triggers and backfilled from the existing rows.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+  content,
+  tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+  DELETE FROM messages_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+  DELETE FROM messages_fts WHERE rowid = old.id;
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+INSERT INTO messages_fts(rowid, content)
+  SELECT id, content FROM messages;
+
+-- migrate: 7
+-- Hashing-vectorizer embeddings for retrieval (see embedding_service).
+-- One row per message and per chat's latest summary; vec is DIM float32,
+-- L2-normalized. project_id is denormalized so a project's vectors are
+-- one index range.
+
+CREATE TABLE IF NOT EXISTS embeddings (
+  source TEXT NOT NULL,         -- message | chat_summary
+  source_id INTEGER NOT NULL,   -- messages.id | chat_summaries.id
+  chat_id TEXT,
+  project_id INTEGER,
+  vec BLOB NOT NULL,
+  PRIMARY KEY (source, source_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_project
+  ON embeddings(project_id);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_chat
+  ON embeddings(chat_id);
+
+-- migrate: 8
+-- Large message bodies may be stored compressed (core/utils/compression):
+-- fmt NULL = plain text in content, otherwise the codec of a BLOB. Compressed
+-- rows are added to messages_fts by MessageService with their plain text,
+-- so the sync triggers only handle plain rows.
+
+ALTER TABLE messages ADD COLUMN fmt TEXT;
+
+DROP TRIGGER IF EXISTS messages_fts_insert;
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages
+WHEN new.fmt IS NULL BEGIN
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+-- re-compressing a row leaves its indexed text alone
+DROP TRIGGER IF EXISTS messages_fts_update;
+CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages
+WHEN new.fmt IS NULL BEGIN
+  DELETE FROM messages_fts WHERE rowid = old.id;
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+
+-- migrate: 9
+-- Content-addressed attachments: one row per distinct file content (text
+-- stored as compression.pack() leaves it), a path → (mtime, size, hash)
+-- cache that lets unchanged files skip re-hashing, and the attachments each
+-- message referenced.
+
+CREATE TABLE IF NOT EXISTS attachments (
+  hash TEXT PRIMARY KEY,        -- sha256 of the file bytes
+  size INTEGER NOT NULL,        -- bytes
+  content BLOB,
+  fmt TEXT,                     -- NULL = plain text, else codec
+  created_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS attachment_paths (
+  path TEXT PRIMARY KEY,        -- absolute, symlinks resolved
+  mtime_ns INTEGER NOT NULL,
+  size INTEGER NOT NULL,
+  hash TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS message_attachments (
+  message_id INTEGER NOT NULL,
+  hash TEXT NOT NULL,
+  name TEXT,                    -- path as the user gave it
+  PRIMARY KEY (message_id, hash)
+);
+
+CREATE INDEX IF NOT EXISTS idx_message_attachments_hash
+  ON message_attachments(hash);
+
+-- migrate: 10
+-- Cached directory listings for file selectors: the sorted entries of one
+-- directory, valid while the directory's mtime is unchanged.
+
+CREATE TABLE IF NOT EXISTS dir_index (
+  path TEXT PRIMARY KEY,        -- absolute, "/"-separated
+  mtime_ns INTEGER NOT NULL,
+  entries TEXT NOT NULL         -- JSON [[name, is_dir], ...] sorted by name
+);
+
+-- migrate: 11
+-- Opt-in model response cache (see core.services.response_cache): one row
+-- per hash of backend, model, prompt and options; expired by created_at,
+-- evicted least recently used first.
+
+CREATE TABLE IF NOT EXISTS response_cache (
+  key TEXT PRIMARY KEY,         -- sha256 hex
+  response TEXT NOT NULL,       -- packed like messages.content
+  fmt TEXT,
+  created_at TEXT NOT NULL,
+  last_used TEXT NOT NULL,
+  hits INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_response_cache_last_used
+  ON response_cache(last_used);
+
+CREATE TABLE IF NOT EXISTS response_cache_stats (
+  name TEXT PRIMARY KEY,        -- 'hits' | 'misses'
+  value INTEGER NOT NULL DEFAULT 0
+);
+
+-- migrate: 12
+-- Hot/cold archival (core.services.archive_service): a chat idle for long
+-- enough has its messages, summaries and index rows moved to the archive
+-- database; its chats row stays behind as a stub, marked here.
+
+ALTER TABLE chats ADD COLUMN archived_at TEXT;
+
+-- migrate: 13
+-- Bounded summary history (core.services.retention_service): pointers to
+-- the current chat and project summary, so readers do a primary-key lookup
+-- instead of sorting the history; writers keep them current and prune old
+-- versions. Backfilled from the newest existing rows.
+
+CREATE TABLE IF NOT EXISTS latest_chat_summary (
+  chat_id TEXT PRIMARY KEY,
+  summary_id INTEGER NOT NULL   -- chat_summaries.id
+);
+
+CREATE TABLE IF NOT EXISTS latest_project_summary (
+  project_name TEXT PRIMARY KEY,
+  summary_id INTEGER NOT NULL   -- project_summaries.id
+);
+
+INSERT OR REPLACE INTO latest_chat_summary(chat_id, summary_id)
+SELECT chat_id, (
+  SELECT s2.id FROM chat_summaries s2 WHERE s2.chat_id = s.chat_id
+  ORDER BY s2.created_at DESC, s2.id DESC LIMIT 1
+) FROM chat_summaries s GROUP BY chat_id;
+
+INSERT OR REPLACE INTO latest_project_summary(project_name, summary_id)
+SELECT project_name, (
+  SELECT s2.id FROM project_summaries s2 WHERE s2.project_name = s.project_name
+  ORDER BY s2.created_at DESC, s2.id DESC LIMIT 1
+) FROM project_summaries s GROUP BY project_name;
+
+-- migrate: 14
+-- Deletions per project from embeddings. EmbeddingService keeps each
+-- project's vectors in memory and reads only rows past the last rowid it
+-- has seen; a changed count means rows are gone and it reloads.
+
+CREATE TABLE IF NOT EXISTS embedding_changes (
+  project_id INTEGER PRIMARY KEY,
+  deletes INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS embeddings_deleted AFTER DELETE ON embeddings
+WHEN old.project_id IS NOT NULL BEGIN
+  INSERT INTO embedding_changes(project_id, deletes) VALUES (old.project_id, 1)
+  ON CONFLICT(project_id) DO UPDATE SET deletes = deletes + 1;
+END;
+
+-- migrate: 15
+-- messages_fts becomes contentless: it used to keep a plain copy of every
+-- message, compressed ones included, often bigger than messages itself.
+-- The triggers index unpack(content, fmt) for every row (so compressed
+-- rows need no separate insert) and delete with the same text, as a
+-- contentless table requires; snippets are cut from messages by
+-- SearchService.
+
+DROP TRIGGER IF EXISTS messages_fts_insert;
+DROP TRIGGER IF EXISTS messages_fts_delete;
+DROP TRIGGER IF EXISTS messages_fts_update;
+DROP TABLE IF EXISTS messages_fts;
+
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+  content,
+  content = '',
+  tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, unpack(new.content, new.fmt));
+END;
+
+CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+  INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.id, unpack(old.content, old.fmt));
+END;
+
+CREATE TRIGGER messages_fts_update AFTER UPDATE OF content, fmt ON messages BEGIN
+  INSERT INTO messages_fts(messages_fts, rowid, content)
+    VALUES ('delete', old.id, unpack(old.content, old.fmt));
+  INSERT INTO messages_fts(rowid, content) VALUES (new.id, unpack(new.content, new.fmt));
+END;
+
+INSERT INTO messages_fts(rowid, content)
+  SELECT id, unpack(content, fmt) FROM messages;
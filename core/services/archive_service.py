@@ -0,0 +1,385 @@
+# core/services/archive_service.py
+"""
+Hot/cold storage for chats.
+
+Chats untouched for a while move out of the main database into an
+archive database next to it (ai.db → ai.archive.db): one compressed JSON
+segment per chat holding its messages, attachment references and
+summaries, plus a small per-message row and a contentless FTS index so
+archived chats stay searchable. The chats row stays in the hot database
+as a stub (chats.archived_at set), so listings keep working.
+
+ensure_hot() restores a chat the moment it is opened again; message ids
+are kept when they are still free.
+"""
+import json
+import os
+import re
+from datetime import datetime, timedelta, UTC
+from typing import List, Optional
+
+from core.db.database import Database
+from core.services.embedding_service import index_texts
+from core.utils.compression import pack
+
+DEFAULT_AFTER_DAYS = 90
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_chats (
+  chat_id TEXT PRIMARY KEY,
+  project_name TEXT,
+  title TEXT,
+  archived_at TEXT NOT NULL,
+  payload BLOB NOT NULL,        -- compression.pack() of the chat's JSON segment
+  fmt TEXT,
+  raw_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archived_messages (
+  id INTEGER PRIMARY KEY,       -- rowid of archived_fts
+  chat_id TEXT NOT NULL,
+  position INTEGER NOT NULL,    -- index into the segment's messages
+  role TEXT,
+  ts TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_archived_messages_chat
+  ON archived_messages(chat_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS archived_fts USING fts5(
+  content,
+  content = '',
+  tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def after_days(settings, default=DEFAULT_AFTER_DAYS) -> Optional[int]:
+    """The archive.after_days setting ("off" → None), else default."""
+    raw = settings.get("archive.after_days")
+    if raw is None:
+        return default
+    if str(raw).strip().lower() in ("off", "never", ""):
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def archive_path(db_path: str) -> str:
+    root, _ = os.path.splitext(db_path)
+    return root + ".archive.db"
+
+
+class ArchiveService:
+    def __init__(self, db: Database, path: Optional[str] = None):
+        self.db = db
+        self.path = path or archive_path(db.db_path)
+        self.cold = Database(self.path)
+        self._ready = False
+
+    def _now(self, days_ago=0):
+        # timezone-aware UTC with trailing Z
+        t = datetime.now(UTC) - timedelta(days=days_ago)
+        return t.isoformat().replace("+00:00", "Z")
+
+    def _cold(self, create=False):
+        """The archive connection, or None if there is no archive yet."""
+        if not self._ready:
+            if not create and not os.path.exists(self.path):
+                return None
+            conn = self.cold.connect()
+            conn.executescript(ARCHIVE_SCHEMA)
+            self._ready = True
+        return self.cold.connect()
+
+    # -------------------------------------------------
+    # Archiving
+    # -------------------------------------------------
+    def idle_chats(self, after_days: int = DEFAULT_AFTER_DAYS) -> List[str]:
+        conn = self.db.connect()
+        rows = conn.execute(
+            "SELECT id FROM chats WHERE archived_at IS NULL AND last_used < ? "
+            "ORDER BY last_used",
+            (self._now(after_days),)
+        ).fetchall()
+        conn.close()
+        return [r["id"] for r in rows]
+
+    def archive_idle(self, after_days: int = DEFAULT_AFTER_DAYS) -> int:
+        """Archive every chat unused for after_days; returns how many moved."""
+        return sum(self.archive_chat(chat_id) for chat_id in self.idle_chats(after_days))
+
+    def archive_chat(self, chat_id: str) -> bool:
+        """
+        Move one chat to the archive. False if it is unknown, already
+        archived, or was used while being copied.
+        """
+        conn = self.db.connect()
+        chat = conn.execute(
+            "SELECT c.title, c.archived_at, c.last_used, p.name AS project FROM chats c "
+            "LEFT JOIN projects p ON p.id = c.project_id WHERE c.id = ?",
+            (chat_id,)
+        ).fetchone()
+        if chat is None or chat["archived_at"] is not None:
+            conn.close()
+            return False
+
+        messages = [
+            {"id": r["id"], "role": r["role"], "content": r["content"], "ts": r["ts"],
+             "attachments": []}
+            for r in conn.execute(
+                "SELECT id, role, unpack(content, fmt) AS content, ts FROM messages "
+                "WHERE chat_id = ? ORDER BY id",
+                (chat_id,)
+            )
+        ]
+        by_id = {m["id"]: m for m in messages}
+        for r in conn.execute(
+            "SELECT a.message_id, a.hash, a.name FROM message_attachments a "
+            "JOIN messages m ON m.id = a.message_id WHERE m.chat_id = ?",
+            (chat_id,)
+        ):
+            by_id[r["message_id"]]["attachments"].append([r["hash"], r["name"]])
+        segment = {
+            "messages": messages,
+            "chat_summaries": [
+                dict(r) for r in conn.execute(
+                    "SELECT summary, distill_meta, created_at FROM chat_summaries "
+                    "WHERE chat_id = ? ORDER BY id", (chat_id,)
+                )
+            ],
+            "distilled": [
+                dict(r) for r in conn.execute(
+                    "SELECT project_name, summary, created_at FROM distilled "
+                    "WHERE chat_id = ? ORDER BY id", (chat_id,)
+                )
+            ],
+        }
+        conn.close()
+
+        raw = json.dumps(segment, ensure_ascii=False)
+        payload, fmt = pack(raw, threshold=0)
+
+        # cold first: a crash in between leaves a copy in both, never in neither
+        cold = self._cold(create=True)
+        self._drop_cold(cold, chat_id)
+        cold.execute(
+            "INSERT INTO archived_chats(chat_id, project_name, title, archived_at, "
+            "payload, fmt, raw_bytes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, chat["project"], chat["title"], self._now(), payload, fmt,
+             len(raw.encode("utf-8")))
+        )
+        for position, m in enumerate(messages):
+            cur = cold.execute(
+                "INSERT INTO archived_messages(chat_id, position, role, ts) VALUES (?, ?, ?, ?)",
+                (chat_id, position, m["role"], m["ts"])
+            )
+            cold.execute(
+                "INSERT INTO archived_fts(rowid, content) VALUES (?, ?)",
+                (cur.lastrowid, m["content"] or "")
+            )
+        cold.commit()
+        cold.close()
+
+        with self.db.transaction() as hot:
+            # a turn may have used the chat since it was read: then it stays hot
+            now = hot.execute(
+                "SELECT archived_at, last_used FROM chats WHERE id = ?", (chat_id,)
+            ).fetchone()
+            idle = (now is not None and now["archived_at"] is None
+                    and now["last_used"] == chat["last_used"])
+            if idle:
+                self._delete_hot(hot, chat_id, [m["id"] for m in messages])
+                hot.execute("UPDATE chats SET archived_at = ? WHERE id = ?",
+                            (self._now(), chat_id))
+
+        if not idle:
+            if now is not None and now["archived_at"] is None:
+                cold = self._cold()
+                self._drop_cold(cold, chat_id)
+                cold.commit()
+                cold.close()
+            return False
+        return True
+
+    def _delete_hot(self, conn, chat_id, message_ids):
+        """Delete the archived messages and the chat's derived rows."""
+        conn.executemany(
+            "DELETE FROM message_attachments WHERE message_id = ?",
+            [(i,) for i in message_ids]
+        )
+        conn.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in message_ids])
+        for table in ("distilled", "chat_summaries", "latest_chat_summary",
+                      "chat_context", "embeddings", "distill_decisions"):
+            conn.execute(f"DELETE FROM {table} WHERE chat_id = ?", (chat_id,))
+
+    def _segment(self, cold, chat_id):
+        row = cold.execute(
+            "SELECT unpack(payload, fmt) AS raw FROM archived_chats WHERE chat_id = ?",
+            (chat_id,)
+        ).fetchone()
+        return json.loads(row["raw"]) if row is not None else None
+
+    def _drop_cold(self, cold, chat_id):
+        """Remove a chat from the archive (contentless FTS needs the old text)."""
+        segment = self._segment(cold, chat_id)
+        if segment is None:
+            return
+        texts = [m["content"] or "" for m in segment["messages"]]
+        rows = cold.execute(
+            "SELECT id, position FROM archived_messages WHERE chat_id = ?", (chat_id,)
+        ).fetchall()
+        cold.executemany(
+            "INSERT INTO archived_fts(archived_fts, rowid, content) VALUES ('delete', ?, ?)",
+            [(r["id"], texts[r["position"]]) for r in rows]
+        )
+        cold.execute("DELETE FROM archived_messages WHERE chat_id = ?", (chat_id,))
+        cold.execute("DELETE FROM archived_chats WHERE chat_id = ?", (chat_id,))
+
+    # -------------------------------------------------
+    # Restoring
+    # -------------------------------------------------
+    def is_archived(self, chat_id: str) -> bool:
+        conn = self.db.connect()
+        row = conn.execute("SELECT archived_at FROM chats WHERE id = ?", (chat_id,)).fetchone()
+        conn.close()
+        return row is not None and row["archived_at"] is not None
+
+    def ensure_hot(self, chat_id: str) -> bool:
+        """Restore chat_id if it is archived; True if it was."""
+        if not chat_id or not self.is_archived(chat_id):
+            return False
+        return self.restore(chat_id)
+
+    def discard(self, chat_id: str) -> bool:
+        """Drop an archived chat's cold copy without restoring it (a reset)."""
+        if not chat_id or not self.is_archived(chat_id):
+            return False
+        with self.db.transaction() as hot:
+            hot.execute(
+                "UPDATE chats SET archived_at = NULL, last_used = ? WHERE id = ?",
+                (self._now(), chat_id)
+            )
+        cold = self._cold()
+        if cold is not None:
+            self._drop_cold(cold, chat_id)
+            cold.commit()
+            cold.close()
+        return True
+
+    def restore(self, chat_id: str) -> bool:
+        cold = self._cold()
+        segment = self._segment(cold, chat_id) if cold is not None else None
+
+        with self.db.transaction() as hot:
+            if segment is not None:
+                self._insert_hot(hot, chat_id, segment)
+            # without a segment there is nothing left to bring back
+            hot.execute(
+                "UPDATE chats SET archived_at = NULL, last_used = ? WHERE id = ?",
+                (self._now(), chat_id)
+            )
+
+        if segment is not None:
+            self._drop_cold(cold, chat_id)
+            cold.commit()
+            cold.close()
+        return True
+
+    def _insert_hot(self, conn, chat_id, segment):
+        embeddings, links = [], []
+        for m in segment["messages"]:
+            taken = conn.execute("SELECT 1 FROM messages WHERE id = ?", (m["id"],)).fetchone()
+            stored, fmt = pack(m["content"])
+            cur = conn.execute(
+                "INSERT INTO messages(id, chat_id, role, content, fmt, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (None if taken else m["id"], chat_id, m["role"], stored, fmt, m["ts"])
+            )
+            message_id = cur.lastrowid
+            embeddings.append(("message", message_id, chat_id, m["content"] or ""))
+            links += [(message_id, h, name) for h, name in m["attachments"]]
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO message_attachments(message_id, hash, name) VALUES (?, ?, ?)",
+            links
+        )
+        summary_id = None
+        for s in segment["chat_summaries"]:
+            summary_id = conn.execute(
+                "INSERT INTO chat_summaries(chat_id, summary, distill_meta, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (chat_id, s["summary"], s["distill_meta"], s["created_at"])
+            ).lastrowid
+        if summary_id is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO latest_chat_summary(chat_id, summary_id) VALUES (?, ?)",
+                (chat_id, summary_id)
+            )
+            embeddings.append(("chat_summary", summary_id, chat_id,
+                               segment["chat_summaries"][-1]["summary"] or ""))
+        conn.executemany(
+            "INSERT INTO distilled(project_name, chat_id, summary, created_at) VALUES (?, ?, ?, ?)",
+            [(d["project_name"], chat_id, d["summary"], d["created_at"])
+             for d in segment["distilled"]]
+        )
+        index_texts(conn, embeddings)
+
+    # -------------------------------------------------
+    # Search and stats
+    # -------------------------------------------------
+    def search(self, query: str, project: Optional[str] = None, limit: int = 20):
+        """
+        SearchHits from archived chats for an fts_query() string, best first.
+        Snippets are cut from the decompressed segment.
+        """
+        from core.services.search_service import SearchHit, snippet
+
+        cold = self._cold()
+        if cold is None or not query:
+            return []
+        sql = (
+            "SELECT am.chat_id, am.position, am.role, am.ts, ac.project_name, ac.title, "
+            "bm25(archived_fts) AS rank "
+            "FROM archived_fts "
+            "JOIN archived_messages am ON am.id = archived_fts.rowid "
+            "JOIN archived_chats ac ON ac.chat_id = am.chat_id "
+            "WHERE archived_fts MATCH ?"
+        )
+        params = [query]
+        if project:
+            sql += " AND ac.project_name = ?"
+            params.append(project)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        rows = cold.execute(sql, params).fetchall()
+
+        words = [w.lower() for w in re.findall(r"\w+", query)]
+        segments, hits = {}, []
+        for r in rows:
+            if r["chat_id"] not in segments:
+                segments[r["chat_id"]] = self._segment(cold, r["chat_id"])
+            text = segments[r["chat_id"]]["messages"][r["position"]]["content"] or ""
+            hits.append(SearchHit(
+                message_id=None,
+                project=r["project_name"],
+                chat_id=r["chat_id"],
+                chat_title=(r["title"] or "(untitled)") + " (archived)",
+                role=r["role"],
+                ts=r["ts"],
+                snippet=snippet(text, words),
+                rank=r["rank"],
+            ))
+        cold.close()
+        return hits
+
+    def stats(self) -> dict:
+        cold = self._cold()
+        if cold is None:
+            return {"chats": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+        row = cold.execute(
+            "SELECT COUNT(*) AS chats, COALESCE(SUM(raw_bytes), 0) AS raw_bytes, "
+            "COALESCE(SUM(length(payload)), 0) AS stored_bytes FROM archived_chats"
+        ).fetchone()
+        messages = cold.execute("SELECT COUNT(*) FROM archived_messages").fetchone()[0]
+        cold.close()
+        return {"chats": row["chats"], "messages": messages,
+                "raw_bytes": row["raw_bytes"], "stored_bytes": row["stored_bytes"]}
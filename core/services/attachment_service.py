@@ -0,0 +1,119 @@
+# core/services/attachment_service.py
+import os
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Iterator, List, Tuple, Union
+
+from core.db.database import Database
+from core.utils.compression import pack
+from core.utils.ingest import MAX_FILE_BYTES, FileData, read_files
+
+
+@dataclass
+class Attachment:
+    hash: str
+    name: str       # path as given
+    size: int       # bytes
+
+
+class AttachmentService:
+    """
+    Content-addressed store for files sent with a prompt.
+
+    Each distinct content is stored once, keyed by its sha256. A file whose
+    path, mtime and size match the last time it was added is not read or
+    hashed again; its stored content is reused. Binary files are refused.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def _now(self):
+        # timezone-aware UTC with trailing Z
+        return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+    def add_file(self, path: str, max_bytes: int = MAX_FILE_BYTES) -> Attachment:
+        """
+        Store path's content (if new) and return its attachment.
+        Raises OSError, or BinaryFileError for binary files.
+        """
+        for _, result in self.add_files([path], max_bytes):
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    def add_files(self, paths: List[str], max_bytes: int = MAX_FILE_BYTES
+                  ) -> Iterator[Tuple[str, Union[Attachment, Exception]]]:
+        """
+        Store several files; yields (path, Attachment or the error it
+        raised) in input order. Files that changed since they were last
+        stored are read in parallel, then stored in one transaction;
+        unchanged ones are not read at all.
+        Text beyond max_bytes is stored head/tail-truncated; the hash always
+        covers the whole file.
+        """
+        conn = self.db.connect()
+        known, misses = {}, []
+        for path in paths:
+            real = os.path.realpath(path)
+            try:
+                st = os.stat(real)
+            except OSError:
+                misses.append(path)  # read_files reports the error
+                continue
+            row = conn.execute(
+                "SELECT p.hash FROM attachment_paths p JOIN attachments a ON a.hash = p.hash "
+                "WHERE p.path = ? AND p.mtime_ns = ? AND p.size = ?",
+                (real, st.st_mtime_ns, st.st_size)
+            ).fetchone()
+            if row is None:
+                misses.append(path)
+            else:
+                known[path] = Attachment(row["hash"], path, st.st_size)
+        conn.close()
+
+        # read everything first: the write lock is only held for the inserts
+        fresh = [result for _, result in read_files(misses, max_bytes)]
+        if any(isinstance(r, FileData) for r in fresh):
+            with self.db.transaction():
+                fresh = [self._store(r) if isinstance(r, FileData) else r for r in fresh]
+        fresh = iter(fresh)
+        for path in paths:
+            yield path, known[path] if path in known else next(fresh)
+
+    def _store(self, data: FileData) -> Attachment:
+        conn = self.db.connect()
+        if conn.execute("SELECT 1 FROM attachments WHERE hash = ?", (data.hash,)).fetchone() is None:
+            stored, fmt = pack(data.text)
+            conn.execute(
+                "INSERT INTO attachments(hash, size, content, fmt, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (data.hash, data.size, stored, fmt, self._now())
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO attachment_paths(path, mtime_ns, size, hash) "
+            "VALUES (?, ?, ?, ?)",
+            (os.path.realpath(data.path), data.mtime_ns, data.size, data.hash)
+        )
+        conn.commit()
+        conn.close()
+        return Attachment(data.hash, data.path, data.size)
+
+    def text(self, digest: str) -> str:
+        conn = self.db.connect()
+        row = conn.execute(
+            "SELECT unpack(content, fmt) AS content FROM attachments WHERE hash = ?",
+            (digest,)
+        ).fetchone()
+        conn.close()
+        return row["content"] if row else ""
+
+    def for_message(self, message_id: int) -> List[Attachment]:
+        conn = self.db.connect()
+        rows = conn.execute(
+            "SELECT a.hash, m.name, a.size FROM message_attachments m "
+            "JOIN attachments a ON a.hash = m.hash WHERE m.message_id = ? ORDER BY m.rowid",
+            (message_id,)
+        ).fetchall()
+        conn.close()
+        return [Attachment(r["hash"], r["name"], r["size"]) for r in rows]
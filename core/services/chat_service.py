@@ -1,5 +1,4 @@
 from datetime import datetime, UTC
-import uuid
 from core.db.database import Database
 
 
@@ -24,11 +23,9 @@ class ChatService:
                 "INSERT INTO projects(name, created_at) VALUES (?, ?)",
                 (project_name, self._now())
             )
-            conn.commit()
-            cur.execute("SELECT id FROM projects WHERE name = ?", (project_name,))
-            p = cur.fetchone()
-
-        project_id = p[0]
+            project_id = cur.lastrowid
+        else:
+            project_id = p[0]
 
         # try to get most recent chat
         cur.execute(
@@ -49,6 +46,7 @@ class ChatService:
             return chat_id
 
         # create a new chat
+        import uuid
         chat_id = "chat-" + uuid.uuid4().hex[:8]
         cur.execute(
             "INSERT INTO chats(id, project_id, title, created_at, last_used) "
@@ -89,13 +87,29 @@ class ChatService:
         conn = self.db.connect()
         cur = conn.cursor()
 
+        cur.execute(
+            "DELETE FROM message_attachments WHERE message_id IN "
+            "(SELECT id FROM messages WHERE chat_id = ?)",
+            (chat_id,)
+        )
         cur.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
         cur.execute("DELETE FROM distilled WHERE chat_id = ?", (chat_id,))
+        cur.execute("DELETE FROM chat_summaries WHERE chat_id = ?", (chat_id,))
+        cur.execute("DELETE FROM latest_chat_summary WHERE chat_id = ?", (chat_id,))
+        cur.execute("DELETE FROM chat_context WHERE chat_id = ?", (chat_id,))
+        cur.execute("DELETE FROM embeddings WHERE chat_id = ?", (chat_id,))
+        # their watermarks point at deleted messages
+        cur.execute("DELETE FROM distill_decisions WHERE chat_id = ?", (chat_id,))
 
         conn.commit()
         conn.close()
 
     def get_distilled_chat(self, chat_id):
+        summary, _ = self.get_chat_summary_state(chat_id)
+        if summary:
+            return summary
+
+        # legacy rows written before chat_summaries carried a watermark
         conn = self.db.connect()
         cur = conn.cursor()
         cur.execute(
@@ -107,6 +121,84 @@ class ChatService:
         conn.close()
         return row[0] if row else ""
 
+    # ---------------------------------------------------------
+    # INCREMENTAL CHAT SUMMARIES
+    # ---------------------------------------------------------
+
+    def get_chat_summary_state(self, chat_id):
+        """
+        Latest chat summary and the highest message id it covers
+        (its watermark). Returns ("", 0) when the chat has none.
+        """
+        conn = self.db.connect()
+        row = conn.execute(
+            "SELECT s.summary, s.distill_meta FROM latest_chat_summary l "
+            "JOIN chat_summaries s ON s.id = l.summary_id WHERE l.chat_id = ?",
+            (chat_id,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return "", 0
+
+        import json
+        try:
+            meta = json.loads(row["distill_meta"] or "{}")
+        except ValueError:
+            meta = {}
+        return row["summary"] or "", int(meta.get("upto_message_id") or 0)
+
+    def add_chat_summary(self, chat_id, text: str, upto_message_id: int):
+        """
+        Store a chat summary covering messages up to upto_message_id;
+        returns its row id. Text identical to the current summary only
+        advances its watermark; older versions beyond the retention limit
+        are dropped.
+        """
+        import json
+        from core.services.embedding_service import index_text
+        from core.services.retention_service import keep_versions, prune_chat_summaries
+
+        meta = json.dumps({"upto_message_id": upto_message_id})
+        conn = self.db.connect()
+        current = conn.execute(
+            "SELECT s.id, s.summary FROM latest_chat_summary l "
+            "JOIN chat_summaries s ON s.id = l.summary_id WHERE l.chat_id = ?",
+            (chat_id,)
+        ).fetchone()
+        if current is not None and current["summary"] == text:
+            conn.execute(
+                "UPDATE chat_summaries SET distill_meta = ? WHERE id = ?",
+                (meta, current["id"])
+            )
+            conn.commit()
+            conn.close()
+            return current["id"]
+
+        cur = conn.execute(
+            "INSERT INTO chat_summaries(chat_id, summary, distill_meta, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (chat_id, text, meta, self._now())
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO latest_chat_summary(chat_id, summary_id) VALUES (?, ?)",
+            (chat_id, cur.lastrowid)
+        )
+        prune_chat_summaries(conn, chat_id, keep_versions(conn))
+        # only the latest summary of a chat is retrievable
+        conn.execute(
+            "DELETE FROM embeddings WHERE source = 'chat_summary' AND chat_id = ?",
+            (chat_id,)
+        )
+        index_text(conn, "chat_summary", cur.lastrowid, chat_id, text)
+        # keep the materialized prompt context current
+        conn.execute(
+            "UPDATE chat_context SET chat_summary = ?, updated_at = ? WHERE chat_id = ?",
+            (text, self._now(), chat_id)
+        )
+        conn.commit()
+        conn.close()
+        return cur.lastrowid
+
     def append_archive(self, chat_id, user_text, assistant_text):
         # MVP: archive is implicit via messages table
         return
@@ -115,7 +207,7 @@ class ChatService:
         """Return all messages in chronological order."""
         conn = self.db.connect()
         cur = conn.execute(
-            "SELECT role, content, ts FROM messages "
+            "SELECT role, unpack(content, fmt) AS content, ts FROM messages "
             "WHERE chat_id=? ORDER BY id ASC",
             (chat_id,)
         )
@@ -138,6 +230,13 @@ class ChatService:
         conn.close()
         return count == 0
 
+    def touch(self, chat_id):
+        """Mark the chat as used now."""
+        conn = self.db.connect()
+        conn.execute("UPDATE chats SET last_used = ? WHERE id = ?", (self._now(), chat_id))
+        conn.commit()
+        conn.close()
+
     def update_title(self, chat_id, title: str):
         """Update the chat's title."""
         conn = self.db.connect()
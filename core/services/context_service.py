@@ -0,0 +1,275 @@
+# core/services/context_service.py
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Dict, List, Optional, Tuple
+
+from core.services.embedding_service import MAX_SNIPPET_CHARS
+from core.utils.tokens import estimate_tokens, estimator_name
+
+
+@dataclass
+class ContextSnapshot:
+    """Everything the prompt context is built from, for one chat."""
+
+    project_summary: str = ""
+    chat_summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (role, content), oldest first
+
+
+class ContextSnapshotService:
+    """
+    Materialized per-chat context in the chat_context table.
+
+    load() is a single primary-key lookup. Rows are created on first use;
+    afterwards the summary writers (ChatService.add_chat_summary,
+    ProjectService.add_project_summary) push new text into them and
+    MessageService.add_message clears recent_turns, which load() rebuilds
+    on demand. invalidate() drops a row outright.
+    """
+
+    def __init__(self, db, project_svc, chat_svc, msg_svc=None, max_turns: int = 40):
+        self.db = db
+        self.project_svc = project_svc
+        self.chat_svc = chat_svc
+        self.msg_svc = msg_svc
+        self.max_turns = max_turns
+
+    def _now(self):
+        # timezone-aware UTC with trailing Z
+        return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+    def load(self, project: str, chat_id: str) -> ContextSnapshot:
+        conn = self.db.connect()
+        row = conn.execute(
+            "SELECT project_name, project_summary, chat_summary, recent_turns "
+            "FROM chat_context WHERE chat_id = ?",
+            (chat_id,)
+        ).fetchone()
+        conn.close()
+
+        if row is None or row["project_name"] != project:
+            return self.refresh(project, chat_id)
+
+        snapshot = ContextSnapshot(row["project_summary"] or "", row["chat_summary"] or "")
+        if row["recent_turns"] is not None:
+            snapshot.turns = [tuple(t) for t in json.loads(row["recent_turns"])]
+        elif self.msg_svc is not None:
+            snapshot.turns = self._load_turns(chat_id)
+            self._store(chat_id, project, snapshot, only_turns=True)
+        return snapshot
+
+    def refresh(self, project: str, chat_id: str) -> ContextSnapshot:
+        """Recompute the snapshot from the services and store it."""
+        snapshot = ContextSnapshot(
+            self.project_svc.get_distilled_project(project) or "",
+            self.chat_svc.get_distilled_chat(chat_id) or "",
+            self._load_turns(chat_id) if self.msg_svc is not None else [],
+        )
+        self._store(chat_id, project, snapshot)
+        return snapshot
+
+    def invalidate(self, chat_id: str):
+        conn = self.db.connect()
+        conn.execute("DELETE FROM chat_context WHERE chat_id = ?", (chat_id,))
+        conn.commit()
+        conn.close()
+
+    def _load_turns(self, chat_id):
+        rows = self.msg_svc.last_messages(chat_id, limit=self.max_turns)
+        return [(r["role"], r["content"] or "") for r in rows]
+
+    def _store(self, chat_id, project, snapshot, only_turns=False):
+        # without a message service the turn block is unknown, not empty
+        turns = json.dumps(snapshot.turns) if self.msg_svc is not None else None
+        conn = self.db.connect()
+        if only_turns:
+            conn.execute(
+                "UPDATE chat_context SET recent_turns = ?, updated_at = ? WHERE chat_id = ?",
+                (turns, self._now(), chat_id)
+            )
+        else:
+            conn.execute(
+                "INSERT INTO chat_context(chat_id, project_name, project_summary, "
+                "chat_summary, recent_turns, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET "
+                "project_name = excluded.project_name, "
+                "project_summary = excluded.project_summary, "
+                "chat_summary = excluded.chat_summary, "
+                "recent_turns = excluded.recent_turns, "
+                "updated_at = excluded.updated_at",
+                (chat_id, project, snapshot.project_summary, snapshot.chat_summary,
+                 turns, self._now())
+            )
+        conn.commit()
+        conn.close()
+
+
+@dataclass
+class ContextReport:
+    """How the prompt's token budget was spent."""
+
+    budget: int
+    estimator: str
+    sections: Dict[str, int] = field(default_factory=dict)   # name → tokens
+    dropped: List[str] = field(default_factory=list)
+    turns_included: int = 0
+    turns_available: int = 0
+
+    @property
+    def used(self) -> int:
+        return sum(self.sections.values())
+
+    def summary(self) -> str:
+        parts = [f"{name} {tokens}" for name, tokens in self.sections.items()]
+        line = f"context {self.used}/{self.budget} tokens ({self.estimator})"
+        if parts:
+            line += ": " + ", ".join(parts)
+        line += f"; turns {self.turns_included}/{self.turns_available}"
+        if self.dropped:
+            line += "; dropped " + ", ".join(self.dropped)
+        return line
+
+
+class ContextAssembler:
+    """
+    Packs optional context around the parts a prompt must contain.
+
+    Required parts (current message, style guide, files) are always kept.
+    The remaining budget goes to the project summary, then the chat
+    summary, then as many recent turns as fit, most recent first.
+    With a ContextSnapshotService all of it comes from one lookup.
+    Whatever is still free goes to past messages and chat summaries that
+    the retriever (an EmbeddingService) finds similar to the query.
+    """
+
+    def __init__(self, project_svc, chat_svc, msg_svc=None,
+                 budget: int = 8000, model: Optional[str] = None, max_turns: int = 40,
+                 snapshots: Optional[ContextSnapshotService] = None,
+                 retriever=None, related_k: int = 5):
+        self.project_svc = project_svc
+        self.chat_svc = chat_svc
+        self.msg_svc = msg_svc
+        self.budget = budget
+        self.model = model
+        self.max_turns = max_turns
+        self.snapshots = snapshots
+        self.retriever = retriever
+        self.related_k = related_k
+
+    def _snapshot(self, project: str, chat_id: str) -> ContextSnapshot:
+        if self.snapshots is not None:
+            return self.snapshots.load(project, chat_id)
+        turns = []
+        if self.msg_svc is not None and self.max_turns > 0:
+            turns = [
+                (r["role"], r["content"] or "")
+                for r in self.msg_svc.last_messages(chat_id, limit=self.max_turns)
+            ]
+        return ContextSnapshot(
+            self.project_svc.get_distilled_project(project),
+            self.chat_svc.get_distilled_chat(chat_id),
+            turns,
+        )
+
+    def _tokens(self, text: str) -> int:
+        # +1 for the blank-line separator each part is joined with
+        return estimate_tokens(text, self.model) + 1
+
+    def assemble(self, project: str, chat_id: str, required: List[Tuple[str, str]],
+                 query: str = "") -> Tuple[List[str], List[str], ContextReport]:
+        """
+        required: [(section name, text)] that must be in the prompt.
+        query: text to retrieve related snippets for (the user message).
+        Returns (context_parts, required_parts, report); the prompt is the
+        context parts followed by the required parts.
+        """
+        report = ContextReport(budget=self.budget, estimator=estimator_name(self.model))
+
+        for name, text in required:
+            report.sections[name] = report.sections.get(name, 0) + self._tokens(text)
+        remaining = self.budget - report.used
+
+        snapshot = self._snapshot(project, chat_id)
+
+        context = []
+        for name, header, text in (
+            ("project", "[PROJECT_CONTEXT]", snapshot.project_summary),
+            ("chat", "[CHAT_CONTEXT]", snapshot.chat_summary),
+        ):
+            if not text:
+                continue
+            part = f"{header}\n{text}\n"
+            cost = self._tokens(part)
+            if cost <= remaining:
+                context.append(part)
+                report.sections[name] = cost
+                remaining -= cost
+            else:
+                report.dropped.append(name)
+
+        turns_part = self._recent_turns(snapshot.turns, remaining, report)
+        remaining -= report.sections.get("turns", 0)
+
+        related_part = self._related(project, query, snapshot.turns, remaining, report)
+        if related_part:
+            context.append(related_part)
+        if turns_part:
+            context.append(turns_part)
+
+        return context, [text for _, text in required], report
+
+    def _recent_turns(self, turns, remaining: int, report: ContextReport) -> str:
+        turns = turns[-self.max_turns:] if self.max_turns > 0 else []
+        report.turns_available = len(turns)
+
+        header = "[RECENT_TURNS]"
+        spent = self._tokens(header)
+        picked = []
+        for role, content in reversed(turns):  # newest first
+            line = f"{role.upper()}: {content.strip()}"
+            cost = estimate_tokens(line, self.model) + 1
+            if spent + cost > remaining:
+                break
+            picked.append(line)
+            spent += cost
+
+        report.turns_included = len(picked)
+        if not picked:
+            if turns:
+                report.dropped.append("turns")
+            return ""
+
+        report.sections["turns"] = spent
+        return header + "\n" + "\n".join(reversed(picked)) + "\n"
+
+    def _related(self, project, query, turns, remaining: int, report: ContextReport) -> str:
+        if self.retriever is None or not query or self.related_k <= 0:
+            return ""
+        hits = self.retriever.related(
+            project, query, k=self.related_k,
+            exclude=[content for _, content in turns] + [query],
+        )
+        if not hits:
+            return ""
+
+        header = "[RELATED_CONTEXT]"
+        spent = self._tokens(header)
+        picked = []
+        for hit in hits:  # best first
+            text = " ".join(hit.text.split())
+            if len(text) > MAX_SNIPPET_CHARS:
+                text = text[:MAX_SNIPPET_CHARS] + "…"
+            line = f"- {hit.role.upper()} @ {hit.ts}: {text}"
+            cost = estimate_tokens(line, self.model) + 1
+            if spent + cost > remaining:
+                continue
+            picked.append(line)
+            spent += cost
+
+        if not picked:
+            report.dropped.append("related")
+            return ""
+
+        report.sections["related"] = spent
+        return header + "\n" + "\n".join(picked) + "\n"
@@ -0,0 +1,170 @@
+# core/services/distill_policy.py
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Optional
+
+from core.db.database import Database
+
+
+def _parse_ts(ts) -> Optional[datetime]:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+@dataclass
+class Decision:
+    run: bool
+    reason: str
+    new_chars: int
+    new_turns: int
+    upto_message_id: int
+
+
+@dataclass
+class DistillPolicy:
+    """
+    When is a chat worth re-distilling?
+
+    Counts the content added since the last distillation that ran for the
+    chat and runs once any threshold is crossed. A threshold of 0 is off;
+    with everything off, any new message triggers a run (the old behaviour).
+
+    Stored in the settings table as distill.min_chars, distill.min_tokens,
+    distill.min_turns and distill.max_interval_s.
+
+    A skipped chat is only looked at again when it gets a new message, so
+    stale_skips() finds the ones max_interval_s has since made due.
+    """
+
+    min_chars: int = 1500
+    min_tokens: int = 0
+    min_turns: int = 4
+    max_interval_s: int = 3600
+
+    SETTINGS_PREFIX = "distill."
+    FIELDS = ("min_chars", "min_tokens", "min_turns", "max_interval_s")
+
+    @classmethod
+    def from_settings(cls, settings) -> "DistillPolicy":
+        policy = cls()
+        for name in cls.FIELDS:
+            raw = settings.get(cls.SETTINGS_PREFIX + name)
+            if raw is None:
+                continue
+            try:
+                setattr(policy, name, max(int(raw), 0))
+            except ValueError:
+                pass  # keep the default for unparseable values
+        return policy
+
+    def save(self, settings):
+        for name in self.FIELDS:
+            settings.set(self.SETTINGS_PREFIX + name, getattr(self, name))
+
+    # -------------------------------------------------
+    # Evaluation
+    # -------------------------------------------------
+    def evaluate(self, db: Database, chat_id: str, now: Optional[datetime] = None) -> Decision:
+        conn = db.connect()
+        last = conn.execute(
+            "SELECT upto_message_id, created_at FROM distill_decisions "
+            "WHERE chat_id = ? AND decision = 'run' ORDER BY id DESC LIMIT 1",
+            (chat_id,)
+        ).fetchone()
+        watermark = last["upto_message_id"] if last else 0
+
+        new = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(unpack(content, fmt))), 0) AS chars, "
+            "       COALESCE(SUM(role = 'user'), 0) AS turns, "
+            "       MAX(id) AS upto, MIN(ts) AS first_ts "
+            "FROM messages WHERE chat_id = ? AND id > ?",
+            (chat_id, watermark)
+        ).fetchone()
+        conn.close()
+
+        chars, turns = new["chars"], new["turns"]
+        upto = new["upto"] or watermark
+
+        def decide(run, reason):
+            return Decision(run, reason, chars, turns, upto)
+
+        if new["upto"] is None:
+            return decide(False, "no new messages")
+
+        thresholds = (self.min_chars, self.min_tokens, self.min_turns, self.max_interval_s)
+        if not any(thresholds):
+            return decide(True, "no thresholds configured")
+
+        if self.min_chars and chars >= self.min_chars:
+            return decide(True, f"new chars {chars} >= {self.min_chars}")
+        tokens = chars // 4  # heuristic: ~4 characters per token
+        if self.min_tokens and tokens >= self.min_tokens:
+            return decide(True, f"new tokens ~{tokens} >= {self.min_tokens}")
+        if self.min_turns and turns >= self.min_turns:
+            return decide(True, f"new turns {turns} >= {self.min_turns}")
+
+        if self.max_interval_s:
+            # measured from the last run, or from the first undistilled message
+            since = _parse_ts(last["created_at"]) if last else _parse_ts(new["first_ts"])
+            now = now or datetime.now(UTC)
+            if since is not None and (now - since).total_seconds() >= self.max_interval_s:
+                return decide(True, f"interval {self.max_interval_s}s elapsed")
+
+        return decide(False, "below thresholds")
+
+    @staticmethod
+    def record(db: Database, chat_id: str, project_name: str, decision: Decision):
+        conn = db.connect()
+        conn.execute(
+            "INSERT INTO distill_decisions(chat_id, project_name, decision, reason, "
+            "new_chars, new_turns, upto_message_id, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                chat_id, project_name, "run" if decision.run else "skip",
+                decision.reason, decision.new_chars, decision.new_turns,
+                decision.upto_message_id,
+                datetime.now(UTC).isoformat().replace("+00:00", "Z"),
+            )
+        )
+        conn.commit()
+        conn.close()
+
+    def stale_skips(self, db: Database, now: Optional[datetime] = None):
+        """
+        (chat_id, project_name) of chats whose latest decision skipped
+        undistilled messages at least max_interval_s ago. Decisions are
+        walked by id from the distill.recheck_upto setting, so each skip is
+        considered once, when it comes of age.
+        """
+        if not self.max_interval_s:
+            return []
+        now = now or datetime.now(UTC)
+        cutoff = (now - timedelta(seconds=self.max_interval_s)).isoformat().replace("+00:00", "Z")
+        conn = db.connect()
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = 'distill.recheck_upto'"
+        ).fetchone()
+        mark = int(row["value"]) if row is not None else 0
+        rows = conn.execute(
+            "SELECT d.id, d.chat_id, d.project_name, d.decision = 'skip' AND NOT EXISTS ("
+            "  SELECT 1 FROM distill_decisions n WHERE n.chat_id = d.chat_id AND n.id > d.id"
+            ") AND d.upto_message_id > COALESCE(("
+            "  SELECT MAX(r.upto_message_id) FROM distill_decisions r "
+            "  WHERE r.chat_id = d.chat_id AND r.decision = 'run'), 0"
+            ") AS stale FROM distill_decisions d "
+            "WHERE d.id > ? AND d.created_at <= ? ORDER BY d.id",
+            (mark, cutoff)
+        ).fetchall()
+        if rows:
+            conn.execute(
+                "INSERT INTO settings(key, value) VALUES ('distill.recheck_upto', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(rows[-1]["id"]),)
+            )
+            conn.commit()
+        conn.close()
+        return [(r["chat_id"], r["project_name"]) for r in rows if r["stale"]]
@@ -0,0 +1,265 @@
+# core/services/embedding_service.py
+"""
+Offline embeddings for retrieving relevant past messages.
+
+embed() is a signed hashing vectorizer over lower-cased word unigrams and
+bigrams: DIM float32 values, L2-normalized, stable across processes
+(crc32, not hash()). No model, network or GPU is involved.
+
+Vectors are written next to the text they describe (MessageService and
+ChatService call index_text). Each project's vectors are kept in memory as
+one float32 array, topped up with new rows on every search, and scored
+with one matrix-vector product when numpy is installed; the plain loop
+used otherwise only looks at the newest MAX_PLAIN_CANDIDATES.
+"""
+import heapq
+import math
+import re
+import threading
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, List
+
+from core.db.database import Database
+
+DIM = 256
+DEFAULT_TOP_K = 5
+MIN_SCORE = 0.15
+MAX_SNIPPET_CHARS = 800
+MAX_PLAIN_CANDIDATES = 5000     # vectors scored per search without numpy
+
+_WORD = re.compile(r"\w+")
+
+
+def embed(text: str) -> array:
+    """Hashing-vectorizer embedding of text as array('f') of length DIM."""
+    vec = [0.0] * DIM
+    prev = None
+    for word in _WORD.findall((text or "").lower()):
+        for token in (word, f"{prev} {word}" if prev else None):
+            if token is None:
+                continue
+            h = zlib.crc32(token.encode("utf-8"))
+            # low bits pick the bucket, the top bit the sign
+            vec[h % DIM] += 1.0 if h & 0x80000000 else -1.0
+        prev = word
+
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm:
+        vec = [v / norm for v in vec]
+    return array("f", vec)
+
+
+def index_text(conn, source: str, source_id: int, chat_id: str, text: str):
+    """Store (or replace) the embedding of one message or summary."""
+    index_texts(conn, [(source, source_id, chat_id, text)])
+
+
+def index_texts(conn, items):
+    """
+    index_text() for many [(source, source_id, chat_id, text)] at once.
+    Every item gets a row; project_id stays NULL when the chat has no
+    chats row (e.g. `ai -c <new id>`), so backfills always finish.
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings(source, source_id, chat_id, project_id, vec) "
+        "VALUES (?, ?, ?, (SELECT project_id FROM chats WHERE id = ?), ?)",
+        [(source, source_id, chat_id, chat_id, embed(text).tobytes())
+         for source, source_id, chat_id, text in items]
+    )
+
+
+@dataclass
+class RelatedHit:
+    source: str
+    source_id: int
+    chat_id: str
+    role: str
+    text: str
+    ts: str
+    score: float
+
+
+class _ProjectVectors:
+    """
+    One project's embeddings in memory: keys[i] is the (source, source_id)
+    of row i of vecs (DIM floats each). refresh() reads only rows past
+    max_rowid; it reloads everything when embedding_changes counts new
+    deletions or the table lost rows (a recreated database).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.keys = []
+        self.rows = {}
+        self.vecs = array("f")
+        self.max_rowid = 0
+        self.deletes = None
+
+    def refresh(self, conn, project_id):
+        state = conn.execute(
+            "SELECT (SELECT deletes FROM embedding_changes WHERE project_id = ?) AS deletes, "
+            "       (SELECT MAX(rowid) FROM embeddings WHERE project_id = ?) AS max_rowid",
+            (project_id, project_id)
+        ).fetchone()
+        deletes = state["deletes"] or 0
+        if deletes != self.deletes or (state["max_rowid"] or 0) < self.max_rowid:
+            self._clear()
+
+        for r in conn.execute(
+            "SELECT rowid, source, source_id, vec FROM embeddings "
+            "WHERE project_id = ? AND rowid > ? ORDER BY rowid",
+            (project_id, self.max_rowid)
+        ):
+            key = (r["source"], r["source_id"])
+            i = self.rows.get(key)
+            if i is None:  # INSERT OR REPLACE gives a re-indexed text a new rowid
+                self.rows[key] = len(self.keys)
+                self.keys.append(key)
+                self.vecs.frombytes(r["vec"])
+            else:
+                self.vecs[i * DIM:(i + 1) * DIM] = array("f", r["vec"])
+            self.max_rowid = r["rowid"]
+        self.deletes = deletes
+
+    def top(self, query, n, min_score):
+        """[(score, source, source_id)] of the n best rows above min_score."""
+        count = len(self.keys)
+        if not count:
+            return []
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            scores = (np.frombuffer(self.vecs, dtype=np.float32).reshape(count, DIM)
+                      @ np.frombuffer(query, dtype=np.float32))
+            n = min(n, count)
+            best = np.argpartition(-scores, n - 1)[:n]
+            ranked = sorted(best, key=lambda i: -scores[i])
+            return [(float(scores[i]), *self.keys[i]) for i in ranked if scores[i] >= min_score]
+
+        scored = (
+            (sum(a * b for a, b in zip(self.vecs[i * DIM:(i + 1) * DIM], query)), *self.keys[i])
+            for i in range(max(count - MAX_PLAIN_CANDIDATES, 0), count)
+        )
+        return [c for c in heapq.nlargest(n, scored) if c[0] >= min_score]
+
+
+_vectors = {}               # (db path, project id) -> _ProjectVectors
+_vectors_lock = threading.Lock()
+
+
+def _project_vectors(db_path, project_id) -> _ProjectVectors:
+    with _vectors_lock:
+        return _vectors.setdefault((db_path, project_id), _ProjectVectors())
+
+
+class EmbeddingService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    # -------------------------------------------------
+    # Indexing
+    # -------------------------------------------------
+    def index_missing(self, batch: int = 1000) -> int:
+        """
+        Embed messages (and latest chat summaries) written before the index
+        existed. Messages are walked by id from the embeddings.backfill_upto
+        setting, `batch` per call, so once caught up a call costs one
+        primary-key lookup; later messages are indexed as they are written.
+        Returns how many rows were added.
+        """
+        conn = self.db.connect()
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = 'embeddings.backfill_upto'"
+        ).fetchone()
+        mark = int(row["value"]) if row is not None else 0
+        messages = conn.execute(
+            "SELECT m.id, m.chat_id, unpack(m.content, m.fmt) AS text, EXISTS ("
+            "  SELECT 1 FROM embeddings e WHERE e.source = 'message' AND e.source_id = m.id"
+            ") AS indexed FROM messages m WHERE m.id > ? ORDER BY m.id LIMIT ?",
+            (mark, batch)
+        ).fetchall()
+        summaries = conn.execute(
+            "SELECT s.id, s.chat_id, s.summary AS text "
+            "FROM latest_chat_summary l JOIN chat_summaries s ON s.id = l.summary_id "
+            "WHERE NOT EXISTS ("
+            "  SELECT 1 FROM embeddings e WHERE e.source = 'chat_summary' AND e.source_id = s.id) "
+            "LIMIT ?",
+            (batch,)
+        ).fetchall()
+
+        items = [("message", r["id"], r["chat_id"], r["text"] or "")
+                 for r in messages if not r["indexed"]]
+        items += [("chat_summary", r["id"], r["chat_id"], r["text"] or "") for r in summaries]
+        index_texts(conn, items)
+        if messages:
+            conn.execute(
+                "INSERT INTO settings(key, value) VALUES ('embeddings.backfill_upto', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(messages[-1]["id"]),)
+            )
+        conn.commit()
+        conn.close()
+        return len(items)
+
+    # -------------------------------------------------
+    # Retrieval
+    # -------------------------------------------------
+    def related(self, project: str, text: str, k: int = DEFAULT_TOP_K,
+                min_score: float = MIN_SCORE, exclude: Iterable[str] = ()) -> List[RelatedHit]:
+        """
+        The k stored texts of `project` most similar to `text` (cosine,
+        best first), skipping any whose text is in `exclude`.
+        """
+        query = embed(text)
+        if k <= 0 or not any(query):
+            return []
+        exclude = {e.strip() for e in exclude}
+
+        conn = self.db.connect()
+        row = conn.execute("SELECT id FROM projects WHERE name = ?", (project,)).fetchone()
+        if row is None:
+            conn.close()
+            return []
+        vectors = _project_vectors(self.db.db_path, row["id"])
+        with vectors.lock:
+            vectors.refresh(conn, row["id"])
+            candidates = vectors.top(query, k + len(exclude), min_score)
+
+        hits = []
+        for score, source, source_id in candidates:
+            hit = self._load(conn, source, source_id, score)
+            if hit is None or hit.text.strip() in exclude:
+                continue
+            hits.append(hit)
+            if len(hits) == k:
+                break
+        conn.close()
+        return hits
+
+    @staticmethod
+    def _load(conn, source, source_id, score):
+        if source == "message":
+            r = conn.execute(
+                "SELECT chat_id, role, unpack(content, fmt) AS content, ts "
+                "FROM messages WHERE id = ?", (source_id,)
+            ).fetchone()
+            if r is None:
+                return None
+            return RelatedHit(source, source_id, r["chat_id"], r["role"],
+                              r["content"] or "", r["ts"], score)
+
+        r = conn.execute(
+            "SELECT chat_id, summary, created_at FROM chat_summaries WHERE id = ?", (source_id,)
+        ).fetchone()
+        if r is None:
+            return None
+        return RelatedHit(source, source_id, r["chat_id"], "summary",
+                          r["summary"] or "", r["created_at"], score)
@@ -0,0 +1,256 @@
+# core/services/file_index_service.py
+"""
+File selection for --filemode.
+
+A selector is a comma-separated list of:
+  N, N-M      indexes into list_files(): the sorted files of the directory
+  DIR         every file below DIR
+  GLOB        files matching GLOB below the directory ("*" stays within a
+              path segment, "**" crosses them; no "/" = match the file name)
+  FILE        that file
+
+Recursive walks skip .git and whatever .gitignore files exclude. Each
+directory's sorted listing is cached in dir_index and reused while the
+directory's mtime is unchanged, so a repeated walk costs one stat per
+directory instead of a scandir.
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from core.db.database import Database
+
+ALWAYS_SKIP = {".git", ".hg", ".svn"}
+_RANGE = re.compile(r"^(\d+)(?:-(\d+))?$")
+_GLOB_CHARS = set("*?[")
+
+
+def glob_regex(pattern: str) -> "re.Pattern":
+    """Regex for a glob where * and ? stay within one segment and ** spans segments."""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+class GitIgnore:
+    """The .gitignore rules in effect for one directory (parents' included)."""
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)    # (base, regex, negate, dir_only, anchored)
+
+    def extended(self, base: str, text: str) -> "GitIgnore":
+        rules = list(self.rules)
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            rules.append((base, glob_regex(line.lstrip("/")), negate, dir_only, anchored))
+        return GitIgnore(rules)
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        """rel: path relative to the walk root, "/"-separated."""
+        result = False
+        for base, regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel.startswith(base + "/"):
+                    continue
+                sub = rel[len(base) + 1:]
+            else:
+                sub = rel
+            target = sub if anchored else sub.rsplit("/", 1)[-1]
+            if regex.match(target):
+                result = not negate
+        return result
+
+
+def _repo_top(path: str) -> str:
+    """Nearest ancestor of path (itself included) holding .git, else path."""
+    probe = path
+    while True:
+        if os.path.exists(os.path.join(probe, ".git")):
+            return probe
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            return path
+        probe = parent
+
+
+def _read_ignore(ignore: GitIgnore, path: str, rel: str) -> GitIgnore:
+    try:
+        with open(os.path.join(path, ".gitignore"), "r", errors="ignore") as fh:
+            return ignore.extended(rel, fh.read())
+    except OSError:
+        return ignore
+
+
+class FileIndexService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db
+
+    # -------------------------------------------------
+    # Directory listings (cached by mtime)
+    # -------------------------------------------------
+    def _load_cache(self, root: str) -> Dict[str, Tuple[int, str]]:
+        if self.db is None:
+            return {}
+        conn = self.db.connect()
+        rows = conn.execute(
+            "SELECT path, mtime_ns, entries FROM dir_index "
+            "WHERE path = ? OR (path > ? AND path < ?)",
+            (root, root.rstrip("/") + "/", root.rstrip("/") + "0")
+        ).fetchall()
+        conn.close()
+        return {r["path"]: (r["mtime_ns"], r["entries"]) for r in rows}
+
+    def _entries(self, path: str, cache, stale) -> List[Tuple[str, bool]]:
+        mtime = os.stat(path).st_mtime_ns
+        hit = cache.get(path)
+        if hit is not None and hit[0] == mtime:
+            return [tuple(e) for e in json.loads(hit[1])]
+
+        entries = sorted(
+            (e.name, e.is_dir(follow_symlinks=False)) for e in os.scandir(path)
+        )
+        stale.append((path, mtime, json.dumps(entries)))
+        return entries
+
+    def _save(self, stale):
+        if self.db is None or not stale:
+            return
+        conn = self.db.connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO dir_index(path, mtime_ns, entries) VALUES (?, ?, ?)",
+            stale
+        )
+        conn.commit()
+        conn.close()
+
+    def list_files(self, directory: str = ".") -> List[str]:
+        """Sorted file names in directory (what index selectors refer to)."""
+        path = os.path.abspath(directory)
+        cache, stale = self._load_cache(path), []
+        names = [name for name, is_dir in self._entries(path, cache, stale) if not is_dir]
+        self._save(stale)
+        return names
+
+    def walk(self, directory: str = ".") -> List[str]:
+        """Every non-ignored file below directory, relative to it, sorted."""
+        root = os.path.abspath(directory)
+        top = _repo_top(root)
+        prefix = "" if top == root else os.path.relpath(root, top).replace(os.sep, "/")
+        cache, stale = self._load_cache(root), []
+        files = []
+
+        # rel: path relative to the repository top, which .gitignore rules use
+        def visit(path, rel, ignore):
+            entries = self._entries(path, cache, stale)
+            if any(name == ".gitignore" and not is_dir for name, is_dir in entries):
+                ignore = _read_ignore(ignore, path, rel)
+            for name, is_dir in entries:
+                child = f"{rel}/{name}" if rel else name
+                if is_dir and name in ALWAYS_SKIP:
+                    continue
+                if ignore.ignored(child, is_dir):
+                    continue
+                if is_dir:
+                    visit(os.path.join(path, name), child, ignore)
+                else:
+                    files.append(child[len(prefix) + 1:] if prefix else child)
+
+        # rules from .gitignore files between the repository top and root
+        ignore = GitIgnore()
+        if prefix:
+            parts = prefix.split("/")
+            for depth in range(len(parts)):
+                rel = "/".join(parts[:depth])
+                ignore = _read_ignore(ignore, os.path.join(top, *parts[:depth]), rel)
+
+        visit(root, prefix, ignore)
+        self._save(stale)
+        return sorted(files)
+
+    # -------------------------------------------------
+    # Selectors
+    # -------------------------------------------------
+    def select(self, selector: str, directory: str = ".") -> List[str]:
+        """
+        Paths (relative to directory, in selector order, no duplicates) for
+        a selector. Raises ValueError for an index or path that matches
+        nothing.
+        """
+        out, seen = [], set()
+
+        def add(paths):
+            for p in paths:
+                if p not in seen:
+                    seen.add(p)
+                    out.append(p)
+
+        listing = None
+        for token in (t.strip() for t in selector.split(",")):
+            if not token:
+                continue
+            m = _RANGE.match(token)
+            if m:
+                if listing is None:
+                    listing = self.list_files(directory)
+                a = int(m.group(1))
+                b = int(m.group(2)) if m.group(2) else a
+                picked = [listing[i] for i in range(a, b + 1) if 0 <= i < len(listing)]
+                if not picked:
+                    raise ValueError(f"no file at index {token} ({len(listing)} files)")
+                add(os.path.join(directory, p) if directory != "." else p for p in picked)
+                continue
+
+            full = os.path.join(directory, token)
+            if os.path.isdir(full):
+                add(os.path.normpath(os.path.join(token, p)) for p in self.walk(full))
+            elif os.path.isfile(full):
+                add([os.path.normpath(token)])
+            elif _GLOB_CHARS & set(token):
+                regex = glob_regex(token[2:] if token.startswith("./") else token)
+                matches = [
+                    p for p in self.walk(directory)
+                    if regex.match(p if "/" in token else p.rsplit("/", 1)[-1])
+                ]
+                if not matches:
+                    raise ValueError(f"no files match {token}")
+                add(matches)
+            else:
+                raise ValueError(f"no such file or directory: {token}")
+        return out
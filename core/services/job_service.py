@@ -0,0 +1,141 @@
+# core/services/job_service.py
+from datetime import datetime, timedelta, UTC
+from core.db.database import Database
+
+STALE_RUNNING_S = 3600  # a 'running' job this old has lost its worker
+
+
+class JobService:
+    """
+    Durable job queue stored in the jobs table.
+
+    Producers enqueue(); a worker claim()s the oldest pending job together
+    with every other pending job of the same kind and project, so a burst of
+    turns on one project becomes a single unit of work. A job left
+    'running' by a worker that died is put back with requeue_stale().
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def _now(self):
+        # timezone-aware UTC with trailing Z
+        return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+    def enqueue(self, kind, project_name, chat_id=None) -> int:
+        conn = self.db.connect()
+        cur = conn.execute(
+            "INSERT INTO jobs(kind, project_name, chat_id, status, created_at) "
+            "VALUES (?, ?, ?, 'pending', ?)",
+            (kind, project_name, chat_id, self._now())
+        )
+        conn.commit()
+        conn.close()
+        return cur.lastrowid
+
+    def pending_count(self, kind=None) -> int:
+        conn = self.db.connect()
+        if kind is None:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'pending'"
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'pending' AND kind = ?",
+                (kind,)
+            ).fetchone()
+        conn.close()
+        return row[0]
+
+    def claim(self, kind):
+        """
+        Atomically take the oldest pending job of this kind and fold every
+        other pending job for the same project into it.
+
+        Returns (job, chat_ids) — chat_ids lists the distinct chats covered,
+        the claimed job's own chat first — or (None, []) when idle.
+        """
+        conn = self.db.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' AND kind = ? "
+                "ORDER BY id LIMIT 1",
+                (kind,)
+            ).fetchone()
+            if job is None:
+                conn.commit()
+                return None, []
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                (self._now(), job["id"])
+            )
+            folded = conn.execute(
+                "SELECT id, chat_id FROM jobs "
+                "WHERE status = 'pending' AND kind = ? AND project_name IS ? "
+                "ORDER BY id",
+                (kind, job["project_name"])
+            ).fetchall()
+            if folded:
+                conn.executemany(
+                    "UPDATE jobs SET status = 'merged', merged_into = ?, "
+                    "finished_at = ? WHERE id = ?",
+                    [(job["id"], self._now(), r["id"]) for r in folded]
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        chat_ids = [job["chat_id"]]
+        for r in folded:
+            if r["chat_id"] not in chat_ids:
+                chat_ids.append(r["chat_id"])
+        return job, chat_ids
+
+    def finish(self, job_id, duration_ms, error=None):
+        """Record the outcome of a claimed job."""
+        conn = self.db.connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, duration_ms = ?, error = ? "
+            "WHERE id = ?",
+            ("failed" if error else "done", self._now(), int(duration_ms), error, job_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def requeue_stale(self, kind, older_than_s=STALE_RUNNING_S) -> int:
+        """
+        Make 'running' jobs started more than older_than_s ago pending again,
+        together with the jobs merged into them. Returns how many jobs of
+        this kind were running.
+        """
+        cutoff = (datetime.now(UTC) - timedelta(seconds=older_than_s)).isoformat()
+        cutoff = cutoff.replace("+00:00", "Z")
+        conn = self.db.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stale = [r["id"] for r in conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND kind = ? AND started_at <= ?",
+                (kind, cutoff)
+            )]
+            for job_id in stale:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', merged_into = NULL, finished_at = NULL "
+                    "WHERE status = 'merged' AND merged_into = ?",
+                    (job_id,)
+                )
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', started_at = NULL WHERE id = ?",
+                    (job_id,)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return len(stale)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+core.services.llm_backends
+
+Ways for LLMService to turn a prompt into streamed text:
+- SubprocessBackend: runs `llm prompt` for every call (default), with
+  -m $LLMCUI_LLM_MODEL when that is set
+- InProcessBackend: imports the llm library once and reuses resolved models
+- FakeBackend: deterministic local replies for tests and benchmarks
+
+get_backend(name) builds one by name. LLMService picks the backend from
+$LLMCUI_LLM_BACKEND when none is passed, so callers never change.
+"""
+import abc
+import codecs
+import hashlib
+import os
+import selectors
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Union
+
+
+class LLMError(RuntimeError):
+    """The llm invocation failed; the message is meant for the user."""
+
+
+class LLMBackend(abc.ABC):
+    """Interface: stream(prompt_text, timeout) yields output text pieces."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def stream(self, prompt_text: str, timeout: float = 120) -> Iterator[str]:
+        raise NotImplementedError
+
+    def model_key(self) -> Optional[str]:
+        """Id of the model the next call will use; None when it can't be known."""
+        return None
+
+
+# -------------------------------------------------
+# Subprocess: one `llm prompt` process per call
+# -------------------------------------------------
+class SubprocessBackend(LLMBackend):
+    name = "subprocess"
+
+    def __init__(self, llm_cmd: str = "llm", model_id: Optional[str] = None):
+        self.llm_cmd = llm_cmd
+        self.model_id = model_id or os.environ.get("LLMCUI_LLM_MODEL") or None
+
+    def model_key(self) -> Optional[str]:
+        """model_id, else llm's current default (`llm models default`)."""
+        if self.model_id:
+            return self.model_id
+        try:
+            out = subprocess.run(
+                [self.llm_cmd, "models", "default"],
+                capture_output=True, text=True, timeout=10,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        model = out.stdout.strip()
+        return model if out.returncode == 0 and model else None
+
+    def stream(self, prompt_text: str, timeout: float = 120) -> Iterator[str]:
+        """
+        Yield stdout text as the llm binary emits it. Raises LLMError on a
+        non-zero exit or timeout. Closing the generator early (or Ctrl-C
+        while iterating) kills the subprocess.
+        """
+        deadline = time.perf_counter() + timeout
+
+        p = subprocess.Popen(
+            [self.llm_cmd, "prompt"] + (["-m", self.model_id] if self.model_id else []),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        def _feed():
+            try:
+                p.stdin.write(prompt_text.encode("utf-8"))
+                p.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+        # feed stdin from a thread so a large prompt can't deadlock the reader
+        threading.Thread(target=_feed, daemon=True).start()
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        err = bytearray()
+        sel = selectors.DefaultSelector()
+        sel.register(p.stdout, selectors.EVENT_READ)
+        sel.register(p.stderr, selectors.EVENT_READ)
+        try:
+            while sel.get_map():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise LLMError("LLM invocation timed out")
+                for key, _ in sel.select(remaining):
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        sel.unregister(key.fileobj)
+                        continue
+                    if key.fileobj is p.stderr:
+                        err += data
+                        continue
+                    text = decoder.decode(data)
+                    if text:
+                        yield text
+
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+            try:
+                p.wait(timeout=max(deadline - time.perf_counter(), 0))
+            except subprocess.TimeoutExpired:
+                raise LLMError("LLM invocation timed out")
+            if p.returncode != 0:
+                # keep stderr limited: first line for diagnostics
+                lines = err.decode("utf-8", errors="replace").splitlines()
+                raise LLMError("llm error: " + (lines[0] if lines else ""))
+        finally:
+            sel.close()
+            if p.poll() is None:
+                p.kill()
+                p.wait()
+            p.stdout.close()
+            p.stderr.close()
+
+
+# -------------------------------------------------
+# In-process: the llm library, models cached per process
+# -------------------------------------------------
+class InProcessBackend(LLMBackend):
+    """
+    Calls the llm Python library directly. Plugin loading and model
+    resolution happen once per process; the resolved model objects are
+    shared by every InProcessBackend. The timeout is not enforced here:
+    the provider client's own timeouts apply.
+    """
+
+    name = "inprocess"
+
+    _models: Dict[str, object] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model_id: Optional[str] = None):
+        self.model_id = model_id or os.environ.get("LLMCUI_LLM_MODEL") or None
+
+    def _model(self):
+        key = self.model_id or ""
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    try:
+                        import llm
+                    except ImportError:
+                        raise LLMError(
+                            "llm library not installed (pip install llm) — "
+                            "use the subprocess backend instead"
+                        )
+                    try:
+                        model = llm.get_model(self.model_id or llm.get_default_model())
+                    except Exception as e:
+                        raise LLMError(f"llm error: {e}")
+                    self._models[key] = model
+        return model
+
+    def model_key(self) -> Optional[str]:
+        if self.model_id:
+            return self.model_id
+        try:
+            import llm
+
+            return llm.get_default_model()
+        except Exception:
+            return None
+
+    def stream(self, prompt_text: str, timeout: float = 120) -> Iterator[str]:
+        model = self._model()
+        try:
+            for chunk in model.prompt(prompt_text, stream=True):
+                if chunk:
+                    yield chunk
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"llm error: {e}")
+
+
+# -------------------------------------------------
+# Fake: deterministic, offline
+# -------------------------------------------------
+class FakeBackend(LLMBackend):
+    """
+    Deterministic replies with no model at all. reply may be a fixed string
+    or a callable(prompt_text) -> str; by default the reply is derived from a
+    hash of the prompt. Output is streamed word by word. Every prompt seen
+    is kept in .prompts for assertions.
+    """
+
+    name = "fake"
+
+    def __init__(self, reply: Union[str, Callable[[str], str], None] = None):
+        self.reply = reply
+        self.prompts = []
+
+    def _reply(self, prompt_text: str) -> str:
+        if callable(self.reply):
+            return self.reply(prompt_text)
+        if self.reply is not None:
+            return self.reply
+        digest = hashlib.sha1(prompt_text.encode("utf-8")).hexdigest()[:12]
+        return f"fake response {digest} ({len(prompt_text)} chars)"
+
+    def model_key(self) -> Optional[str]:
+        return "fake"
+
+    def stream(self, prompt_text: str, timeout: float = 120) -> Iterator[str]:
+        self.prompts.append(prompt_text)
+        text = self._reply(prompt_text)
+        start = 0
+        while start < len(text):
+            end = text.find(" ", start + 1)
+            end = len(text) if end == -1 else end
+            yield text[start:end]
+            start = end
+
+
+BACKENDS = {
+    SubprocessBackend.name: SubprocessBackend,
+    InProcessBackend.name: InProcessBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def get_backend(name: Optional[str] = None, llm_cmd: str = "llm") -> LLMBackend:
+    """
+    Build a backend by name; None reads $LLMCUI_LLM_BACKEND and falls back
+    to "subprocess".
+    """
+    name = (name or os.environ.get("LLMCUI_LLM_BACKEND") or "subprocess").strip().lower()
+    if name == SubprocessBackend.name:
+        return SubprocessBackend(llm_cmd)
+    cls = BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(
+            f"Unknown LLM backend: {name!r} (choose from {', '.join(BACKENDS)})"
+        )
+    return cls()
@@ -3,55 +3,128 @@
 core.services.llm_service
 
 Provides:
-- call_prompt(prompt_text): low-level llm invocation
+- stream_prompt(prompt_text): yield output chunks as the backend emits them
+- call_prompt(prompt_text, on_chunk=None): low-level llm invocation
 - generate_title(user_prompt): produce short chat title
-- summarize_chat(messages): LLM chat summary (string)
+- summarize_chat(messages, previous_summary=""): LLM chat summary (string);
+    with a previous summary only the new messages are sent and folded in
 - summarize_project(messages): LLM project summary (string)
-- summarize_both(chat_messages, project_messages): attempt single JSON response
+- summarize_project_rollup(chat_summaries, previous_summary=""): project summary
+    built from per-chat summaries instead of raw messages
+- summarize_both(chat_messages, project_messages, previous_chat_summary=""):
+  attempt single JSON response
     { "chat_summary": "...", "project_summary": "..." }
   If JSON parsing fails or fields missing, falls back to two separate calls.
+
+The model is reached through a backend (see core.services.llm_backends):
+the `llm` binary by default, the in-process llm library, or a local fake.
+Timing of the most recent call is kept in LLMService.last_metrics.
+With a ResponseCache (core.services.response_cache), a prompt seen before
+is answered from the cache unless the call passes use_cache=False.
 """
 import json
-import subprocess
-from typing import List, Tuple, Optional, Mapping, Any
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Tuple, Optional, Mapping, Any, Union
+
+from core.services.llm_backends import LLMBackend, LLMError, get_backend
+
+
+@dataclass
+class CallMetrics:
+    ttft: Optional[float] = None   # seconds until the first chunk arrived
+    total: Optional[float] = None  # seconds until the call finished
+    chars: int = 0
+    cached: bool = False           # answered from the response cache
 
 
 class LLMService:
-    def __init__(self, llm_cmd: str = "llm"):
+    def __init__(
+        self,
+        llm_cmd: str = "llm",
+        backend: Union[LLMBackend, str, None] = None,
+        cache=None,
+    ):
         self.llm_cmd = llm_cmd
+        if not isinstance(backend, LLMBackend):
+            backend = get_backend(backend, llm_cmd=llm_cmd)
+        self.backend = backend
+        self.cache = cache
+        self.last_metrics: Optional[CallMetrics] = None
 
     # -------------------------------------------------
     # Low-level LLM invocation
     # -------------------------------------------------
-    def call_prompt(self, prompt_text: str, timeout: int = 120) -> Optional[str]:
+    def _cache_key(self, prompt_text: str) -> Optional[str]:
+        """Key of the model actually answering; None (don't cache) if unknown."""
+        from core.services.response_cache import cache_key
+
+        model = self.backend.model_key()
+        if not model:
+            return None
+        return cache_key(self.backend.name, model, prompt_text)
+
+    def stream_prompt(self, prompt_text: str, timeout: int = 120,
+                      use_cache: bool = True) -> Iterator[str]:
         """
-        Call the external llm binary with a prompt. Returns stdout string or None on failure.
+        Yield the model's output as the backend produces it, recording
+        time-to-first-token and total time in last_metrics.
+        A cached answer comes back as one piece; a complete answer is cached.
+        Raises LLMError on failure or timeout.
         """
+        metrics = self.last_metrics = CallMetrics()
+        start = time.perf_counter()
+        cache = self.cache if use_cache else None
+        key = self._cache_key(prompt_text) if cache is not None else None
+        if key is None:
+            cache = None
         try:
-            p = subprocess.Popen(
-                [self.llm_cmd, "prompt"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            out, err = p.communicate(prompt_text, timeout=timeout)
-            if p.returncode != 0:
-                # keep stderr limited: print first line for diagnostics
-                first_err_line = (err or "").splitlines()[0] if err else ""
-                print("llm error:", first_err_line)
-                return None
-            return (out or "").strip()
-        except subprocess.TimeoutExpired:
-            print("LLM invocation timed out")
-            try:
-                p.kill()
-            except Exception:
-                pass
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                metrics.cached = True
+                metrics.ttft = time.perf_counter() - start
+                metrics.chars = len(cached)
+                yield cached
+                return
+
+            chunks = []
+            for text in self.backend.stream(prompt_text, timeout=timeout):
+                if metrics.ttft is None:
+                    metrics.ttft = time.perf_counter() - start
+                metrics.chars += len(text)
+                chunks.append(text)
+                yield text
+            if cache is not None and chunks:
+                cache.put(key, "".join(chunks))
+        finally:
+            metrics.total = time.perf_counter() - start
+
+    def call_prompt(
+        self,
+        prompt_text: str,
+        timeout: int = 120,
+        on_chunk: Optional[Callable[[str], None]] = None,
+        use_cache: bool = True,
+    ) -> Optional[str]:
+        """
+        Run a prompt through the backend. Returns the output string or None on failure.
+        on_chunk, if given, receives each piece of output as it streams in.
+        use_cache=False skips the response cache for this call.
+        KeyboardInterrupt propagates so callers can keep the partial answer.
+        """
+        chunks = []
+        try:
+            for chunk in self.stream_prompt(prompt_text, timeout=timeout, use_cache=use_cache):
+                chunks.append(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        except LLMError as e:
+            print(e)
             return None
         except Exception as e:
             print("LLM invocation error:", e)
             return None
+        return "".join(chunks).strip()
 
     # -------------------------------------------------
     # Title generation (existing behaviour)
@@ -94,18 +167,31 @@ class LLMService:
     # -------------------------------------------------
     # Summarization helpers
     # -------------------------------------------------
-    def summarize_chat(self, messages: List[Mapping[str, Any]]) -> str:
+    def summarize_chat(self, messages: List[Mapping[str, Any]], previous_summary: str = "") -> str:
         """
         Ask LLM to produce a chat-level distilled summary (<=400 characters).
+        With previous_summary, messages are only the ones added since it was
+        written and the LLM updates it instead of starting over.
         Returns empty string on failure.
         """
         chat_blob = self._messages_to_text(messages[-50:])  # recent messages
-        prompt = (
-            "You are a concise summarizer. Produce a short distilled summary of the conversation below.\n"
-            "Return ONLY the plain text summary. Maximum 400 characters.\n\n"
-            "CONVERSATION:\n"
-            f"{chat_blob}\n"
-        )
+        if previous_summary:
+            prompt = (
+                "You are a concise summarizer. Update the existing summary of a conversation "
+                "with the new messages below. Keep what still matters, add what is new.\n"
+                "Return ONLY the plain text summary. Maximum 400 characters.\n\n"
+                "EXISTING SUMMARY:\n"
+                f"{previous_summary.strip()}\n\n"
+                "NEW MESSAGES:\n"
+                f"{chat_blob}\n"
+            )
+        else:
+            prompt = (
+                "You are a concise summarizer. Produce a short distilled summary of the conversation below.\n"
+                "Return ONLY the plain text summary. Maximum 400 characters.\n\n"
+                "CONVERSATION:\n"
+                f"{chat_blob}\n"
+            )
         out = self.call_prompt(prompt, timeout=45)
         return (out or "").strip()
 
@@ -125,7 +211,41 @@ class LLMService:
         out = self.call_prompt(prompt, timeout=60)
         return (out or "").strip()
 
-    def summarize_both(self, chat_messages: List[Mapping[str, Any]], project_messages: List[Mapping[str, Any]]) -> Tuple[str, str]:
+    def summarize_project_rollup(
+        self,
+        chat_summaries: List[Mapping[str, Any]],
+        previous_summary: str = "",
+    ) -> str:
+        """
+        Project-level summary (<=800 characters) rolled up from the latest
+        summary of each chat (rows with 'title' and 'summary') and the
+        previous project summary. Returns empty string on failure.
+        """
+        lines = []
+        for row in chat_summaries:
+            title = row["title"] or "(untitled)"
+            lines.append(f"- {title}: {(row['summary'] or '').strip()}")
+        previous = (
+            f"PREVIOUS PROJECT SUMMARY:\n{previous_summary.strip()}\n\n"
+            if previous_summary else ""
+        )
+        prompt = (
+            "You are a project-level summarizer. Combine the chat summaries below into one concise "
+            "project summary capturing high-level goals, ongoing tasks, design decisions, and important context.\n"
+            "Return ONLY the plain text summary. Maximum 800 characters.\n\n"
+            f"{previous}"
+            "CHAT SUMMARIES:\n"
+            + "\n".join(lines) + "\n"
+        )
+        out = self.call_prompt(prompt, timeout=60)
+        return (out or "").strip()
+
+    def summarize_both(
+        self,
+        chat_messages: List[Mapping[str, Any]],
+        project_messages: List[Mapping[str, Any]],
+        previous_chat_summary: str = "",
+    ) -> Tuple[str, str]:
         """
         Preferred single-call summarization: ask the LLM to return a JSON object:
         {
@@ -134,10 +254,24 @@ class LLMService:
         }
 
         If the LLM output is not valid JSON or required keys are missing, fall back to two separate calls.
+        previous_chat_summary works as in summarize_chat: chat_messages are then
+        only the messages added since it.
         Returns (chat_summary, project_summary) — each may be empty string on failure.
         """
         chat_blob = self._messages_to_text(chat_messages[-50:])
         project_blob = self._messages_to_text(project_messages[-200:])
+        if previous_chat_summary:
+            chat_section = (
+                "EXISTING CHAT SUMMARY (update it with the new messages):\n"
+                f"{previous_chat_summary.strip()}\n\n"
+                "CHAT (new messages since that summary):\n"
+                f"{chat_blob}\n\n"
+            )
+        else:
+            chat_section = (
+                "CHAT (most recent messages):\n"
+                f"{chat_blob}\n\n"
+            )
 
         json_request = (
             "Return a JSON object (and nothing else) with two keys:\n"
@@ -146,8 +280,7 @@ class LLMService:
             "Respond ONLY with valid JSON. Example:\n"
             '{ "chat_summary": "short chat summary...", "project_summary": "project-level summary..." }\n\n'
             "If you cannot produce valid JSON, return an empty JSON object {}.\n\n"
-            "CHAT (most recent messages):\n"
-            f"{chat_blob}\n\n"
+            f"{chat_section}"
             "PROJECT (recent project messages):\n"
             f"{project_blob}\n"
         )
@@ -155,7 +288,7 @@ class LLMService:
         out = self.call_prompt(json_request, timeout=90)
         if not out:
             # fall back to separate calls
-            chat_s = self.summarize_chat(chat_messages)
+            chat_s = self.summarize_chat(chat_messages, previous_chat_summary)
             proj_s = self.summarize_project(project_messages)
             return chat_s or "", proj_s or ""
 
@@ -178,6 +311,6 @@ class LLMService:
             return (str(chat_summary).strip(), str(project_summary).strip())
 
         # If JSON didn't contain both fields, fallback to two separate queries
-        chat_s = chat_summary or self.summarize_chat(chat_messages)
+        chat_s = chat_summary or self.summarize_chat(chat_messages, previous_chat_summary)
         proj_s = project_summary or self.summarize_project(project_messages)
         return (chat_s or "", proj_s or "")
@@ -1,6 +1,18 @@
 # core/services/message_service.py
 from datetime import datetime, UTC
 from core.db.database import Database
+from core.services.embedding_service import index_texts
+from core.utils.compression import pack
+
+# message text followed by an "[attached: name]" line per file it carried,
+# for views of a chat (history, distillation) where the file text is absent
+_CONTENT_WITH_ATTACHMENTS = (
+    "unpack(m.content, m.fmt) || COALESCE(("
+    "  SELECT char(10) || group_concat('[attached: ' || name || ']', char(10)) FROM ("
+    "    SELECT COALESCE(a.name, a.hash) AS name FROM message_attachments a "
+    "    WHERE a.message_id = m.id ORDER BY a.rowid)"
+    "), '') AS content"
+)
 
 
 class MessageService:
@@ -11,22 +23,55 @@ class MessageService:
         # timezone-aware UTC with trailing Z
         return datetime.now(UTC).isoformat().replace("+00:00", "Z")
 
-    def add_message(self, chat_id, role, content):
+    def add_message(self, chat_id, role, content, attachments=()):
+        """
+        Store a message and return its id. attachments are
+        AttachmentService.Attachment objects the message refers to.
+        """
+        return self.add_messages([(chat_id, role, content, attachments)])[0]
+
+    def add_messages(self, messages):
+        """
+        Store [(chat_id, role, content, attachments), ...] in one
+        transaction; returns their ids in order. Only the message rows are
+        inserted one by one (for their ids); the rest is written in bulk.
+        """
+        ids, embeddings, links = [], [], []
         conn = self.db.connect()
         cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO messages(chat_id, role, content, ts) "
-            "VALUES (?, ?, ?, ?)",
-            (chat_id, role, content, self._now())
+        for chat_id, role, content, attachments in messages:
+            stored, fmt = pack(content)
+            cur.execute(
+                "INSERT INTO messages(chat_id, role, content, fmt, ts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chat_id, role, stored, fmt, self._now())
+            )
+            message_id = cur.lastrowid
+            ids.append(message_id)
+            embeddings.append(("message", message_id, chat_id, content))
+            links += [(message_id, a.hash, a.name) for a in attachments or ()]
+
+        index_texts(cur, embeddings)
+        # the chats' precomputed recent-turn blocks are now stale
+        cur.executemany(
+            "UPDATE chat_context SET recent_turns = NULL WHERE chat_id = ?",
+            [(chat_id,) for chat_id in dict.fromkeys(m[0] for m in messages)]
         )
+        if links:
+            cur.executemany(
+                "INSERT OR IGNORE INTO message_attachments(message_id, hash, name) "
+                "VALUES (?, ?, ?)",
+                links
+            )
         conn.commit()
         conn.close()
+        return ids
 
     def last_messages(self, chat_id, limit=20):
         conn = self.db.connect()
         cur = conn.cursor()
         cur.execute(
-            "SELECT role, content, ts FROM messages "
+            "SELECT role, unpack(content, fmt) AS content, ts FROM messages "
             "WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
             (chat_id, limit)
         )
@@ -39,10 +84,67 @@ class MessageService:
         """Fetch all messages for a chat in chronological order."""
         conn = self.db.connect()
         cur = conn.execute(
-            "SELECT role, content, ts FROM messages "
+            "SELECT role, unpack(content, fmt) AS content, ts FROM messages "
             "WHERE chat_id=? ORDER BY id ASC",
             (chat_id,)
         )
         rows = cur.fetchall()
         conn.close()
         return rows
+
+    def page(self, chat_id, before_id=None, limit=20):
+        """
+        One page of messages, newest first, with id < before_id (keyset
+        pagination: pass the smallest id of a page to get the next older one).
+        Attached files show as "[attached: name]" lines after the text.
+        """
+        conn = self.db.connect()
+        if before_id is None:
+            rows = conn.execute(
+                f"SELECT m.id, m.role, {_CONTENT_WITH_ATTACHMENTS}, m.ts FROM messages m "
+                "WHERE m.chat_id = ? ORDER BY m.id DESC LIMIT ?",
+                (chat_id, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT m.id, m.role, {_CONTENT_WITH_ATTACHMENTS}, m.ts FROM messages m "
+                "WHERE m.chat_id = ? AND m.id < ? ORDER BY m.id DESC LIMIT ?",
+                (chat_id, before_id, limit)
+            ).fetchall()
+        conn.close()
+        return rows
+
+    def iter_messages(self, chat_id, page_size=200):
+        """
+        Yield every message of a chat in chronological order, holding one
+        page of rows in memory at a time. Attachments are marked as in page().
+        """
+        after_id = 0
+        while True:
+            conn = self.db.connect()
+            rows = conn.execute(
+                f"SELECT m.id, m.role, {_CONTENT_WITH_ATTACHMENTS}, m.ts FROM messages m "
+                "WHERE m.chat_id = ? AND m.id > ? ORDER BY m.id ASC LIMIT ?",
+                (chat_id, after_id, page_size)
+            ).fetchall()
+            conn.close()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def messages_after(self, chat_id, after_id, limit=50):
+        """
+        The oldest `limit` messages with id > after_id, in chronological
+        order, including their ids (used for incremental distillation:
+        a watermark moved to the last of them skips nothing). Attachments
+        are marked as in page(), so summaries know a file was shared.
+        """
+        conn = self.db.connect()
+        rows = conn.execute(
+            f"SELECT m.id, m.role, {_CONTENT_WITH_ATTACHMENTS}, m.ts FROM messages m "
+            "WHERE m.chat_id = ? AND m.id > ? ORDER BY m.id LIMIT ?",
+            (chat_id, after_id, limit)
+        ).fetchall()
+        conn.close()
+        return rows
@@ -1,4 +1,5 @@
 # core/services/project_service.py
+import heapq
 from datetime import datetime, UTC
 from core.db.database import Database
 
@@ -41,9 +42,22 @@ class ProjectService:
     # ---------------------------------------------------------
     def add_project_summary(self, project_name: str, text: str):
         """
-        Insert a new distilled project summary.
+        Insert a new distilled project summary; returns its row id.
+        Text identical to the current summary is not stored again; older
+        versions beyond the retention limit are dropped.
         """
+        from core.services.retention_service import keep_versions, prune_project_summaries
+
         conn = self.db.connect()
+        current = conn.execute(
+            "SELECT s.id, s.summary FROM latest_project_summary l "
+            "JOIN project_summaries s ON s.id = l.summary_id WHERE l.project_name = ?",
+            (project_name,)
+        ).fetchone()
+        if current is not None and current["summary"] == text:
+            conn.close()
+            return current["id"]
+
         cur = conn.cursor()
         cur.execute(
             """
@@ -52,8 +66,22 @@ class ProjectService:
             """,
             (project_name, text, self._now())
         )
+        summary_id = cur.lastrowid
+        cur.execute(
+            "INSERT OR REPLACE INTO latest_project_summary(project_name, summary_id) "
+            "VALUES (?, ?)",
+            (project_name, summary_id)
+        )
+        prune_project_summaries(conn, project_name, keep_versions(conn))
+        # keep the materialized prompt context of every chat current
+        cur.execute(
+            "UPDATE chat_context SET project_summary = ?, updated_at = ? "
+            "WHERE project_name = ?",
+            (text, self._now(), project_name)
+        )
         conn.commit()
         conn.close()
+        return summary_id
 
     def get_distilled_project(self, name: str) -> str:
         """
@@ -63,14 +91,64 @@ class ProjectService:
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT summary 
-            FROM project_summaries
-            WHERE project_name = ?
-            ORDER BY created_at DESC
-            LIMIT 1
+            SELECT s.summary
+            FROM latest_project_summary l
+            JOIN project_summaries s ON s.id = l.summary_id
+            WHERE l.project_name = ?
             """,
             (name,)
         )
         row = cur.fetchone()
         conn.close()
         return row[0] if row else ""
+
+    # ---------------------------------------------------------
+    # DISTILLATION INPUTS
+    # ---------------------------------------------------------
+    def latest_chat_summaries(self, name: str, limit: int = 50):
+        """
+        Latest summary of each chat in the project (most recently used
+        chats first): rows of (chat_id, title, summary).
+        """
+        conn = self.db.connect()
+        rows = conn.execute(
+            """
+            SELECT c.id AS chat_id, c.title, s.summary
+            FROM chats c
+            JOIN projects p ON c.project_id = p.id
+            JOIN latest_chat_summary l ON l.chat_id = c.id
+            JOIN chat_summaries s ON s.id = l.summary_id
+            WHERE p.name = ?
+            ORDER BY c.last_used DESC
+            LIMIT ?
+            """,
+            (name, limit)
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def recent_messages(self, name: str, limit: int = 200):
+        """
+        The newest `limit` messages across the project's chats, in
+        chronological order. Each chat is read newest-first through the
+        (chat_id, id) index and capped at `limit` rows, so the work is
+        bounded by chats × limit rather than the project's whole history.
+        """
+        conn = self.db.connect()
+        chat_ids = [
+            r[0] for r in conn.execute(
+                "SELECT c.id FROM chats c JOIN projects p ON c.project_id = p.id "
+                "WHERE p.name = ?",
+                (name,)
+            )
+        ]
+        newest = []
+        for chat_id in chat_ids:
+            rows = conn.execute(
+                "SELECT id, role, unpack(content, fmt) AS content, ts FROM messages "
+                "WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
+                (chat_id, limit)
+            ).fetchall()
+            newest = heapq.nlargest(limit, newest + rows, key=lambda r: r["id"])
+        conn.close()
+        return list(reversed(newest))
@@ -0,0 +1,124 @@
+# core/services/response_cache.py
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, UTC
+from typing import Optional
+
+from core.db.database import Database
+from core.utils.compression import pack
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def cache_key(backend: str, model: Optional[str], prompt: str, options=None) -> str:
+    """Hash of everything that decides the answer."""
+    raw = json.dumps([backend, model, prompt, options or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Model answers keyed by cache_key(). Entries older than ttl_seconds are
+    misses; beyond max_entries the least recently used are evicted. Hit and
+    miss counts are kept in response_cache_stats.
+
+    Off unless enabled: from_settings() reads $LLMCUI_CACHE (1/0) or the
+    cache.enabled setting, plus cache.ttl_seconds and cache.max_entries.
+    """
+
+    def __init__(self, db: Database, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @classmethod
+    def from_settings(cls, db: Database, settings=None):
+        """A ResponseCache if caching is switched on, else None."""
+        env = os.environ.get("LLMCUI_CACHE", "").strip().lower()
+        if env:
+            enabled = env in ("1", "true", "yes", "on")
+        else:
+            enabled = settings is not None and settings.get_bool("cache.enabled", False)
+        if not enabled:
+            return None
+
+        def _int(key, default):
+            try:
+                return int(settings.get(key, default)) if settings is not None else default
+            except (TypeError, ValueError):
+                return default
+
+        return cls(db, _int("cache.ttl_seconds", DEFAULT_TTL_SECONDS),
+                   _int("cache.max_entries", DEFAULT_MAX_ENTRIES))
+
+    def _now(self, delta_seconds=0):
+        # timezone-aware UTC with trailing Z
+        t = datetime.now(UTC) - timedelta(seconds=delta_seconds)
+        return t.isoformat().replace("+00:00", "Z")
+
+    def _count(self, cur, name):
+        cur.execute(
+            "INSERT INTO response_cache_stats(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self.db.connect()
+        cur = conn.cursor()
+        row = cur.execute(
+            "SELECT unpack(response, fmt) AS response FROM response_cache "
+            "WHERE key = ? AND created_at >= ?",
+            (key, self._now(self.ttl_seconds))
+        ).fetchone()
+        if row is None:
+            self._count(cur, "misses")
+        else:
+            cur.execute(
+                "UPDATE response_cache SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                (self._now(), key)
+            )
+            self._count(cur, "hits")
+        conn.commit()
+        conn.close()
+        return row["response"] if row is not None else None
+
+    def put(self, key: str, response: str):
+        stored, fmt = pack(response)
+        now = self._now()
+        conn = self.db.connect()
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT OR REPLACE INTO response_cache(key, response, fmt, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, stored, fmt, now, now)
+        )
+        cur.execute(
+            "DELETE FROM response_cache WHERE created_at < ?",
+            (self._now(self.ttl_seconds),)
+        )
+        cur.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (max(0, self.max_entries),)
+        )
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> dict:
+        conn = self.db.connect()
+        counters = dict(conn.execute("SELECT name, value FROM response_cache_stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        conn.close()
+        return {"entries": entries, "hits": counters.get("hits", 0),
+                "misses": counters.get("misses", 0)}
+
+    def clear(self):
+        conn = self.db.connect()
+        conn.execute("DELETE FROM response_cache")
+        conn.execute("DELETE FROM response_cache_stats")
+        conn.commit()
+        conn.close()
@@ -0,0 +1,149 @@
+# core/services/retention_service.py
+"""
+Retention for summary history.
+
+Every distillation used to add a row to chat_summaries (and, when the text
+changed, project_summaries) forever. Now the writers keep the
+latest_chat_summary / latest_project_summary pointers current, skip
+versions identical to the current one, and keep only the newest
+summaries.keep versions (default SUMMARY_HISTORY) per chat and project.
+
+Finished jobs and distill decisions are bookkeeping: prune_history()
+drops them after history.keep_days (default HISTORY_DAYS), except each
+chat's latest 'run' decision, which the distill policy measures from.
+The worker prunes when it starts.
+
+RetentionService.compact() applies the same policy to an existing
+database in one go, including the legacy distilled table.
+"""
+from datetime import datetime, timedelta, UTC
+
+from core.db.database import Database
+
+SUMMARY_HISTORY = 5
+HISTORY_DAYS = 14
+
+
+def keep_versions(conn) -> int:
+    """The summaries.keep setting (at least 1), else SUMMARY_HISTORY."""
+    row = conn.execute("SELECT value FROM settings WHERE key = 'summaries.keep'").fetchone()
+    try:
+        return max(1, int(row["value"])) if row is not None else SUMMARY_HISTORY
+    except ValueError:
+        return SUMMARY_HISTORY
+
+
+def history_days(conn) -> int:
+    """The history.keep_days setting (at least 1), else HISTORY_DAYS."""
+    row = conn.execute("SELECT value FROM settings WHERE key = 'history.keep_days'").fetchone()
+    try:
+        return max(1, int(row["value"])) if row is not None else HISTORY_DAYS
+    except ValueError:
+        return HISTORY_DAYS
+
+
+def prune_history(conn, days: int) -> dict:
+    """
+    Delete jobs and distill decisions older than days. Open jobs, and
+    jobs merged into one, stay; so does each chat's latest 'run' decision.
+    Returns the rows deleted per table.
+    """
+    cutoff = (datetime.now(UTC) - timedelta(days=days)).isoformat().replace("+00:00", "Z")
+    jobs = conn.execute(
+        "DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < ? "
+        "AND (status IN ('done', 'failed') OR (status = 'merged' AND merged_into NOT IN ("
+        "SELECT id FROM jobs WHERE status IN ('pending', 'running'))))",
+        (cutoff,)
+    ).rowcount
+    decisions = conn.execute(
+        "DELETE FROM distill_decisions WHERE created_at < ? AND id NOT IN ("
+        "SELECT MAX(id) FROM distill_decisions WHERE decision = 'run' GROUP BY chat_id)",
+        (cutoff,)
+    ).rowcount
+    return {"jobs": jobs, "distill_decisions": decisions}
+
+
+def prune_chat_summaries(conn, chat_id: str, keep: int):
+    conn.execute(
+        "DELETE FROM chat_summaries WHERE chat_id = ? AND id NOT IN ("
+        "SELECT id FROM chat_summaries WHERE chat_id = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT ?)",
+        (chat_id, chat_id, keep)
+    )
+
+
+def prune_project_summaries(conn, project_name: str, keep: int):
+    conn.execute(
+        "DELETE FROM project_summaries WHERE project_name = ? AND id NOT IN ("
+        "SELECT id FROM project_summaries WHERE project_name = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT ?)",
+        (project_name, project_name, keep)
+    )
+
+
+class RetentionService:
+    def __init__(self, db: Database, keep=None):
+        self.db = db
+        self.keep = keep
+
+    def prune_history(self) -> dict:
+        with self.db.transaction() as conn:
+            return prune_history(conn, history_days(conn))
+
+    def compact(self, vacuum: bool = False) -> dict:
+        """
+        Drop repeated and surplus summary versions, legacy distilled rows
+        that chat_summaries supersede and old job history, and rebuild the
+        latest pointers. Returns the rows deleted per table.
+        """
+        deleted = {}
+        with self.db.transaction() as conn:
+            keep = self.keep or keep_versions(conn)
+            for table, key in (("chat_summaries", "chat_id"),
+                               ("project_summaries", "project_name")):
+                # of consecutive identical versions keep the newest (its
+                # watermark is the furthest), then cap the history
+                dup = conn.execute(
+                    f"DELETE FROM {table} WHERE id IN ("
+                    f"SELECT id FROM (SELECT id, summary, LEAD(summary) OVER ("
+                    f"PARTITION BY {key} ORDER BY created_at, id) AS newer FROM {table}) "
+                    f"WHERE summary = newer)"
+                ).rowcount
+                old = conn.execute(
+                    f"DELETE FROM {table} WHERE id IN ("
+                    f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                    f"PARTITION BY {key} ORDER BY created_at DESC, id DESC) AS n FROM {table}) "
+                    f"WHERE n > ?)",
+                    (keep,)
+                ).rowcount
+                deleted[table] = dup + old
+
+            deleted["distilled"] = conn.execute(
+                "DELETE FROM distilled WHERE chat_id IN (SELECT chat_id FROM chat_summaries) "
+                "OR id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                "PARTITION BY chat_id ORDER BY created_at DESC, id DESC) AS n FROM distilled) "
+                "WHERE n > 1)"
+            ).rowcount
+
+            deleted.update(prune_history(conn, history_days(conn)))
+
+            conn.execute("DELETE FROM latest_chat_summary")
+            conn.execute(
+                "INSERT INTO latest_chat_summary(chat_id, summary_id) "
+                "SELECT chat_id, id FROM (SELECT chat_id, id, ROW_NUMBER() OVER ("
+                "PARTITION BY chat_id ORDER BY created_at DESC, id DESC) AS n "
+                "FROM chat_summaries) WHERE n = 1"
+            )
+            conn.execute("DELETE FROM latest_project_summary")
+            conn.execute(
+                "INSERT INTO latest_project_summary(project_name, summary_id) "
+                "SELECT project_name, id FROM (SELECT project_name, id, ROW_NUMBER() OVER ("
+                "PARTITION BY project_name ORDER BY created_at DESC, id DESC) AS n "
+                "FROM project_summaries) WHERE n = 1"
+            )
+
+        if vacuum and any(deleted.values()):
+            conn = self.db.connect()
+            conn.execute("VACUUM")
+            conn.close()
+        return deleted
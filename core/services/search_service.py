@@ -0,0 +1,118 @@
+# core/services/search_service.py
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.db.database import Database
+
+_TERM = re.compile(r'[^\s"]+\*?|"[^"]*"')
+SNIPPET_CHARS = 60
+
+
+@dataclass
+class SearchHit:
+    message_id: int
+    project: str
+    chat_id: str
+    chat_title: str
+    role: str
+    ts: str
+    snippet: str
+    rank: float
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word becomes a quoted
+    term (implicit AND), "quoted phrases" stay phrases and a trailing *
+    keeps prefix matching. Operators and column filters are not exposed.
+    """
+    terms = []
+    for raw in _TERM.findall(text or ""):
+        prefix = raw.endswith("*") and not raw.startswith('"')
+        word = raw.strip('"').rstrip("*") if prefix else raw.strip('"')
+        if not word.strip():
+            continue
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def snippet(text: str, words: List[str], width: int = SNIPPET_CHARS) -> str:
+    """
+    A window of text around the first query word, marked [like this]
+    (the FTS tables are contentless, so snippets are cut here).
+    """
+    flat = " ".join(text.split())
+    lower = flat.lower()
+    pos = -1
+    for word in words:
+        pos = lower.find(word)
+        if pos != -1:
+            break
+    if pos == -1:
+        return flat[:2 * width] + ("…" if len(flat) > 2 * width else "")
+    end = pos + len(word)
+    start = max(0, pos - width)
+    stop = min(len(flat), end + width)
+    return (
+        ("…" if start else "") + flat[start:pos] + "[" + flat[pos:end] + "]"
+        + flat[end:stop] + ("…" if stop < len(flat) else "")
+    )
+
+
+class SearchService:
+    """
+    Ranked full-text search over every message (messages_fts, bm25),
+    archived chats included (see ArchiveService.search).
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def search(self, text: str, project: Optional[str] = None,
+               limit: int = 20) -> List[SearchHit]:
+        query = fts_query(text)
+        if not query:
+            return []
+
+        sql = (
+            "SELECT m.id, p.name AS project, m.chat_id, c.title, m.role, m.ts, "
+            "unpack(m.content, m.fmt) AS content, bm25(messages_fts) AS rank "
+            "FROM messages_fts "
+            "JOIN messages m ON m.id = messages_fts.rowid "
+            "JOIN chats c ON c.id = m.chat_id "
+            "JOIN projects p ON p.id = c.project_id "
+            "WHERE messages_fts MATCH ?"
+        )
+        params = [query]
+        if project:
+            sql += " AND p.name = ?"
+            params.append(project)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        conn = self.db.connect()
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+
+        words = [w.lower() for w in re.findall(r"\w+", query)]
+        hits = [
+            SearchHit(
+                message_id=r["id"],
+                project=r["project"],
+                chat_id=r["chat_id"],
+                chat_title=r["title"] or "(untitled)",
+                role=r["role"],
+                ts=r["ts"],
+                snippet=snippet(r["content"] or "", words),
+                rank=r["rank"],
+            )
+            for r in rows
+        ]
+
+        from core.services.archive_service import ArchiveService
+
+        archived = ArchiveService(self.db).search(query, project=project, limit=limit)
+        if archived:
+            hits = sorted(hits + archived, key=lambda h: h.rank)[:limit]
+        return hits
@@ -0,0 +1,74 @@
+# core/utils/compression.py
+"""
+Compression for large message bodies.
+
+messages.fmt says how messages.content is stored: NULL is plain text,
+"zlib" / "zstd" a compressed UTF-8 blob. Only bodies of at least
+COMPRESS_THRESHOLD bytes that actually shrink are compressed.
+
+$LLMCUI_COMPRESSION picks the codec for new rows: zlib (default), zstd
+(needs the zstandard package; falls back to zlib) or off. Every
+Database connection registers unpack(content, fmt) so queries can read
+compressed rows as text.
+"""
+import os
+import zlib
+
+COMPRESS_THRESHOLD = 4096      # bytes of UTF-8
+MIN_SAVING = 0.9               # keep the compressed form only below 90% of the raw size
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+FMT_ZLIB = "zlib"
+FMT_ZSTD = "zstd"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def codec() -> str:
+    """Format new rows are written in, or None when compression is off."""
+    name = (os.environ.get("LLMCUI_COMPRESSION") or FMT_ZLIB).strip().lower()
+    if name in ("off", "none", "0"):
+        return None
+    if name == FMT_ZSTD and _zstd() is not None:
+        return FMT_ZSTD
+    return FMT_ZLIB
+
+
+def pack(text, threshold: int = COMPRESS_THRESHOLD):
+    """(value, fmt) to store for text; fmt None means stored as-is."""
+    if text is None:
+        return None, None
+    raw = text.encode("utf-8")
+    fmt = codec()
+    if fmt is None or len(raw) < threshold:
+        return text, None
+
+    if fmt == FMT_ZSTD:
+        data = _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        data = zlib.compress(raw, ZLIB_LEVEL)
+
+    if len(data) >= len(raw) * MIN_SAVING:
+        return text, None
+    return data, fmt
+
+
+def unpack(value, fmt):
+    """Text of a stored (value, fmt) pair."""
+    if fmt is None or value is None:
+        return value
+    if fmt == FMT_ZLIB:
+        return zlib.decompress(value).decode("utf-8")
+    if fmt == FMT_ZSTD:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("message is zstd-compressed: pip install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(value).decode("utf-8")
+    raise ValueError(f"unknown message format: {fmt!r}")
@@ -0,0 +1,124 @@
+# core/utils/ingest.py
+"""
+Reading files for prompts: bounded, parallel and binary-safe.
+
+read_files() reads a batch of files on a thread pool (hashing and I/O
+release the GIL) and yields them in the order given. Files of
+MMAP_THRESHOLD bytes or more are mapped instead of read, so only the
+pages actually hashed and kept are touched. Binary files are detected
+from their first SNIFF_BYTES and never decoded; text longer than the cap
+keeps its head and tail around an omission marker.
+"""
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Union
+
+SNIFF_BYTES = 8192
+MMAP_THRESHOLD = 1 << 20
+MAX_FILE_BYTES = 256 * 1024     # kept per file
+MAX_TOTAL_BYTES = 1 << 20       # all files of one prompt
+MAX_WORKERS = 8
+HEAD_SHARE = 2 / 3              # of a truncated file, the rest is its tail
+
+# bytes that may appear in text: printable, high (UTF-8 / legacy) and common controls
+_TEXT_BYTES = bytes({7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+
+class BinaryFileError(ValueError):
+    """The file does not look like text."""
+
+
+@dataclass
+class FileData:
+    path: str
+    size: int           # bytes on disk
+    mtime_ns: int
+    hash: str           # sha256 of the whole file
+    text: str           # decoded, possibly truncated
+    truncated: bool
+
+
+def looks_binary(sample: bytes) -> bool:
+    """NUL bytes or more than 10% control bytes in the sample."""
+    if not sample:
+        return False
+    if b"\0" in sample:
+        return True
+    return len(sample.translate(None, _TEXT_BYTES)) > len(sample) // 10
+
+
+def truncate_middle(data: Union[bytes, str], limit: int) -> Tuple[Union[bytes, str], bool]:
+    """
+    Keep at most ~limit bytes/chars of data: the head and the tail, cut at
+    line boundaries where possible, joined by an omission marker.
+    Returns (data, truncated).
+    """
+    if len(data) <= limit:
+        return data, False
+
+    is_bytes = not isinstance(data, str)
+    nl = b"\n" if is_bytes else "\n"
+    head_len = int(limit * HEAD_SHARE)
+    tail_len = limit - head_len
+
+    head = data[:head_len]
+    cut = head.rfind(nl)
+    if cut > head_len // 2:
+        head = head[:cut + 1]
+
+    tail = data[len(data) - tail_len:] if tail_len else data[:0]
+    cut = tail.find(nl)
+    if 0 <= cut < tail_len // 2:
+        tail = tail[cut + 1:]
+
+    omitted = len(data) - len(head) - len(tail)
+    marker = f"\n[... {omitted} {'bytes' if is_bytes else 'characters'} omitted ...]\n"
+    return head + (marker.encode("utf-8") if is_bytes else marker) + tail, True
+
+
+def read_file(path: str, max_bytes: int = MAX_FILE_BYTES) -> FileData:
+    """Read one text file. Raises OSError, or BinaryFileError for binaries."""
+    with open(path, "rb") as fh:
+        st = os.fstat(fh.fileno())
+        if st.st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return _ingest(path, st, buf, max_bytes)
+        return _ingest(path, st, fh.read(), max_bytes)
+
+
+def _ingest(path, st, buf, max_bytes) -> FileData:
+    if looks_binary(buf[:SNIFF_BYTES]):
+        raise BinaryFileError(f"binary file ({st.st_size} bytes)")
+
+    digest = hashlib.sha256(buf).hexdigest()
+    data, truncated = truncate_middle(buf, max_bytes)
+    return FileData(
+        path=path,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        hash=digest,
+        text=bytes(data).decode("utf-8", errors="replace"),
+        truncated=truncated,
+    )
+
+
+def read_files(paths: List[str], max_bytes: int = MAX_FILE_BYTES,
+               workers: Optional[int] = None) -> Iterator[Tuple[str, Union[FileData, Exception]]]:
+    """
+    Read paths in parallel; yield (path, FileData or the OSError /
+    BinaryFileError it raised) in input order, each as soon as it and
+    every file before it are done.
+    """
+    if not paths:
+        return
+    workers = min(workers or MAX_WORKERS, len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(read_file, p, max_bytes) for p in paths]
+        for path, future in zip(paths, futures):
+            try:
+                yield path, future.result()
+            except (OSError, BinaryFileError) as e:
+                yield path, e
@@ -0,0 +1,103 @@
+# core/utils/tokens.py
+"""
+Token counting for prompt budgeting.
+
+Uses tiktoken when it is installed and a fast character heuristic
+otherwise. Both are approximations of what the provider bills; the
+budget leaves headroom for that.
+"""
+import os
+
+# Known context windows (tokens). Prefix match on the model id.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4.1": 1000000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "claude": 200000,
+    "gemini": 1000000,
+}
+
+DEFAULT_CONTEXT_BUDGET = 8000
+FALLBACK_CONTEXT_WINDOW = 16384  # assumed for file text when the model is not listed
+OUTPUT_RESERVE = 4096          # never plan to fill the window: leave room for the answer
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+
+def _encoding(model=None):
+    """tiktoken encoding for model, cached; None when tiktoken is missing."""
+    key = model or ""
+    if key in _encodings:
+        return _encodings[key]
+    try:
+        import tiktoken
+    except ImportError:
+        enc = None
+    else:
+        try:
+            enc = tiktoken.encoding_for_model(model) if model else None
+        except KeyError:
+            enc = None
+        if enc is None:
+            enc = tiktoken.get_encoding("cl100k_base")
+    _encodings[key] = enc
+    return enc
+
+
+def estimator_name(model=None) -> str:
+    return "tiktoken" if _encoding(model) is not None else "heuristic"
+
+
+def estimate_tokens(text: str, model=None) -> int:
+    """Number of tokens text will take (approximate without tiktoken)."""
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def current_model():
+    """Model id the prompt is built for, if known ($LLMCUI_LLM_MODEL)."""
+    return os.environ.get("LLMCUI_LLM_MODEL") or None
+
+
+def context_window(model=None):
+    """The model's context window in tokens, None when it is not known."""
+    if model:
+        for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+            if model.startswith(prefix):
+                return MODEL_CONTEXT_WINDOWS[prefix]
+    return None
+
+
+def context_budget(model=None, settings=None) -> int:
+    """
+    Tokens available for a prompt: the context.budget.<model> or
+    context.budget setting, else DEFAULT_CONTEXT_BUDGET, never more than
+    the model's context window minus OUTPUT_RESERVE.
+    """
+    budget = None
+    if settings is not None:
+        for key in ((f"context.budget.{model}",) if model else ()) + ("context.budget",):
+            raw = settings.get(key)
+            if raw is not None:
+                try:
+                    budget = int(raw)
+                    break
+                except ValueError:
+                    pass
+    if budget is None:
+        budget = DEFAULT_CONTEXT_BUDGET
+
+    window = context_window(model)
+    if window is not None:
+        budget = min(budget, window - OUTPUT_RESERVE)
+    return max(budget, 0)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# runners/daemon.py — keep llmcui warm behind a Unix socket
+#
+#   llmcui-daemon [--socket PATH] [--workers N] [--idle-timeout S]
+#
+# The daemon imports the CLI once, keeps a pool of worker threads (each with
+# its own pooled database connection) and runs `ai` requests sent by the
+# thin client (cli/client.py) in-process: argv, cwd and stdin come in,
+# stdout/stderr stream back, then the exit code.
+#
+# Requests for the same project run one at a time (a -c chat counts under
+# its own project, so it shares a lock with the default chat that
+# `aic "q"` would resolve to); requests that read files relative
+# to the caller's directory also take the working-directory lock, since
+# the cwd is process-wide. The daemon always uses its own environment.
+import argparse
+import contextlib
+import io
+import os
+import socket
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+if __package__ in (None, ""):
+    # run as a script: make the repository root importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli.client import recv_frame, send_frame, socket_path
+
+DEFAULT_WORKERS = 16
+FILE_OPTIONS = ("-f", "--filemode", "-a", "--attach", "--list-files", "batch")
+
+
+# -----------------------------------------------------------
+# Per-thread standard streams
+# -----------------------------------------------------------
+class _ThreadRouter(io.TextIOBase):
+    """
+    Stands in for sys.stdout / sys.stderr / sys.stdin: a thread serving a
+    request uses its own stream, every other thread the original one.
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def bind(self, stream):
+        self._local.stream = stream
+
+    def unbind(self):
+        self._local.stream = None
+
+    @property
+    def _stream(self):
+        return getattr(self._local, "stream", None) or self._fallback
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def write(self, s):
+        return self._stream.write(s)
+
+    def flush(self):
+        self._stream.flush()
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def readline(self, size=-1):
+        return self._stream.readline(size)
+
+    def isatty(self):
+        return self._stream.isatty()
+
+    def fileno(self):
+        return self._stream.fileno()
+
+
+_streams_guard = threading.Lock()
+
+
+def _routers():
+    """Put routers in place of sys.stdin/stdout/stderr (once) and return them."""
+    with _streams_guard:
+        routers = []
+        for name in ("stdin", "stdout", "stderr"):
+            stream = getattr(sys, name)
+            if not isinstance(stream, _ThreadRouter):
+                stream = _ThreadRouter(stream)
+                setattr(sys, name, stream)
+            routers.append(stream)
+        return routers
+
+
+class _Channel(io.TextIOBase):
+    """Text written here goes to the client as frames of one kind."""
+
+    def __init__(self, conn, kind, lock):
+        self.conn = conn
+        self.kind = kind
+        self.lock = lock
+        self.gone = False
+
+    def write(self, s):
+        if s and not self.gone:
+            try:
+                with self.lock:
+                    send_frame(self.conn, self.kind, s.encode("utf-8"))
+            except OSError:
+                self.gone = True  # client went away; finish quietly
+        return len(s)
+
+    def isatty(self):
+        return False
+
+
+# -----------------------------------------------------------
+# Request locking
+# -----------------------------------------------------------
+def _option(argv, *names):
+    for i, arg in enumerate(argv):
+        for name in names:
+            if arg == name and i + 1 < len(argv):
+                return argv[i + 1]
+            if arg.startswith(name + "="):
+                return arg[len(name) + 1:]
+    return None
+
+
+def lock_key(argv, chat_project=None):
+    """
+    What a request must be serialized on: the project it writes to.
+
+    `chat_project(chat_id)` names the project a -c chat belongs to; a chat
+    it does not know falls back to -p, like the CLI itself.
+    """
+    if argv[:1] == ["batch"]:
+        return ("batch",)
+    chat = _option(argv, "-c", "--chat")
+    project = chat_project(chat) if chat and chat_project else None
+    # no -p means the default project, so it shares a lock with `-p default`
+    return ("project", project or _option(argv, "-p", "--project") or "default")
+
+
+def needs_cwd(argv):
+    return any(
+        arg in FILE_OPTIONS or any(arg.startswith(o + "=") for o in FILE_OPTIONS if o.startswith("--"))
+        for arg in argv
+    )
+
+
+class Daemon:
+    def __init__(self, path=None, workers=DEFAULT_WORKERS, idle_timeout=None):
+        self.path = path or socket_path()
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._cwd_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.ready = threading.Event()
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _chat_project(self, chat_id):
+        import sqlite3
+
+        import cli.main
+        from core.db.database import Database
+
+        try:
+            row = Database(cli.main.DB_PATH).connect().execute(
+                "SELECT p.name FROM chats c JOIN projects p ON c.project_id = p.id "
+                "WHERE c.id = ?", (chat_id,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None  # no database yet: the CLI will report the chat
+        return row["name"] if row else None
+
+    @contextlib.contextmanager
+    def _serialized(self, argv, cwd):
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self._lock(lock_key(argv, self._chat_project)))
+            if cwd and needs_cwd(argv):
+                stack.enter_context(self._cwd_lock)
+                os.chdir(cwd)
+            yield
+
+    # -------------------------------------------------
+    # Serving
+    # -------------------------------------------------
+    def _bind(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)  # stale socket from a dead daemon
+            else:
+                probe.close()
+                raise RuntimeError(f"a daemon is already listening on {self.path}")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)  # created 0600: no window where others can connect
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        sock.listen(64)
+        sock.settimeout(0.5)
+        return sock
+
+    def serve_forever(self):
+        import cli.main  # the whole CLI, imported once
+
+        self._main = cli.main.main
+        sock = self._bind()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llmcui")
+        self.ready.set()
+        idle = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    idle += 0.5
+                    if self.idle_timeout and idle >= self.idle_timeout:
+                        break
+                    continue
+                idle = 0.0
+                conn.settimeout(None)
+                pool.submit(self._handle, conn)
+        finally:
+            sock.close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+            pool.shutdown(wait=True)
+            with _streams_guard:
+                for name in ("stdin", "stdout", "stderr"):
+                    stream = getattr(sys, name)
+                    if isinstance(stream, _ThreadRouter):
+                        setattr(sys, name, stream._fallback)
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                argv, cwd, stdin = _read_request(conn.makefile("rb"))
+            except (OSError, ValueError):
+                return
+            lock = threading.Lock()
+            rc = self.run(argv, cwd, stdin, _Channel(conn, b"o", lock), _Channel(conn, b"e", lock))
+            with contextlib.suppress(OSError):
+                send_frame(conn, b"x", str(rc).encode())
+
+    def run(self, argv, cwd, stdin, out, err):
+        """Run one `ai` invocation with the given streams; returns its exit code."""
+        routers = _routers()
+        for router, stream in zip(routers, (io.StringIO(stdin), out, err)):
+            router.bind(stream)
+        try:
+            with self._serialized(argv, cwd):
+                rc = self._main(argv, interactive=False)
+        except SystemExit as e:  # argparse --help / usage errors
+            rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            err.write(traceback.format_exc())
+            rc = 1
+        finally:
+            for router in routers:
+                router.unbind()
+        return rc if isinstance(rc, int) else 0
+
+
+def _read_request(rfile):
+    """Frames: c (cwd), a (argv, NUL-separated), i (stdin chunks), then "."."""
+    argv, cwd, stdin = [], None, []
+    while True:
+        kind, payload = recv_frame(rfile)
+        if kind is None:
+            raise ValueError("request ended early")
+        if kind == b".":
+            return argv, cwd, b"".join(stdin).decode("utf-8", errors="replace")
+        if kind == b"c":
+            cwd = payload.decode("utf-8")
+        elif kind == b"a":
+            argv = payload.decode("utf-8").split("\0") if payload else []
+        elif kind == b"i":
+            stdin.append(payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve `ai` requests from a warm process")
+    parser.add_argument("--socket", help=f"socket path (default {socket_path()})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="requests served at once")
+    parser.add_argument("--idle-timeout", type=float, default=0,
+                        help="exit after this many idle seconds (0 = never)")
+    args = parser.parse_args(argv)
+
+    daemon = Daemon(args.socket, workers=args.workers, idle_timeout=args.idle_timeout)
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
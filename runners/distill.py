@@ -1,105 +1,400 @@
 #!/usr/bin/env python3
 # runners/distill.py — background distillation for chat + project summaries using LLM
+#
+# Two modes:
+#   distill.py --db DB --project P --chat C   one-shot distillation (legacy)
+#   distill.py --db DB --worker               drain the jobs table, exit when idle
+#
+# The CLI enqueues a "distill" job per turn and calls ensure_worker(); at most
+# one worker per database runs at a time (guarded by an flock on DB.distill.lock).
 import argparse
-import datetime
+import os
 import sys
+import time
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: no lock, every spawn simply drains the queue
+    fcntl = None
+
+if __package__ in (None, ""):
+    # run as a script: make the repository root importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.db.database import Database, init_db
 from core.services.project_service import ProjectService
 from core.services.chat_service import ChatService
 from core.services.message_service import MessageService
 from core.services.llm_service import LLMService
+from core.services.job_service import STALE_RUNNING_S, JobService
+from core.services.settings_service import SettingsService
+from core.services.distill_policy import Decision, DistillPolicy
+from core.services.embedding_service import EmbeddingService
+from core.services.retention_service import RetentionService
 
+JOB_KIND = "distill"
+DEFAULT_IDLE_TIMEOUT = 30.0
+POLL_INTERVAL = 0.5
+PROJECT_MODES = ("rollup", "messages")
+CHUNK_MESSAGES = 50     # messages per chat summarization call
+BACKLOG_CHUNKS = 3      # backlog chunks one job folds in before re-enqueueing
 
-def now_iso():
-    return datetime.datetime.utcnow().isoformat() + "Z"
 
+def lock_path(db_path):
+    return db_path + ".distill.lock"
 
-def main():
-    parser = argparse.ArgumentParser(description="Background chat + project distillation (LLM-backed)")
-    parser.add_argument("--db", required=True)
-    parser.add_argument("--project", required=True)
-    parser.add_argument("--chat", required=True)
-    args = parser.parse_args()
 
-    # Initialize
-    init_db(args.db)
-    db = Database(args.db)
+def project_mode(db):
+    """distill.project_mode setting: "rollup" (default) or "messages"."""
+    mode = (SettingsService(db).get("distill.project_mode") or "rollup").strip().lower()
+    return mode if mode in PROJECT_MODES else "rollup"
 
-    chat_svc = ChatService(db)
+
+def distill(db, project, chat_id, llm, with_project=True, mode="rollup"):
+    """
+    Summarize one chat and, unless with_project is False, its project.
+
+    Chat distillation is incremental: the previous chat summary records the
+    highest message id it covers, and only messages after that watermark
+    are sent along with it. Nothing new since the watermark → no LLM call.
+    A longer backlog is summarized oldest-first, CHUNK_MESSAGES at a time,
+    each chunk folded into the previous summary; after BACKLOG_CHUNKS the
+    chat is enqueued again, so one job's latency stays bounded. A chat
+    without a summary starts from its legacy `distilled` summary, if any,
+    at the last message that summary had seen.
+
+    The project summary is rolled up from the latest summary of every chat
+    plus the previous project summary (mode "rollup"). Mode "messages", or a
+    project without chat summaries, summarizes the newest raw messages.
+    Errors are reported on stderr; nothing is raised.
+    """
     project_svc = ProjectService(db)
+    chat_svc = ChatService(db)
     msg_svc = MessageService(db)
-    llm = LLMService()  # uses default llm binary; override if you want
 
-    # 1) Fetch recent chat messages
+    # 1) Fetch the previous chat summary and the messages after its watermark
     try:
-        recent_msgs = msg_svc.last_messages(args.chat, limit=50)
+        previous_summary, watermark = chat_svc.get_chat_summary_state(chat_id)
+        if not watermark:
+            previous_summary, watermark = _legacy_state(db, chat_id)
+        new_msgs = msg_svc.messages_after(chat_id, watermark, limit=CHUNK_MESSAGES)
     except Exception as e:
-        print(f"[distill] failed to load recent messages for chat {args.chat}: {e}", file=sys.stderr)
-        recent_msgs = []
+        print(f"[distill] failed to load new messages for chat {chat_id}: {e}", file=sys.stderr)
+        previous_summary, watermark, new_msgs = "", 0, []
 
-    # 2) Fetch project messages (for project-level summary)
-    try:
-        conn = db.connect()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT m.role, m.content, m.ts
-            FROM messages m
-            JOIN chats c ON m.chat_id = c.id
-            JOIN projects p ON c.project_id = p.id
-            WHERE p.name = ?
-            ORDER BY m.id ASC
-            """,
-            (args.project,)
-        )
-        project_rows = cur.fetchall()
-        conn.close()
-    except Exception as e:
-        print(f"[distill] failed to load project messages for project {args.project}: {e}", file=sys.stderr)
-        project_rows = []
+    if not new_msgs:
+        print(f"[distill] chat={chat_id} unchanged since message {watermark} — skipping")
+        return
+
+    # every chunk but the last: fold into the chat summary, advance the watermark
+    chunks = 0
+    while len(new_msgs) == CHUNK_MESSAGES:
+        try:
+            more = msg_svc.messages_after(chat_id, new_msgs[-1]["id"], limit=CHUNK_MESSAGES)
+            if not more:
+                break
+            if chunks == BACKLOG_CHUNKS:
+                # the rest in a later job (due_chats sees the backlog)
+                JobService(db).enqueue(JOB_KIND, project, chat_id)
+                print(f"[distill] chat={chat_id} backlog continues after message {watermark}")
+                return
+            chat_summary = llm.summarize_chat(list(new_msgs), previous_summary)
+            if not chat_summary:
+                return
+            watermark = new_msgs[-1]["id"]
+            chat_svc.add_chat_summary(chat_id, chat_summary, watermark)
+        except Exception as e:
+            print(f"[distill] chat={chat_id} backlog summarization failed: {e}", file=sys.stderr)
+            return
+        previous_summary, new_msgs = chat_summary, more
+        chunks += 1
 
     # Convert rows to list-like mapping where possible (sqlite3.Row supports mapping access)
-    chat_msgs = list(recent_msgs)
-    project_msgs = list(project_rows)
+    chat_msgs = list(new_msgs)
+    upto = chat_msgs[-1]["id"]
+    project_summary = ""
 
-    # 3) Use single LLM call to request structured JSON (chat + project).
-    try:
-        chat_summary, project_summary = llm.summarize_both(chat_msgs, project_msgs)
-    except Exception as e:
-        print(f"[distill] llm.summarize_both failed: {e}", file=sys.stderr)
-        chat_summary, project_summary = "", ""
+    if with_project and mode == "messages":
+        # 2) Single LLM call for chat + project over the newest raw messages
+        project_msgs = _recent_project_messages(project_svc, project)
+        try:
+            chat_summary, project_summary = llm.summarize_both(
+                chat_msgs, project_msgs, previous_chat_summary=previous_summary
+            )
+        except Exception as e:
+            print(f"[distill] llm.summarize_both failed: {e}", file=sys.stderr)
+            chat_summary, project_summary = "", ""
+    else:
+        # 2) Chat summary on its own; the project rolls up from chat summaries
+        try:
+            chat_summary = llm.summarize_chat(chat_msgs, previous_summary)
+        except Exception as e:
+            print(f"[distill] llm.summarize_chat failed: {e}", file=sys.stderr)
+            chat_summary = ""
 
-    # 4) Persist chat-level summary (distilled)
+    # 3) Persist chat-level summary with its watermark
     try:
         if chat_summary:
-            conn = db.connect()
-            cur = conn.cursor()
-            cur.execute(
-                """
-                INSERT INTO distilled(project_name, chat_id, summary, created_at)
-                VALUES (?,?,?,?)
-                """,
-                (args.project, args.chat, chat_summary, now_iso())
-            )
-            conn.commit()
-            conn.close()
-            print(f"[distill] wrote chat summary for chat={args.chat} (len={len(chat_summary)})")
+            chat_svc.add_chat_summary(chat_id, chat_summary, upto)
+            print(f"[distill] wrote chat summary for chat={chat_id} upto={upto} (len={len(chat_summary)})")
     except Exception as e:
-        print(f"[distill] failed to write chat distilled row: {e}", file=sys.stderr)
+        print(f"[distill] failed to write chat summary: {e}", file=sys.stderr)
+
+    if with_project and mode != "messages":
+        # 4) Roll the project up from the latest per-chat summaries
+        try:
+            chat_summaries = project_svc.latest_chat_summaries(project)
+            if chat_summaries:
+                project_summary = llm.summarize_project_rollup(
+                    chat_summaries, project_svc.get_distilled_project(project)
+                )
+            else:
+                project_summary = llm.summarize_project(
+                    _recent_project_messages(project_svc, project)
+                )
+        except Exception as e:
+            print(f"[distill] project summarization failed: {e}", file=sys.stderr)
+            project_summary = ""
 
     # 5) Persist project-level summary (project_summaries table)
     try:
         if project_summary:
-            latest = project_svc.get_distilled_project(args.project) or ""
+            latest = project_svc.get_distilled_project(project) or ""
             if project_summary.strip() != latest.strip():
-                project_svc.add_project_summary(args.project, project_summary)
-                print(f"[distill] wrote project summary for project={args.project} (len={len(project_summary)})")
+                project_svc.add_project_summary(project, project_summary)
+                print(f"[distill] wrote project summary for project={project} (len={len(project_summary)})")
             else:
-                print(f"[distill] project summary unchanged for project={args.project} — skipping write")
+                print(f"[distill] project summary unchanged for project={project} — skipping write")
     except Exception as e:
         print(f"[distill] failed to write project summary: {e}", file=sys.stderr)
 
 
+def _recent_project_messages(project_svc, project):
+    try:
+        return list(project_svc.recent_messages(project, limit=200))
+    except Exception as e:
+        print(f"[distill] failed to load project messages for project {project}: {e}", file=sys.stderr)
+        return []
+
+
+def _legacy_state(db, chat_id):
+    """
+    (summary, watermark) from the legacy distilled table: its newest
+    summary and the last message written before it, else ("", 0).
+    """
+    conn = db.connect()
+    row = conn.execute(
+        "SELECT summary, created_at FROM distilled WHERE chat_id = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 1",
+        (chat_id,)
+    ).fetchone()
+    upto = None
+    if row is not None and row["summary"]:
+        upto = conn.execute(
+            "SELECT MAX(id) FROM messages WHERE chat_id = ? AND ts <= ?",
+            (chat_id, row["created_at"])
+        ).fetchone()[0]
+    conn.close()
+    return (row["summary"], upto) if upto else ("", 0)
+
+
+def _has_backlog(db, chat_id) -> bool:
+    """The last 'run' decision saw messages the chat summary does not cover yet."""
+    conn = db.connect()
+    row = conn.execute(
+        "SELECT upto_message_id FROM distill_decisions "
+        "WHERE chat_id = ? AND decision = 'run' ORDER BY id DESC LIMIT 1",
+        (chat_id,)
+    ).fetchone()
+    conn.close()
+    if row is None or not row["upto_message_id"]:
+        return False
+    return row["upto_message_id"] > ChatService(db).get_chat_summary_state(chat_id)[1]
+
+
+def due_chats(db, project, chat_ids, policy=None):
+    """
+    Apply the distillation policy (from settings unless given) to each chat,
+    record every decision, and return the chats that should be distilled.
+    A chat whose last run left a backlog is due regardless.
+    """
+    policy = policy or DistillPolicy.from_settings(SettingsService(db))
+    due = []
+    for chat_id in chat_ids:
+        decision = policy.evaluate(db, chat_id)
+        if not decision.run and _has_backlog(db, chat_id):
+            decision = Decision(True, "backlog left by the last run", decision.new_chars,
+                                decision.new_turns, decision.upto_message_id)
+        DistillPolicy.record(db, chat_id, project, decision)
+        if decision.run:
+            due.append(chat_id)
+        else:
+            print(f"[distill] skipping chat={chat_id}: {decision.reason}")
+    return due
+
+
+# -----------------------------------------------------------
+# Worker
+# -----------------------------------------------------------
+def _archive_idle(db) -> int:
+    from core.services.archive_service import ArchiveService, after_days
+    from core.services.settings_service import SettingsService
+
+    settings = SettingsService(db)
+    if settings.get("archive.after_days") is None:
+        return 0  # automatic archival is opt-in
+    days = after_days(settings)
+    return ArchiveService(db).archive_idle(days) if days is not None else 0
+
+
+def _recheck_skipped(db, jobs) -> int:
+    policy = DistillPolicy.from_settings(SettingsService(db))
+    stale = policy.stale_skips(db)
+    for chat_id, project in stale:
+        jobs.enqueue(JOB_KIND, project, chat_id)
+    return len(stale)
+
+
+def run_job(db, jobs, llm):
+    """
+    Claim and process one batch. Chats below the policy thresholds are
+    skipped. The project summary is produced once per batch, together with
+    the last due chat. With the queue empty, backfills the retrieval index
+    and re-queues skipped chats whose interval has elapsed instead. Returns
+    False when there was nothing to do.
+    """
+    job, chat_ids = jobs.claim(JOB_KIND)
+    if job is None:
+        # idle: embed rows written before the retrieval index existed, give
+        # skipped chats their max_interval_s run, then move long-unused
+        # chats to cold storage if archive.after_days is set
+        if EmbeddingService(db).index_missing() > 0:
+            return True
+        if _recheck_skipped(db, jobs) > 0:
+            return True
+        return _archive_idle(db) > 0
+
+    start = time.perf_counter()
+    error = None
+    try:
+        due = due_chats(db, job["project_name"], chat_ids)
+        mode = project_mode(db)
+        # project last, so its rollup sees every fresh chat summary
+        for i, chat_id in enumerate(due):
+            distill(
+                db, job["project_name"], chat_id, llm,
+                with_project=(i == len(due) - 1), mode=mode,
+            )
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+        print(f"[distill] job {job['id']} failed: {error}", file=sys.stderr)
+    jobs.finish(job["id"], (time.perf_counter() - start) * 1000, error)
+    return True
+
+
+def _try_lock(path):
+    """Return an open, exclusively locked file, or None if someone holds it."""
+    if fcntl is None:
+        return open(path, "a")
+    fh = open(path, "a")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+
+def worker_running(db_path) -> bool:
+    if fcntl is None:
+        return False
+    fh = _try_lock(lock_path(db_path))
+    if fh is None:
+        return True
+    fh.close()
+    return False
+
+
+def run_worker(db_path, idle_timeout=DEFAULT_IDLE_TIMEOUT, llm=None):
+    """
+    Drain the job queue, then wait up to idle_timeout seconds for more work
+    before exiting. Returns the number of batches processed.
+    """
+    init_db(db_path)
+    db = Database(db_path)
+    jobs = JobService(db)
+    llm = llm or LLMService()
+    processed = 0
+
+    while True:
+        lock = _try_lock(lock_path(db_path))
+        if lock is None:
+            return processed  # another worker owns the queue
+        try:
+            # holding the lock, no other worker can be running our jobs
+            jobs.requeue_stale(JOB_KIND, 0 if fcntl is not None else STALE_RUNNING_S)
+            RetentionService(db).prune_history()
+            idle_since = time.monotonic()
+            while time.monotonic() - idle_since < idle_timeout:
+                if run_job(db, jobs, llm):
+                    processed += 1
+                    idle_since = time.monotonic()
+                else:
+                    time.sleep(POLL_INTERVAL)
+        finally:
+            lock.close()
+
+        # a producer may have enqueued while we were shutting down and seen
+        # the lock still held; pick that work up instead of stranding it
+        if not jobs.pending_count(JOB_KIND):
+            return processed
+
+
+def ensure_worker(db_path):
+    """Start a detached worker for db_path unless one is already running."""
+    if worker_running(db_path):
+        return False
+
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--db", db_path, "--worker"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background chat + project distillation (LLM-backed)")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--project")
+    parser.add_argument("--chat")
+    parser.add_argument("--worker", action="store_true",
+                        help="process queued distill jobs until idle")
+    parser.add_argument("--force", action="store_true",
+                        help="distill even if the policy thresholds are not met")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="seconds a worker waits for new jobs before exiting")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.db, idle_timeout=args.idle_timeout)
+        return 0
+
+    if not args.project or not args.chat:
+        parser.error("--project and --chat are required without --worker")
+
+    # Initialize
+    init_db(args.db)
+    db = Database(args.db)
+    llm = LLMService()  # backend from $LLMCUI_LLM_BACKEND; subprocess by default
+
+    if args.force or due_chats(db, args.project, [args.chat]):
+        distill(db, args.project, args.chat, llm, mode=project_mode(db))
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -15,5 +15,7 @@ def temp_db(tmp_path, monkeypatch):
     # initialize DB
     init_db(str(db_path))
 
-    # return Database instance
-    return Database(str(db_path))
+    # return Database instance; drop its pooled connection afterwards
+    db = Database(str(db_path))
+    yield db
+    db.close()
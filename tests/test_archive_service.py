@@ -0,0 +1,135 @@
+import os
+
+import cli.main
+import core.services.archive_service as archive_service
+from core.services.archive_service import ArchiveService, archive_path
+from core.services.chat_service import ChatService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.search_service import SearchService
+from core.services.settings_service import SettingsService
+
+
+def _chat(temp_db, project="proj"):
+    chat_id = ChatService(temp_db).get_or_create_first(ProjectService(temp_db).get_or_create(project))
+    msvc = MessageService(temp_db)
+    ids = [
+        msvc.add_message(chat_id, "user", "how do I tune the wal checkpoint"),
+        msvc.add_message(chat_id, "assistant", "checkpoint advice " + "x" * 6000),
+    ]
+    ChatService(temp_db).add_chat_summary(chat_id, "talked about checkpoints", ids[-1])
+    return chat_id, ids
+
+
+def _count(temp_db, table, chat_id):
+    return temp_db.connect().execute(
+        f"SELECT COUNT(*) FROM {table} WHERE chat_id = ?", (chat_id,)
+    ).fetchone()[0]
+
+
+def test_archive_moves_chat_to_cold_store_and_keeps_it_searchable(temp_db):
+    chat_id, _ = _chat(temp_db)
+    archive = ArchiveService(temp_db)
+
+    assert archive.archive_chat(chat_id)
+    assert not archive.archive_chat(chat_id)          # already archived
+    assert os.path.exists(archive_path(temp_db.db_path))
+    for table in ("messages", "chat_summaries", "embeddings"):
+        assert _count(temp_db, table, chat_id) == 0
+    assert archive.is_archived(chat_id)
+
+    stats = archive.stats()
+    assert (stats["chats"], stats["messages"]) == (1, 2)
+    assert stats["stored_bytes"] < stats["raw_bytes"]
+
+    hits = SearchService(temp_db).search("wal checkpoint")
+    assert [(h.chat_id, h.role) for h in hits] == [(chat_id, "user")]
+    assert "(archived)" in hits[0].chat_title and "[wal]" in hits[0].snippet
+
+
+def test_ensure_hot_restores_everything(temp_db):
+    chat_id, ids = _chat(temp_db)
+    before = MessageService(temp_db).get_messages(chat_id)
+    archive = ArchiveService(temp_db)
+    archive.archive_chat(chat_id)
+
+    assert archive.ensure_hot(chat_id)
+    assert not archive.ensure_hot(chat_id)
+
+    msgs = MessageService(temp_db).page(chat_id, limit=10)
+    assert sorted(m["id"] for m in msgs) == ids
+    assert [tuple(m) for m in MessageService(temp_db).get_messages(chat_id)] == [tuple(m) for m in before]
+    assert ChatService(temp_db).get_distilled_chat(chat_id) == "talked about checkpoints"
+    assert _count(temp_db, "embeddings", chat_id) == 3
+    assert archive.stats()["chats"] == 0
+
+    hits = SearchService(temp_db).search("advice")
+    assert [h.message_id for h in hits] == [ids[1]]
+
+
+def test_archive_idle_uses_last_used(temp_db):
+    old, _ = _chat(temp_db, "old")
+    fresh, _ = _chat(temp_db, "fresh")
+    conn = temp_db.connect()
+    conn.execute("UPDATE chats SET last_used = '2020-01-01T00:00:00Z' WHERE id = ?", (old,))
+    conn.commit()
+
+    assert ArchiveService(temp_db).archive_idle(30) == 1
+    assert ArchiveService(temp_db).is_archived(old)
+    assert not ArchiveService(temp_db).is_archived(fresh)
+
+
+def test_archive_leaves_a_chat_used_meanwhile_hot(temp_db, monkeypatch):
+    chat_id, ids = _chat(temp_db)
+    pack = archive_service.pack
+
+    def pack_while_a_turn_runs(*args, **kwargs):
+        ChatService(temp_db).touch(chat_id)
+        MessageService(temp_db).add_message(chat_id, "user", "one more question")
+        return pack(*args, **kwargs)
+
+    monkeypatch.setattr(archive_service, "pack", pack_while_a_turn_runs)
+    archive = ArchiveService(temp_db)
+    assert not archive.archive_chat(chat_id)
+    assert not archive.is_archived(chat_id)
+    assert _count(temp_db, "messages", chat_id) == 3
+    assert archive.stats()["chats"] == 0
+
+
+def test_admin_archive_respects_setting_off(temp_db, monkeypatch, capsys):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    chat_id, _ = _chat(temp_db)
+    SettingsService(temp_db).set("archive.after_days", "off")
+
+    assert cli.main.main(["--archive"]) == 0
+    assert "Archiving is off" in capsys.readouterr().out
+    assert not ArchiveService(temp_db).is_archived(chat_id)
+
+    assert cli.main.main(["--archive", "0"]) == 0
+    assert ArchiveService(temp_db).is_archived(chat_id)
+
+
+def test_prompt_on_archived_chat_restores_it(temp_db, monkeypatch):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    chat_id, _ = _chat(temp_db)
+    ArchiveService(temp_db).archive_chat(chat_id)
+
+    assert cli.main.main(["-p", "proj", "-c", chat_id, "again"]) == 0
+    assert not ArchiveService(temp_db).is_archived(chat_id)
+    assert _count(temp_db, "messages", chat_id) == 4
+
+
+def test_reset_of_archived_chat_does_not_restore_it(temp_db, monkeypatch):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    chat_id, _ = _chat(temp_db)
+    archive = ArchiveService(temp_db)
+    archive.archive_chat(chat_id)
+
+    assert cli.main.main(["-p", "proj", "-r", "-c", chat_id, "fresh start"]) == 0
+
+    texts = [m["content"] for m in MessageService(temp_db).get_messages(chat_id)]
+    assert texts[0] == "fresh start" and len(texts) == 2
+    assert not archive.is_archived(chat_id)
+    assert archive.stats()["chats"] == 0
@@ -0,0 +1,109 @@
+import builtins
+from types import SimpleNamespace
+
+import cli.main
+from cli.commands.prompt_builder import build_prompt, resolve_attachments
+from core.services.attachment_service import AttachmentService
+from core.services.chat_service import ChatService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+
+
+def _count(db, table):
+    conn = db.connect()
+    n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_same_content_is_stored_once(temp_db, tmp_path):
+    a = tmp_path / "a.log"
+    b = tmp_path / "b.log"
+    a.write_text("same bytes\n" * 1000)
+    b.write_text("same bytes\n" * 1000)
+
+    store = AttachmentService(temp_db)
+    first, second = store.add_file(str(a)), store.add_file(str(b))
+
+    assert first.hash == second.hash
+    assert first.size == 11000
+    assert _count(temp_db, "attachments") == 1
+    assert store.text(first.hash) == a.read_text()
+
+
+def test_unchanged_file_is_not_read_again(temp_db, tmp_path, monkeypatch):
+    f = tmp_path / "big.log"
+    f.write_text("line\n" * 100)
+    store = AttachmentService(temp_db)
+    first = store.add_file(str(f))
+
+    real_open = builtins.open
+
+    def no_reread(path, *args, **kwargs):
+        assert str(path) != str(f), "unchanged file was read again"
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", no_reread)
+    assert store.add_file(str(f)).hash == first.hash
+    monkeypatch.setattr(builtins, "open", real_open)
+
+    f.write_text("changed\n")
+    changed = store.add_file(str(f))
+    assert changed.hash != first.hash
+    assert store.text(changed.hash) == "changed\n"
+
+
+def test_messages_reference_attachments(temp_db, tmp_path):
+    f = tmp_path / "notes.txt"
+    f.write_text("attached notes")
+    project = ProjectService(temp_db).get_or_create_default()
+    chat_svc = ChatService(temp_db)
+    chat_id = chat_svc.get_or_create_first(project)
+
+    att = AttachmentService(temp_db).add_file(str(f))
+    message_id = MessageService(temp_db).add_message(chat_id, "user", "summarize", attachments=[att])
+
+    assert AttachmentService(temp_db).for_message(message_id) == [att]
+    assert MessageService(temp_db).get_messages(chat_id)[0]["content"] == "summarize"
+
+    chat_svc.reset_chat(chat_id)
+    assert _count(temp_db, "message_attachments") == 0
+
+
+def test_prompt_uses_stored_file_content(temp_db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "only.txt").write_text("file body")
+    psvc, csvc = ProjectService(temp_db), ChatService(temp_db)
+    project = psvc.get_or_create_default()
+    chat_id = csvc.get_or_create_first(project)
+
+    args = SimpleNamespace(prompt="what is in it?", filemode=True, selector="0", attach=None)
+    prompt = build_prompt(args, temp_db, project, chat_id, psvc, csvc)
+    assert "### FILE: only.txt\nfile body" in prompt
+
+    bad = SimpleNamespace(prompt="q", filemode=False, selector=None, attach=["missing.txt"])
+    attachments, errors = resolve_attachments(bad, temp_db)
+    assert attachments == []
+    assert errors and "missing.txt" in errors[0]
+
+
+def test_cli_attach_stores_reference_not_content(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    f = tmp_path / "trace.log"
+    f.write_text("Traceback: boom")
+    seen = []
+
+    def fake_call(self, prompt_text, timeout=120, on_chunk=None):
+        seen.append(prompt_text)
+        return "answer"
+
+    monkeypatch.setattr("core.services.llm_service.LLMService.call_prompt", fake_call)
+
+    assert cli.main.main(["-p", "proj", "--attach", str(f), "why?"]) == 0
+
+    assert "Traceback: boom" in seen[0]
+    conn = temp_db.connect()
+    rows = conn.execute("SELECT content FROM messages WHERE role = 'user'").fetchall()
+    conn.close()
+    assert [r["content"] for r in rows] == ["why?"]
+    assert _count(temp_db, "message_attachments") == 1
@@ -0,0 +1,118 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import cli.main
+from cli.commands.batch import read_items, run_batch
+from core.services.llm_backends import FakeBackend
+from core.services.llm_service import LLMService
+from core.services.message_service import MessageService
+
+
+def _items(*objs):
+    return read_items(io.StringIO("\n".join(
+        o if isinstance(o, str) else json.dumps(o) for o in objs
+    )))
+
+
+def test_read_items_reports_bad_lines():
+    items = _items({"prompt": "a"}, "", "not json", {"no": "prompt"})
+    assert [(n, err is None) for n, _, err in items] == [(1, True), (3, False), (4, False)]
+
+
+def test_batch_runs_prompts_and_stores_messages(temp_db):
+    out = io.StringIO()
+    items = _items(
+        {"prompt": "one", "id": "a", "project": "p"},
+        {"prompt": "two", "id": "b", "project": "q"},
+        "{broken",
+    )
+
+    ok, failed, chats = run_batch(
+        temp_db, items, out, concurrency=2, new_chats=True,
+        make_llm=lambda: LLMService(backend=FakeBackend(reply=lambda p: "answer")),
+    )
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert (ok, failed) == (2, 1)
+    assert sorted(r["line"] for r in results) == [1, 2, 3]
+    by_id = {r["id"]: r for r in results if r["id"]}
+    assert by_id["a"]["response"] == "answer" and by_id["a"]["latency_s"] >= 0
+    assert by_id["b"]["project"] == "q"
+    assert {p for p, _ in chats} == {"p", "q"}
+
+    msgs = MessageService(temp_db).get_messages(by_id["a"]["chat"])
+    assert [(m["role"], m["content"]) for m in msgs] == [("user", "one"), ("assistant", "answer")]
+
+
+def test_same_chat_items_run_in_order_and_see_earlier_turns(temp_db):
+    prompts = []
+
+    def reply(prompt):
+        prompts.append(prompt)
+        return f"reply {len(prompts)}"
+
+    items = _items({"prompt": "first", "project": "p"}, {"prompt": "second", "project": "p"})
+    out = io.StringIO()
+    run_batch(temp_db, items, out, concurrency=4,
+              make_llm=lambda: LLMService(backend=FakeBackend(reply=reply)))
+
+    assert "first" in prompts[1] and "reply 1" in prompts[1]
+    assert [json.loads(l)["line"] for l in out.getvalue().splitlines()] == [1, 2]
+
+
+def test_different_chats_run_concurrently(temp_db):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow(prompt):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    items = _items(*({"prompt": f"q{i}", "project": "p"} for i in range(6)))
+    run_batch(temp_db, items, io.StringIO(), concurrency=3, new_chats=True,
+              make_llm=lambda: LLMService(backend=FakeBackend(reply=slow)))
+
+    assert peak[0] == 3
+
+
+def test_failed_write_releases_waiting_workers(temp_db):
+    class BrokenPipe(io.StringIO):
+        def write(self, s):
+            raise BrokenPipeError("reader went away")
+
+    items = _items(*({"prompt": f"q{i}", "project": "p"} for i in range(4)))
+    done = []
+
+    def run():
+        with pytest.raises(BrokenPipeError):
+            run_batch(temp_db, items, BrokenPipe(), concurrency=2,
+                      make_llm=lambda: LLMService(backend=FakeBackend(reply=lambda p: "ok")))
+        done.append(True)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(5)
+    assert done == [True]
+
+
+def test_cli_batch_command(temp_db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    src = tmp_path / "in.jsonl"
+    src.write_text(json.dumps({"prompt": "hello", "project": "p"}) + "\n")
+    dst = tmp_path / "out.jsonl"
+
+    assert cli.main.main(["batch", str(src), "-o", str(dst), "-j", "2"]) == 0
+
+    [result] = [json.loads(l) for l in dst.read_text().splitlines()]
+    assert result["response"].startswith("fake response")
+    assert "1 ok, 0 failed" in capsys.readouterr().err
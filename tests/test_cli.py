@@ -11,3 +11,106 @@ def test_cli_basic_invocation(monkeypatch):
 
         assert rc == 0
         mock_call.assert_called_once()
+
+
+def test_cli_keeps_partial_answer_on_interrupt(temp_db, monkeypatch):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+
+    def fake_call(self, prompt_text, timeout=120, on_chunk=None):
+        on_chunk("partial ")
+        on_chunk("answer")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(
+        "core.services.llm_service.LLMService.call_prompt", fake_call
+    )
+
+    rc = cli.main.main(["-p", "proj", "hello"])
+
+    assert rc == 130
+    rows = temp_db.connect().execute(
+        "SELECT role, content FROM messages ORDER BY id"
+    ).fetchall()
+    assert [(r["role"], r["content"]) for r in rows] == [
+        ("user", "hello"),
+        ("assistant", "partial answer"),
+    ]
+
+
+def test_session_loop_keeps_services_warm_across_turns(temp_db, monkeypatch):
+    import runners.distill
+    from core.services.llm_backends import FakeBackend
+    from core.services.message_service import MessageService
+
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setattr(cli.main, "running_under_pytest", lambda: False)
+    monkeypatch.setattr(runners.distill, "ensure_worker", lambda db_path: False)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    monkeypatch.setattr(FakeBackend, "_reply", lambda self, prompt: "answer")
+
+    turns = iter([
+        {"interactive_project": "proj", "interactive_chat": None, "interactive_prompt": "second"},
+        {"interactive_project": "proj", "interactive_chat": None, "interactive_prompt": "third"},
+        0,
+    ])
+    menus = []
+
+    def fake_menu(db, project_svc, chat_svc, msg_svc, llm, settings,
+                  current_project, current_chat):
+        menus.append((id(db), id(llm), current_chat))
+        choice = next(turns)
+        if isinstance(choice, dict):
+            choice["interactive_chat"] = current_chat
+        return choice
+
+    monkeypatch.setattr("cli.interactive.post_response.post_response_menu", fake_menu)
+    real_main = cli.main.main
+    calls = []
+    monkeypatch.setattr(cli.main, "main", lambda argv=None: calls.append(argv) or real_main(argv))
+
+    assert cli.main.main(["-p", "proj", "first"]) == 0
+
+    assert len(calls) == 1                       # no recursive re-entry
+    assert len({m[:2] for m in menus}) == 1      # same db and llm every turn
+    chat_id = menus[0][2]
+    msgs = MessageService(temp_db).get_messages(chat_id)
+    assert [m["content"] for m in msgs] == ["first", "answer", "second", "answer", "third", "answer"]
+
+    # the prefetch left the chat's context materialized
+    row = temp_db.connect().execute(
+        "SELECT recent_turns FROM chat_context WHERE chat_id = ?", (chat_id,)
+    ).fetchone()
+    assert row is not None
+
+
+def test_failed_model_call_stores_no_half_turn(temp_db, monkeypatch):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setattr(
+        "core.services.llm_service.LLMService.call_prompt",
+        lambda self, prompt_text, timeout=120, on_chunk=None: None,
+    )
+
+    assert cli.main.main(["-p", "proj", "hello"]) == 1
+    conn = temp_db.connect()
+    assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+    assert conn.execute(
+        "SELECT COUNT(*) FROM debug_log WHERE info LIKE 'model call failed%'"
+    ).fetchone()[0] == 1
+
+
+def test_prompt_is_built_without_holding_the_write_lock(temp_db, monkeypatch):
+    import cli.commands.prompt_builder as prompt_builder
+
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    build = prompt_builder.build_prompt_with_report
+    locked = []
+
+    def build_and_check(*args, **kwargs):
+        locked.append(kwargs["db"].connect().in_transaction)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(prompt_builder, "build_prompt_with_report", build_and_check)
+
+    assert cli.main.main(["-p", "proj", "hello"]) == 0
+    assert locked == [False]
@@ -0,0 +1,100 @@
+import zlib
+
+import pytest
+
+from core.services.chat_service import ChatService
+from core.services.distill_policy import DistillPolicy
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.search_service import SearchService
+from core.utils import compression
+from core.utils.compression import pack, unpack
+
+BIG = "def handler(event):\n    return process(event)\n" * 400   # ~18 KB, compressible
+
+
+def _chat(db):
+    return ChatService(db).get_or_create_first(ProjectService(db).get_or_create_default())
+
+
+def _stored(db):
+    conn = db.connect()
+    row = conn.execute("SELECT content, fmt FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+    conn.close()
+    return row
+
+
+def test_pack_only_compresses_large_compressible_text(monkeypatch):
+    monkeypatch.delenv("LLMCUI_COMPRESSION", raising=False)
+    assert pack("short") == ("short", None)
+
+    data, fmt = pack(BIG)
+    assert fmt == "zlib"
+    assert len(data) < len(BIG) / 5
+    assert unpack(data, fmt) == BIG
+
+    assert unpack("plain", None) == "plain"
+
+
+def test_pack_keeps_text_that_does_not_shrink_enough(monkeypatch):
+    monkeypatch.delenv("LLMCUI_COMPRESSION", raising=False)
+    monkeypatch.setattr(compression, "MIN_SAVING", 0.0)
+    assert pack(BIG) == (BIG, None)
+
+
+def test_compression_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv("LLMCUI_COMPRESSION", "off")
+    assert pack(BIG) == (BIG, None)
+
+
+def test_zstd_when_available(monkeypatch):
+    pytest.importorskip("zstandard")
+    monkeypatch.setenv("LLMCUI_COMPRESSION", "zstd")
+    data, fmt = pack(BIG)
+    assert fmt == "zstd"
+    assert unpack(data, fmt) == BIG
+
+
+def test_zstd_falls_back_to_zlib_without_the_package(monkeypatch):
+    monkeypatch.setenv("LLMCUI_COMPRESSION", "zstd")
+    monkeypatch.setattr(compression, "_zstd", lambda: None)
+    assert pack(BIG)[1] == "zlib"
+
+
+def test_messages_are_stored_compressed_and_read_transparently(temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_COMPRESSION", raising=False)
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "small")
+    msvc.add_message(chat_id, "assistant", BIG)
+
+    row = _stored(temp_db)
+    assert row["fmt"] == "zlib"
+    assert zlib.decompress(row["content"]).decode() == BIG
+
+    assert msvc.get_messages(chat_id)[-1]["content"] == BIG
+    assert msvc.last_messages(chat_id)[-1]["content"] == BIG
+    assert msvc.messages_after(chat_id, 0)[-1]["content"] == BIG
+    assert list(msvc.iter_messages(chat_id))[-1]["content"] == BIG
+    assert ChatService(temp_db).get_messages(chat_id)[-1]["content"] == BIG
+
+
+def test_compressed_messages_are_searchable_and_counted_raw(temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_COMPRESSION", raising=False)
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", BIG)
+
+    hits = SearchService(temp_db).search("handler")
+    assert [h.chat_id for h in hits] == [chat_id]
+    assert "[handler]" in hits[0].snippet
+    # the index keeps no second, uncompressed copy of the text
+    assert temp_db.connect().execute(
+        "SELECT name FROM sqlite_master WHERE name = 'messages_fts_content'"
+    ).fetchone() is None
+
+    decision = DistillPolicy(min_chars=1, min_turns=0).evaluate(temp_db, chat_id)
+    assert decision.new_chars == len(BIG)
+
+    ChatService(temp_db).reset_chat(chat_id)
+    assert SearchService(temp_db).search("handler") == []
@@ -0,0 +1,88 @@
+from core.services.chat_service import ChatService
+from core.services.context_service import ContextAssembler, ContextSnapshotService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+
+
+def _setup(db):
+    psvc, csvc, msvc = ProjectService(db), ChatService(db), MessageService(db)
+    project = psvc.get_or_create("p")
+    chat_id = csvc.force_new_chat(project)
+    msvc.add_message(chat_id, "user", "hello")
+    msvc.add_message(chat_id, "assistant", "hi there")
+    snapshots = ContextSnapshotService(db, psvc, csvc, msvc)
+    return project, chat_id, psvc, csvc, msvc, snapshots
+
+
+def _row(db, chat_id):
+    conn = db.connect()
+    row = conn.execute("SELECT * FROM chat_context WHERE chat_id = ?", (chat_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_snapshot_is_materialized_and_served_from_one_row(temp_db):
+    project, chat_id, psvc, csvc, msvc, snapshots = _setup(temp_db)
+    psvc.add_project_summary(project, "project summary")
+    csvc.add_chat_summary(chat_id, "chat summary", 2)
+
+    first = snapshots.load(project, chat_id)
+    assert _row(temp_db, chat_id) is not None
+
+    class Unused:
+        def __getattr__(self, name):
+            raise AssertionError(f"{name} called on a warm snapshot")
+
+    warm = ContextSnapshotService(temp_db, Unused(), Unused(), Unused())
+    second = warm.load(project, chat_id)
+
+    assert second == first
+    assert second.project_summary == "project summary"
+    assert second.chat_summary == "chat summary"
+    assert second.turns == [("user", "hello"), ("assistant", "hi there")]
+
+
+def test_new_message_invalidates_only_recent_turns(temp_db):
+    project, chat_id, psvc, csvc, msvc, snapshots = _setup(temp_db)
+    snapshots.load(project, chat_id)
+
+    msvc.add_message(chat_id, "user", "again")
+    assert _row(temp_db, chat_id)["recent_turns"] is None
+
+    snap = snapshots.load(project, chat_id)
+    assert snap.turns[-1] == ("user", "again")
+    assert _row(temp_db, chat_id)["recent_turns"] is not None
+
+
+def test_summary_writes_propagate_into_snapshot(temp_db):
+    project, chat_id, psvc, csvc, msvc, snapshots = _setup(temp_db)
+    snapshots.load(project, chat_id)
+
+    csvc.add_chat_summary(chat_id, "new chat summary", 2)
+    psvc.add_project_summary(project, "new project summary")
+
+    row = _row(temp_db, chat_id)
+    assert row["chat_summary"] == "new chat summary"
+    assert row["project_summary"] == "new project summary"
+
+
+def test_reset_chat_drops_snapshot(temp_db):
+    project, chat_id, psvc, csvc, msvc, snapshots = _setup(temp_db)
+    snapshots.load(project, chat_id)
+
+    csvc.reset_chat(chat_id)
+
+    assert _row(temp_db, chat_id) is None
+    assert snapshots.load(project, chat_id).turns == []
+
+
+def test_assembler_uses_snapshot(temp_db):
+    project, chat_id, psvc, csvc, msvc, snapshots = _setup(temp_db)
+    csvc.add_chat_summary(chat_id, "chat summary", 2)
+    assembler = ContextAssembler(psvc, csvc, msvc, snapshots=snapshots)
+
+    context, required, report = assembler.assemble(project, chat_id, [("message", "q")])
+
+    assert any("[CHAT_CONTEXT]\nchat summary" in part for part in context)
+    assert report.turns_included == 2
+    assert required == ["q"]
@@ -0,0 +1,133 @@
+import io
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+import cli.client
+import cli.main
+from core.services.llm_backends import FakeBackend
+from core.services.message_service import MessageService
+from runners.daemon import Daemon, lock_key, needs_cwd
+
+
+@pytest.fixture
+def daemon(temp_db, tmp_path, monkeypatch):
+    path = str(tmp_path / "d.sock")
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    monkeypatch.setenv("LLMCUI_SOCKET", path)
+
+    d = Daemon(path, workers=4)
+    t = threading.Thread(target=d.serve_forever, daemon=True)
+    t.start()
+    assert d.ready.wait(5)
+    yield d
+    d.shutdown()
+    t.join(5)
+
+
+def test_only_batch_reads_stdin():
+    assert cli.client.reads_stdin(["batch"])
+    assert cli.client.reads_stdin(["batch", "-j", "8", "-"])
+    assert not cli.client.reads_stdin(["batch", "-o", "out.jsonl", "in.jsonl"])
+    assert not cli.client.reads_stdin(["-p", "x", "hello"])
+
+
+def test_prompt_leaves_stdin_for_the_next_command(daemon, temp_db, monkeypatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b"two\nthree\n"))
+    monkeypatch.setattr("sys.stdin", stdin)
+    assert cli.client.main(["-p", "x", "one"]) == 0
+    assert stdin.readline() == "two\n"
+
+
+def test_lock_key_and_cwd_detection():
+    projects = {"abc": "research"}.get
+    assert lock_key(["-c", "abc", "hi"], projects) == ("project", "research")
+    assert lock_key(["--chat=abc", "hi"], projects) == ("project", "research")
+    assert lock_key(["-c", "gone", "hi"], projects) == ("project", "default")
+    assert lock_key(["-p", "research", "hi"]) == ("project", "research")
+    assert lock_key(["hi"]) == lock_key(["-p", "default", "hi"]) == ("project", "default")
+    assert needs_cwd(["-f", "review", "0-2"])
+    assert needs_cwd(["--attach=app.log", "why"])
+    assert not needs_cwd(["hello"])
+
+
+def test_client_runs_prompt_in_daemon(daemon, temp_db, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(b"")))
+    assert cli.client.main(["-p", "proj", "hello daemon"]) == 0
+    out = capsys.readouterr().out
+    assert "fake response" in out
+
+    assert cli.client.main(["--list-projects"]) == 0
+    assert "proj" in capsys.readouterr().out
+
+    # piped stdin reaches the command
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(b'{"prompt": "q", "id": "x"}\n')))
+    assert cli.client.main(["batch", "--new-chat"]) == 0
+    assert '"id": "x"' in capsys.readouterr().out
+
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(b"")))
+    # a request that needs the menu is refused rather than hanging
+    assert cli.client.main([]) == cli.main.NEEDS_TTY
+
+
+def test_client_falls_back_without_daemon(temp_db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_SOCKET", str(tmp_path / "missing.sock"))
+    assert cli.client.main(["--list-projects"]) == 0
+
+
+def test_requests_for_one_chat_are_serialized(daemon, temp_db, monkeypatch):
+    active = {"now": 0, "peak": 0}
+    guard = threading.Lock()
+
+    def slow_reply(self, prompt):
+        with guard:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.1)
+        with guard:
+            active["now"] -= 1
+        return "answer"
+
+    monkeypatch.setattr(FakeBackend, "_reply", slow_reply)
+
+    def ask(argv, results):
+        out = io.StringIO()
+        results.append(daemon.run(argv, None, "", out, io.StringIO()))
+
+    def run_all(argvs):
+        results = []
+        threads = [threading.Thread(target=ask, args=(a, results)) for a in argvs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        return results
+
+    assert run_all([["-p", "same", f"q{i}"] for i in range(3)]) == [0, 0, 0]
+    assert active["peak"] == 1
+
+    active["peak"] = 0
+    assert run_all([["-p", f"proj{i}", "q"] for i in range(3)]) == [0, 0, 0]
+    assert active["peak"] > 1
+
+    chat_id = temp_db.connect().execute(
+        "SELECT c.id FROM chats c JOIN projects p ON c.project_id = p.id WHERE p.name = 'same'"
+    ).fetchone()["id"]
+    msgs = MessageService(temp_db).get_messages(chat_id)
+    assert [m["role"] for m in msgs] == ["user", "assistant"] * 3
+
+
+def test_explicit_chat_shares_the_lock_of_its_project(daemon, temp_db):
+    assert daemon.run(["hi"], None, "", io.StringIO(), io.StringIO()) == 0
+    chat_id = temp_db.connect().execute("SELECT id FROM chats").fetchone()["id"]
+
+    assert lock_key(["-c", chat_id, "q"], daemon._chat_project) == lock_key(["q"])
+
+
+def test_socket_is_private_from_the_start(daemon):
+    assert stat.S_IMODE(os.stat(daemon.path).st_mode) == 0o600
@@ -1,3 +1,4 @@
+import pytest
 import os
 import tempfile
 from core.db.database import Database, init_db
@@ -33,3 +34,132 @@ def test_init_db_creates_file_and_tables():
 
         assert expected.issubset(tables)
         conn.close()
+
+
+def test_connect_reuses_pooled_connection(temp_db):
+    conn = temp_db.connect()
+    conn.close()
+
+    # close() only releases; the same handle comes back and is still usable
+    again = temp_db.connect()
+    assert again is conn
+    assert again.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_pooled_connection_pragmas(temp_db):
+    conn = temp_db.connect()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+
+def test_release_rolls_back_uncommitted_work(temp_db):
+    conn = temp_db.connect()
+    conn.execute("INSERT INTO settings(key, value) VALUES ('k', 'v')")
+    conn.close()
+
+    row = temp_db.connect().execute(
+        "SELECT value FROM settings WHERE key = 'k'"
+    ).fetchone()
+    assert row is None
+
+
+def test_connections_are_per_thread(temp_db):
+    import threading
+
+    main_conn = temp_db.connect()
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(temp_db.connect()))
+    t.start()
+    t.join()
+
+    assert seen and seen[0] is not main_conn
+
+
+def test_init_db_records_schema_version(temp_db):
+    from core.db.database import load_migrations
+
+    latest = load_migrations()[-1][0]
+    conn = temp_db.connect()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+
+
+def test_hot_queries_use_indexes(temp_db):
+    conn = temp_db.connect()
+
+    def plan(sql, params):
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        return " ".join(r["detail"] for r in rows)
+
+    assert "idx_messages_chat_id" in plan(
+        "SELECT role, content, ts FROM messages WHERE chat_id = ? "
+        "ORDER BY id DESC LIMIT 20", ("c",)
+    )
+    assert "idx_chats_project_last_used" in plan(
+        "SELECT id FROM chats WHERE project_id = ? "
+        "ORDER BY last_used DESC LIMIT 1", (1,)
+    )
+    assert "idx_project_summaries_name_created" in plan(
+        "SELECT summary FROM project_summaries WHERE project_name = ? "
+        "ORDER BY created_at DESC LIMIT 1", ("p",)
+    )
+
+
+def test_migrate_applies_only_pending_blocks(tmp_path):
+    import sqlite3
+    from core.db.database import migrate
+
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    v1 = [(1, "CREATE TABLE t (a INTEGER);")]
+    assert migrate(conn, v1) == 1
+
+    # a second run must not re-apply block 1 (it would fail: table exists)
+    v2 = v1 + [(2, "ALTER TABLE t ADD COLUMN b TEXT;")]
+    assert migrate(conn, v2) == 2
+    assert migrate(conn, v2) == 2
+
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(t)")]
+    assert cols == ["a", "b"]
+    conn.close()
+
+
+def test_failed_migration_leaves_version_untouched(tmp_path):
+    import sqlite3
+    import pytest
+    from core.db.database import migrate
+
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    broken = [(1, "CREATE TABLE t (a INTEGER);\nINSERT INTO nope VALUES (1);")]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, broken)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchall()
+    assert tables == []
+    conn.close()
+
+
+def _setting_keys(db):
+    return [r["key"] for r in db.connect().execute("SELECT key FROM settings ORDER BY key")]
+
+
+def test_transaction_groups_service_commits(temp_db):
+    from core.services.settings_service import SettingsService
+
+    settings = SettingsService(temp_db)
+    with pytest.raises(RuntimeError):
+        with temp_db.transaction():
+            settings.set("a", "1")   # commits and releases internally
+            settings.set("b", "2")
+            raise RuntimeError("model call failed")
+    assert _setting_keys(temp_db) == []
+
+    with temp_db.transaction():
+        settings.set("a", "1")
+        with pytest.raises(ValueError):
+            with temp_db.transaction():   # savepoint: only this part is undone
+                settings.set("b", "2")
+                raise ValueError
+        settings.set("c", "3")
+    assert _setting_keys(temp_db) == ["a", "c"]
+    assert not temp_db.connect().in_transaction
@@ -0,0 +1,238 @@
+import json
+
+from core.services.chat_service import ChatService
+from core.services.job_service import JobService
+from core.services.llm_backends import FakeBackend
+from core.services.llm_service import LLMService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.settings_service import SettingsService
+from core.services.distill_policy import DistillPolicy
+from runners import distill
+
+
+def _summaries_llm():
+    combined = json.dumps({"chat_summary": "chat sum", "project_summary": "project sum"})
+
+    def reply(prompt):
+        if "CHAT SUMMARIES:" in prompt:
+            return "project rollup"
+        if "JSON" in prompt:
+            return combined
+        return "chat only sum"
+
+    backend = FakeBackend(reply=reply)
+    return LLMService(backend=backend), backend
+
+
+def _chat_with_messages(db, project="proj"):
+    csvc = ChatService(db)
+    chat_id = csvc.force_new_chat(ProjectService(db).get_or_create(project))
+    msvc = MessageService(db)
+    msvc.add_message(chat_id, "user", "question")
+    msvc.add_message(chat_id, "assistant", "answer")
+    return chat_id
+
+
+def test_worker_drains_queue_in_one_batch_per_project(temp_db):
+    # every new message is worth a run
+    DistillPolicy(0, 0, 0, 0).save(SettingsService(temp_db))
+    c1 = _chat_with_messages(temp_db)
+    c2 = _chat_with_messages(temp_db)
+    jobs = JobService(temp_db)
+    for chat_id in (c1, c1, c2):
+        jobs.enqueue(distill.JOB_KIND, "proj", chat_id)
+
+    llm, backend = _summaries_llm()
+    processed = distill.run_worker(temp_db.db_path, idle_timeout=0.01, llm=llm)
+
+    assert processed == 1
+    # one call per chat, then a single project rollup over both summaries
+    assert len(backend.prompts) == 3
+    assert ProjectService(temp_db).get_distilled_project("proj") == "project rollup"
+    assert ChatService(temp_db).get_distilled_chat(c1) == "chat only sum"
+    assert ChatService(temp_db).get_distilled_chat(c2) == "chat only sum"
+
+    statuses = [
+        r["status"] for r in
+        temp_db.connect().execute("SELECT status FROM jobs ORDER BY id")
+    ]
+    assert statuses == ["done", "merged", "merged"]
+
+
+def test_worker_exits_when_lock_is_held(temp_db):
+    held = distill._try_lock(distill.lock_path(temp_db.db_path))
+    try:
+        assert distill.worker_running(temp_db.db_path)
+        llm, _ = _summaries_llm()
+        assert distill.run_worker(temp_db.db_path, idle_timeout=0.01, llm=llm) == 0
+    finally:
+        held.close()
+
+    assert not distill.worker_running(temp_db.db_path)
+
+
+def test_worker_skips_chats_below_policy_thresholds(temp_db):
+    chat_id = _chat_with_messages(temp_db)
+    JobService(temp_db).enqueue(distill.JOB_KIND, "proj", chat_id)
+
+    llm, backend = _summaries_llm()
+    assert distill.run_worker(temp_db.db_path, idle_timeout=0.01, llm=llm) == 1
+
+    assert backend.prompts == []
+    row = temp_db.connect().execute(
+        "SELECT decision, reason FROM distill_decisions WHERE chat_id = ?",
+        (chat_id,)
+    ).fetchone()
+    assert row["decision"] == "skip"
+    assert row["reason"] == "below thresholds"
+
+
+def test_idle_worker_requeues_a_skipped_chat_after_its_interval(temp_db):
+    DistillPolicy(min_chars=10 ** 6, min_tokens=0, min_turns=0, max_interval_s=60).save(
+        SettingsService(temp_db))
+    chat_id = _chat_with_messages(temp_db)
+    jobs = JobService(temp_db)
+    jobs.enqueue(distill.JOB_KIND, "proj", chat_id)
+    llm, backend = _summaries_llm()
+    assert distill.run_job(temp_db, jobs, llm)
+    assert backend.prompts == []
+
+    conn = temp_db.connect()
+    conn.execute("UPDATE distill_decisions SET created_at = '2000-01-01T00:00:00Z'")
+    conn.execute("UPDATE messages SET ts = '2000-01-01T00:00:00Z'")
+    conn.commit()
+
+    while distill.run_job(temp_db, jobs, llm):
+        pass
+    assert ChatService(temp_db).get_distilled_chat(chat_id) == "chat only sum"
+
+
+def test_chat_distillation_is_incremental(temp_db):
+    chat_id = _chat_with_messages(temp_db)
+    llm, backend = _summaries_llm()
+
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+    summary, upto = ChatService(temp_db).get_chat_summary_state(chat_id)
+    assert summary == "chat only sum"
+    assert upto > 0
+
+    # nothing new since the watermark: no LLM call at all
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+    assert len(backend.prompts) == 1
+
+    MessageService(temp_db).add_message(chat_id, "user", "follow-up")
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+
+    prompt = backend.prompts[-1]
+    assert "EXISTING SUMMARY:\nchat only sum" in prompt
+    assert "follow-up" in prompt
+    assert "question" not in prompt  # already covered by the previous summary
+    assert ChatService(temp_db).get_chat_summary_state(chat_id)[1] > upto
+
+
+def test_reset_chat_drops_chat_summaries(temp_db):
+    chat_id = _chat_with_messages(temp_db)
+    csvc = ChatService(temp_db)
+    csvc.add_chat_summary(chat_id, "old", 2)
+
+    csvc.reset_chat(chat_id)
+
+    assert csvc.get_chat_summary_state(chat_id) == ("", 0)
+    assert csvc.get_distilled_chat(chat_id) == ""
+
+
+def test_project_rollup_uses_chat_summaries_and_previous_summary(temp_db):
+    c1 = _chat_with_messages(temp_db)
+    c2 = _chat_with_messages(temp_db)
+    csvc = ChatService(temp_db)
+    csvc.add_chat_summary(c1, "first chat summary", 2)
+    ProjectService(temp_db).add_project_summary("proj", "old project summary")
+    llm, backend = _summaries_llm()
+
+    distill.distill(temp_db, "proj", c2, llm)
+
+    rollup = backend.prompts[-1]
+    assert "PREVIOUS PROJECT SUMMARY:\nold project summary" in rollup
+    assert "first chat summary" in rollup
+    assert "chat only sum" in rollup  # c2's fresh summary
+    assert "question" not in rollup   # no raw messages
+    assert ProjectService(temp_db).get_distilled_project("proj") == "project rollup"
+
+
+def test_messages_mode_uses_bounded_raw_messages(temp_db):
+    chat_id = _chat_with_messages(temp_db)
+    SettingsService(temp_db).set("distill.project_mode", "messages")
+    llm, backend = _summaries_llm()
+
+    distill.distill(temp_db, "proj", chat_id, llm, mode=distill.project_mode(temp_db))
+
+    assert len(backend.prompts) == 1
+    assert "PROJECT (recent project messages)" in backend.prompts[0]
+    assert ProjectService(temp_db).get_distilled_project("proj") == "project sum"
+
+
+def test_backlog_is_summarized_oldest_first_in_chunks(temp_db, monkeypatch):
+    monkeypatch.setattr(distill, "CHUNK_MESSAGES", 2)
+    chat_id = _chat_with_messages(temp_db)
+    msvc = MessageService(temp_db)
+    for text in ("third", "fourth", "fifth"):
+        msvc.add_message(chat_id, "user", text)
+    llm, backend = _summaries_llm()
+
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+
+    assert len(backend.prompts) == 3
+    assert "question" in backend.prompts[0] and "third" not in backend.prompts[0]
+    assert "EXISTING SUMMARY:\nchat only sum" in backend.prompts[2]
+    assert "fifth" in backend.prompts[2]
+    last_id = msvc.messages_after(chat_id, 0, limit=10)[-1]["id"]
+    assert ChatService(temp_db).get_chat_summary_state(chat_id)[1] == last_id
+
+
+def test_long_backlog_is_split_across_jobs(temp_db, monkeypatch):
+    monkeypatch.setattr(distill, "CHUNK_MESSAGES", 2)
+    monkeypatch.setattr(distill, "BACKLOG_CHUNKS", 1)
+    DistillPolicy(min_chars=10 ** 6, min_tokens=0, min_turns=0, max_interval_s=0).save(
+        SettingsService(temp_db))
+    chat_id = _chat_with_messages(temp_db)
+    msvc = MessageService(temp_db)
+    for text in ("third", "fourth", "fifth", "sixth", "seventh"):
+        msvc.add_message(chat_id, "user", text)
+    llm, backend = _summaries_llm()
+    jobs = JobService(temp_db)
+
+    # the first run is forced; the backlog then keeps the chat due
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+    assert len(backend.prompts) == 1
+    assert jobs.pending_count(distill.JOB_KIND) == 1
+    DistillPolicy.record(temp_db, chat_id, "proj",
+                         DistillPolicy(0, 0, 0, 0).evaluate(temp_db, chat_id))
+
+    while distill.run_job(temp_db, jobs, llm) and jobs.pending_count(distill.JOB_KIND):
+        pass
+    last_id = msvc.messages_after(chat_id, 0, limit=10)[-1]["id"]
+    assert ChatService(temp_db).get_chat_summary_state(chat_id)[1] == last_id
+    # one chunk per job (2 + 2 + 2 + 1 messages), then the project rollup
+    chat_prompts = [p for p in backend.prompts if "CHAT SUMMARIES:" not in p]
+    assert len(chat_prompts) == 4
+
+
+def test_first_distill_starts_from_the_legacy_summary(temp_db):
+    chat_id = _chat_with_messages(temp_db)
+    conn = temp_db.connect()
+    conn.execute(
+        "INSERT INTO distilled(project_name, chat_id, summary, created_at) "
+        "VALUES ('proj', ?, 'legacy sum', '2999-01-01T00:00:00Z')",
+        (chat_id,)
+    )
+    conn.commit()
+    MessageService(temp_db).add_message(chat_id, "user", "newer")
+    conn.execute("UPDATE messages SET ts = '3000-01-01T00:00:00Z' WHERE content = 'newer'")
+    conn.commit()
+    llm, backend = _summaries_llm()
+
+    distill.distill(temp_db, "proj", chat_id, llm, with_project=False)
+
+    assert "EXISTING SUMMARY:\nlegacy sum" in backend.prompts[0]
+    assert "newer" in backend.prompts[0] and "question" not in backend.prompts[0]
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, UTC
+
+from core.services.archive_service import ArchiveService
+from core.services.chat_service import ChatService
+from core.services.distill_policy import DistillPolicy
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.settings_service import SettingsService
+
+
+def _chat(db):
+    return ChatService(db).force_new_chat(ProjectService(db).get_or_create("p"))
+
+
+def test_policy_round_trips_through_settings(temp_db):
+    settings = SettingsService(temp_db)
+    DistillPolicy(min_chars=10, min_tokens=0, min_turns=2, max_interval_s=60).save(settings)
+    settings.set("distill.min_tokens", "not a number")
+
+    policy = DistillPolicy.from_settings(settings)
+    assert (policy.min_chars, policy.min_tokens, policy.min_turns, policy.max_interval_s) == (10, 0, 2, 60)
+
+
+def test_skips_until_threshold_then_measures_from_last_run(temp_db):
+    chat_id = _chat(temp_db)
+    msvc = MessageService(temp_db)
+    policy = DistillPolicy(min_chars=20, min_tokens=0, min_turns=0, max_interval_s=0)
+
+    assert policy.evaluate(temp_db, chat_id).reason == "no new messages"
+
+    msvc.add_message(chat_id, "user", "short")
+    assert not policy.evaluate(temp_db, chat_id).run
+
+    msvc.add_message(chat_id, "assistant", "a considerably longer reply")
+    decision = policy.evaluate(temp_db, chat_id)
+    assert decision.run
+    assert decision.new_chars == len("short") + len("a considerably longer reply")
+    DistillPolicy.record(temp_db, chat_id, "p", decision)
+
+    # content before the recorded run no longer counts
+    msvc.add_message(chat_id, "user", "ok")
+    decision = policy.evaluate(temp_db, chat_id)
+    assert not decision.run
+    assert decision.new_chars == 2
+
+
+def test_turn_and_interval_thresholds(temp_db):
+    chat_id = _chat(temp_db)
+    msvc = MessageService(temp_db)
+    msvc.add_message(chat_id, "user", "a")
+    msvc.add_message(chat_id, "user", "b")
+
+    by_turns = DistillPolicy(min_chars=0, min_tokens=0, min_turns=2, max_interval_s=0)
+    assert by_turns.evaluate(temp_db, chat_id).run
+
+    by_time = DistillPolicy(min_chars=0, min_tokens=0, min_turns=0, max_interval_s=600)
+    assert not by_time.evaluate(temp_db, chat_id).run
+    later = datetime.now(UTC) + timedelta(seconds=601)
+    assert by_time.evaluate(temp_db, chat_id, now=later).run
+
+
+def test_no_thresholds_runs_on_any_new_message(temp_db):
+    chat_id = _chat(temp_db)
+    MessageService(temp_db).add_message(chat_id, "user", "x")
+
+    assert DistillPolicy(0, 0, 0, 0).evaluate(temp_db, chat_id).run
+
+
+def test_stale_skips_come_back_once_their_interval_elapses(temp_db):
+    policy = DistillPolicy(min_chars=10 ** 6, min_tokens=0, min_turns=0, max_interval_s=600)
+    waiting, empty = _chat(temp_db), _chat(temp_db)
+    MessageService(temp_db).add_message(waiting, "user", "hello")
+    for chat_id in (waiting, empty):
+        DistillPolicy.record(temp_db, chat_id, "p", policy.evaluate(temp_db, chat_id))
+
+    assert policy.stale_skips(temp_db) == []
+    later = datetime.now(UTC) + timedelta(seconds=601)
+    assert policy.stale_skips(temp_db, now=later) == [(waiting, "p")]
+    assert policy.stale_skips(temp_db, now=later) == []  # each skip is looked at once
+    assert policy.evaluate(temp_db, waiting, now=later).run
+
+
+def test_reset_and_archive_forget_the_watermark(temp_db, tmp_path):
+    chat_id = _chat(temp_db)
+    msvc = MessageService(temp_db)
+    policy = DistillPolicy(0, 0, 0, 0)
+    msvc.add_message(chat_id, "user", "x")
+    DistillPolicy.record(temp_db, chat_id, "p", policy.evaluate(temp_db, chat_id))
+
+    ChatService(temp_db).reset_chat(chat_id)
+    msvc.add_message(chat_id, "user", "y")
+    assert policy.evaluate(temp_db, chat_id).run
+
+    DistillPolicy.record(temp_db, chat_id, "p", policy.evaluate(temp_db, chat_id))
+    archive = ArchiveService(temp_db, str(tmp_path / "archive.db"))
+    archive.archive_chat(chat_id)
+    archive.ensure_hot(chat_id)
+    assert policy.evaluate(temp_db, chat_id).run
@@ -0,0 +1,165 @@
+import sys
+
+import pytest
+
+from core.services.chat_service import ChatService
+from core.services.context_service import ContextAssembler
+import core.services.embedding_service as embedding_service
+from core.services.embedding_service import DIM, EmbeddingService, embed
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+
+
+def _chat(db, project="p"):
+    return ChatService(db).force_new_chat(ProjectService(db).get_or_create(project))
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_embed_is_stable_and_normalized():
+    a = embed("Postgres connection pooling with pgbouncer")
+    assert len(a) == DIM
+    assert a == embed("postgres connection POOLING with pgbouncer")
+    assert _cosine(a, a) == pytest.approx(1.0, abs=1e-5)
+    assert _cosine(a, embed("pgbouncer pooling for postgres")) > _cosine(a, embed("baking sourdough bread"))
+    assert not any(embed(""))
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_related_finds_similar_messages_in_project(temp_db, monkeypatch, with_numpy):
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setitem(sys.modules, "numpy", None)
+
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "our redis cache evicts keys too early")
+    msvc.add_message(chat_id, "assistant", "raise maxmemory and use allkeys-lru for the redis cache")
+    msvc.add_message(chat_id, "user", "what should I cook tonight")
+    msvc.add_message(_chat(temp_db, "other"), "user", "redis cache evicts keys")
+
+    hits = EmbeddingService(temp_db).related("p", "redis cache eviction", k=2)
+
+    assert len(hits) == 2
+    assert all("redis" in h.text for h in hits)
+    assert all(h.chat_id == chat_id for h in hits)
+    assert hits[0].score >= hits[1].score
+
+
+def test_related_skips_excluded_texts(temp_db):
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "kubernetes pod restarts")
+    msvc.add_message(chat_id, "user", "kubernetes pod crash loop")
+
+    hits = EmbeddingService(temp_db).related(
+        "p", "kubernetes pod", exclude=["kubernetes pod restarts"]
+    )
+
+    assert [h.text for h in hits] == ["kubernetes pod crash loop"]
+
+
+def test_related_keeps_up_with_writes_and_deletes(temp_db):
+    msvc, svc = MessageService(temp_db), EmbeddingService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "ansible playbook for nginx")
+    assert len(svc.related("p", "ansible playbook")) == 1
+
+    other = _chat(temp_db)
+    msvc.add_message(other, "user", "ansible playbook inventory")
+    assert len(svc.related("p", "ansible playbook")) == 2
+
+    ChatService(temp_db).reset_chat(chat_id)
+    assert [h.chat_id for h in svc.related("p", "ansible playbook")] == [other]
+    project_id = temp_db.connect().execute("SELECT id FROM projects WHERE name = 'p'").fetchone()[0]
+    assert len(embedding_service._project_vectors(temp_db.db_path, project_id).keys) == 1
+
+
+def test_plain_scoring_looks_at_newest_vectors_only(temp_db, monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.setattr(embedding_service, "MAX_PLAIN_CANDIDATES", 1)
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "helm chart values")
+    msvc.add_message(chat_id, "user", "helm chart upgrade")
+
+    hits = EmbeddingService(temp_db).related("p", "helm chart")
+    assert [h.text for h in hits] == ["helm chart upgrade"]
+
+
+def test_only_latest_chat_summary_is_indexed_and_reset_clears(temp_db):
+    csvc = ChatService(temp_db)
+    chat_id = _chat(temp_db)
+    csvc.add_chat_summary(chat_id, "terraform state migration plan", 1)
+    csvc.add_chat_summary(chat_id, "terraform state migration done", 2)
+
+    svc = EmbeddingService(temp_db)
+    hits = svc.related("p", "terraform state migration")
+    assert [(h.role, h.text) for h in hits] == [("summary", "terraform state migration done")]
+
+    csvc.reset_chat(chat_id)
+    assert svc.related("p", "terraform state migration") == []
+
+
+def test_index_missing_backfills(temp_db):
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "grafana dashboard for latency")
+    conn = temp_db.connect()
+    conn.execute("DELETE FROM embeddings")
+    conn.commit()
+    conn.close()
+
+    svc = EmbeddingService(temp_db)
+    assert svc.related("p", "grafana latency dashboard") == []
+    assert svc.index_missing() == 1
+    assert svc.index_missing() == 0
+    assert len(svc.related("p", "grafana latency dashboard")) == 1
+
+
+def test_index_missing_walks_messages_from_a_mark(temp_db):
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    ids = [msvc.add_message(chat_id, "user", text) for text in ("one", "two", "three")]
+    conn = temp_db.connect()
+    conn.execute("DELETE FROM embeddings WHERE source_id != ?", (ids[1],))
+    conn.commit()
+
+    svc = EmbeddingService(temp_db)
+    assert [svc.index_missing(batch=2), svc.index_missing(batch=2)] == [1, 1]
+    mark = conn.execute(
+        "SELECT value FROM settings WHERE key = 'embeddings.backfill_upto'"
+    ).fetchone()[0]
+    assert mark == str(ids[-1])
+    assert svc.index_missing(batch=2) == 0
+
+
+def test_index_missing_finishes_for_messages_without_a_chat_row(temp_db):
+    MessageService(temp_db).add_message("chat-unknown", "user", "orphan text")
+    conn = temp_db.connect()
+    conn.execute("DELETE FROM embeddings")
+    conn.commit()
+
+    svc = EmbeddingService(temp_db)
+    assert svc.index_missing() == 1
+    assert svc.index_missing() == 0
+
+
+def test_assembler_adds_related_context(temp_db):
+    psvc, csvc, msvc = ProjectService(temp_db), ChatService(temp_db), MessageService(temp_db)
+    old_chat = _chat(temp_db)
+    msvc.add_message(old_chat, "assistant", "the nginx upstream timeout is set in proxy_read_timeout")
+    chat_id = _chat(temp_db)
+
+    assembler = ContextAssembler(psvc, csvc, msvc, retriever=EmbeddingService(temp_db))
+    context, _, report = assembler.assemble(
+        "p", chat_id, [("message", "how do I raise the nginx upstream timeout?")],
+        query="how do I raise the nginx upstream timeout?",
+    )
+
+    assert any(part.startswith("[RELATED_CONTEXT]") and "proxy_read_timeout" in part
+               for part in context)
+    assert report.sections["related"] > 0
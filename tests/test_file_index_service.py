@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from core.services import file_index_service
+from core.services.file_index_service import FileIndexService, glob_regex
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    tmp_path = tmp_path / "repo"   # keep the test database out of the tree
+    (tmp_path / ".git").mkdir(parents=True)
+    (tmp_path / ".gitignore").write_text("*.pyc\nbuild/\n/secret.txt\n!keep.pyc\n")
+    for rel in [
+        "b.py", "a.py", "secret.txt", "keep.pyc", "x.pyc",
+        "src/app.py", "src/util.py", "src/cache.pyc", "src/secret.txt",
+        "src/deep/inner.py", "build/out.py", "docs/readme.md",
+    ]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel)
+    (tmp_path / "docs" / ".gitignore").write_text("*.md\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_glob_regex():
+    assert glob_regex("*.py").match("a.py")
+    assert not glob_regex("*.py").match("src/a.py")
+    assert glob_regex("src/**/*.py").match("src/a.py")
+    assert glob_regex("src/**/*.py").match("src/x/y/a.py")
+    assert glob_regex("file[0-9].txt").match("file7.txt")
+
+
+def test_listing_is_sorted_and_walk_respects_gitignore(temp_db, repo):
+    index = FileIndexService(temp_db)
+
+    assert index.list_files() == [".gitignore", "a.py", "b.py", "keep.pyc", "secret.txt", "x.pyc"]
+    assert index.walk() == [
+        ".gitignore", "a.py", "b.py", "docs/.gitignore", "keep.pyc",
+        "src/app.py", "src/deep/inner.py", "src/secret.txt", "src/util.py",
+    ]
+
+
+def test_walk_from_subdirectory_applies_parent_rules(temp_db, repo):
+    assert FileIndexService(temp_db).walk("src") == [
+        "app.py", "deep/inner.py", "secret.txt", "util.py",
+    ]
+
+
+def test_selectors(temp_db, repo):
+    index = FileIndexService(temp_db)
+
+    assert index.select("1-2") == ["a.py", "b.py"]
+    assert index.select("*.py") == ["a.py", "b.py", "src/app.py", "src/deep/inner.py", "src/util.py"]
+    assert index.select("src/*.py") == ["src/app.py", "src/util.py"]
+    assert index.select("src/deep, a.py, 1") == ["src/deep/inner.py", "a.py"]
+    with pytest.raises(ValueError):
+        index.select("*.rs")
+    with pytest.raises(ValueError):
+        index.select("99")
+
+
+def test_cached_listing_skips_scandir_until_directory_changes(temp_db, repo, monkeypatch):
+    FileIndexService(temp_db).walk()
+
+    calls = []
+    real_scandir = os.scandir
+
+    def counting_scandir(path):
+        calls.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(file_index_service.os, "scandir", counting_scandir)
+
+    FileIndexService(temp_db).walk()
+    assert calls == []
+
+    (repo / "src" / "new.py").write_text("new")
+    os.utime(repo / "src", ns=(0, os.stat(repo / "src").st_mtime_ns + 1_000_000))
+    assert "src/new.py" in FileIndexService(temp_db).walk()
+    assert calls == [str(repo / "src")]
@@ -0,0 +1,97 @@
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+from cli.commands.prompt_builder import build_prompt, file_budget
+from core.services.chat_service import ChatService
+from core.services.project_service import ProjectService
+from core.services.settings_service import SettingsService
+from core.utils import ingest
+from core.utils.ingest import BinaryFileError, looks_binary, read_file, read_files, truncate_middle
+
+
+def test_looks_binary():
+    assert not looks_binary(b"")
+    assert not looks_binary("plain text\twith tabs\nand ünïcode\n".encode())
+    assert looks_binary(b"PK\x03\x04\x00\x00")
+    assert looks_binary(bytes(range(1, 32)) * 10)
+
+
+@pytest.mark.parametrize("data", [
+    "".join(f"line {i}\n" for i in range(1000)),
+    "".join(f"line {i}\n" for i in range(1000)).encode(),
+])
+def test_truncate_middle_keeps_head_and_tail_lines(data):
+    out, truncated = truncate_middle(data, 300)
+
+    assert truncated
+    assert out.startswith(data[:7])          # "line 0\n"
+    assert out.endswith(data[-9:])           # "line 999\n"
+    assert (b"omitted" if isinstance(data, bytes) else "omitted") in out
+    assert len(out) < 400
+    assert truncate_middle(data[:100], 300) == (data[:100], False)
+
+
+def test_read_file_maps_large_files_and_hashes_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "MMAP_THRESHOLD", 1024)
+    f = tmp_path / "big.log"
+    body = "".join(f"event {i}\n" for i in range(20000))
+    f.write_text(body)
+
+    data = read_file(str(f), max_bytes=2000)
+
+    assert data.hash == hashlib.sha256(body.encode()).hexdigest()
+    assert data.size == len(body)
+    assert data.truncated
+    assert data.text.startswith("event 0\n")
+    assert data.text.endswith("event 19999\n")
+    assert len(data.text) < 2100
+
+
+def test_read_files_keeps_order_and_reports_errors(tmp_path):
+    paths = []
+    for i in range(12):
+        p = tmp_path / f"f{i}.txt"
+        p.write_text(f"file {i}")
+        paths.append(str(p))
+    (tmp_path / "blob.bin").write_bytes(b"\x00\x01\x02" * 100)
+    paths += [str(tmp_path / "blob.bin"), str(tmp_path / "missing.txt")]
+
+    results = list(read_files(paths, workers=4))
+
+    assert [p for p, _ in results] == paths
+    assert [r.text for _, r in results[:12]] == [f"file {i}" for i in range(12)]
+    assert isinstance(results[12][1], BinaryFileError)
+    assert isinstance(results[13][1], OSError)
+
+
+def test_prompt_skips_binaries_and_caps_total(temp_db, tmp_path):
+    psvc, csvc = ProjectService(temp_db), ChatService(temp_db)
+    project = psvc.get_or_create_default()
+    chat_id = csvc.get_or_create_first(project)
+    settings = SettingsService(temp_db)
+    settings.set("files.max_total_bytes", "3000")
+
+    (tmp_path / "a.txt").write_text("A" * 10000)
+    (tmp_path / "b.txt").write_text("B" * 10000)
+    (tmp_path / "c.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR")
+    args = SimpleNamespace(
+        prompt="compare", filemode=False, selector=None,
+        attach=[str(tmp_path / n) for n in ("a.txt", "b.txt", "c.png")],
+    )
+
+    prompt = build_prompt(args, temp_db, project, chat_id, psvc, csvc, settings=settings)
+
+    assert prompt.count("A") < 1600 and prompt.count("B") < 1600
+    assert prompt.count("omitted") == 2
+    assert "[FILE_SKIPPED]" in prompt and "c.png" in prompt
+
+
+def test_file_budget_follows_context_window():
+    # an unknown window is assumed small rather than given a megabyte
+    assert file_budget(None, None) == (16384 - 4096) * 4 // 2
+    assert file_budget(None, "some-local-model") == (16384 - 4096) * 4 // 2
+    assert file_budget(None, "gemini-2.5-pro") == ingest.MAX_TOTAL_BYTES
+    assert file_budget(None, "gpt-4o") == (128000 - 4096) * 4 // 2
+    assert file_budget(None, "gpt-4") == (8192 - 4096) * 4 // 2
@@ -37,7 +37,7 @@ class FakeConn:
         # SELECT FROM CHATS JOIN PROJECTS
         if "from chats" in sql:
             pname = args[0]
-            found = [c for c in self._chats if c["project"] == pname]
+            found = [{"archived_at": None, **c} for c in self._chats if c["project"] == pname]
             return FakeCursor(found)
 
         return FakeCursor([])
@@ -84,11 +84,20 @@ class FakeChatService:
 
 class FakeMsgService:
     def __init__(self, messages=None):
-        self.messages = messages or []
+        self.messages = [
+            dict(m, id=m.get("id", i + 1)) for i, m in enumerate(messages or [])
+        ]
 
     def get_messages(self, chat_id):
         return self.messages
 
+    def page(self, chat_id, before_id=None, limit=20):
+        rows = [m for m in self.messages if before_id is None or m["id"] < before_id]
+        return list(reversed(rows))[:limit]
+
+    def iter_messages(self, chat_id, page_size=200):
+        yield from self.messages
+
 
 # -------------------------------------------------------------------
 # TEST select_project()
@@ -193,6 +202,26 @@ def test_show_chat_history(capsys):
     assert "Chat History" in out
 
 
+def test_show_chat_history_pages_and_expands(monkeypatch, capsys):
+    msgs = [{"role": "user", "content": f"message {i}", "ts": f"T{i}"} for i in range(25)]
+    msgs[24]["content"] = "long " * 200
+    svc = FakeMsgService(messages=msgs)
+
+    inputs = iter(["e 10", "o", "o", "n", ""])
+    monkeypatch.setattr(builtins, "input", lambda _: next(inputs))
+
+    show_chat_history(svc, "c1", page_size=10)
+
+    out = capsys.readouterr().out
+    first_page = out.split("message 14", 1)[0]
+    assert "message 15" in first_page            # newest page first
+    assert "message 14" not in first_page
+    assert "…" in first_page                     # long message previewed
+    assert ("long " * 200).strip() in out        # ... and expanded with "e 10"
+    assert "message 0" in out                    # oldest page reached
+    assert out.count("message 14") == 2          # back to the middle page
+
+
 # -------------------------------------------------------------------
 # TEST interactive_entry → returns dict for main.py
 # -------------------------------------------------------------------
@@ -0,0 +1,72 @@
+from core.services.job_service import JobService
+
+
+def test_enqueue_and_claim(temp_db):
+    jobs = JobService(temp_db)
+    jid = jobs.enqueue("distill", "proj", "chat-1")
+
+    assert jobs.pending_count("distill") == 1
+    job, chats = jobs.claim("distill")
+
+    assert job["id"] == jid
+    assert chats == ["chat-1"]
+    assert jobs.pending_count() == 0
+
+
+def test_claim_folds_pending_jobs_for_same_project(temp_db):
+    jobs = JobService(temp_db)
+    first = jobs.enqueue("distill", "proj", "chat-1")
+    jobs.enqueue("distill", "proj", "chat-1")
+    jobs.enqueue("distill", "proj", "chat-2")
+    other = jobs.enqueue("distill", "elsewhere", "chat-9")
+
+    job, chats = jobs.claim("distill")
+
+    assert job["id"] == first
+    assert chats == ["chat-1", "chat-2"]
+
+    conn = temp_db.connect()
+    rows = conn.execute("SELECT id, status, merged_into FROM jobs ORDER BY id").fetchall()
+    statuses = {r["id"]: (r["status"], r["merged_into"]) for r in rows}
+    assert statuses[first] == ("running", None)
+    assert statuses[other] == ("pending", None)
+    assert [s for s in statuses.values() if s[0] == "merged"] == [
+        ("merged", first), ("merged", first)
+    ]
+
+
+def test_claim_when_idle(temp_db):
+    assert JobService(temp_db).claim("distill") == (None, [])
+
+
+def test_finish_records_status_and_duration(temp_db):
+    jobs = JobService(temp_db)
+    ok = jobs.enqueue("distill", "p", "c1")
+    jobs.claim("distill")
+    jobs.finish(ok, 12.7)
+
+    bad = jobs.enqueue("distill", "p", "c2")
+    jobs.claim("distill")
+    jobs.finish(bad, 3, error="boom")
+
+    conn = temp_db.connect()
+    rows = {
+        r["id"]: r for r in
+        conn.execute("SELECT id, status, duration_ms, error FROM jobs").fetchall()
+    }
+    assert (rows[ok]["status"], rows[ok]["duration_ms"]) == ("done", 12)
+    assert (rows[bad]["status"], rows[bad]["error"]) == ("failed", "boom")
+
+
+def test_requeue_stale_returns_a_dead_workers_jobs(temp_db):
+    jobs = JobService(temp_db)
+    first = jobs.enqueue("distill", "proj", "chat-1")
+    jobs.enqueue("distill", "proj", "chat-2")
+    jobs.claim("distill")
+
+    assert jobs.requeue_stale("distill") == 0   # recently started: still owned
+    assert jobs.requeue_stale("distill", older_than_s=0) == 1
+
+    assert jobs.pending_count("distill") == 2
+    job, chats = jobs.claim("distill")
+    assert (job["id"], chats) == (first, ["chat-1", "chat-2"])
@@ -0,0 +1,92 @@
+import json
+import sys
+import types
+
+import pytest
+
+from core.services.llm_backends import (
+    FakeBackend,
+    InProcessBackend,
+    LLMBackend,
+    LLMError,
+    SubprocessBackend,
+    get_backend,
+)
+from core.services.llm_service import LLMService
+
+
+def test_get_backend_by_name(monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_BACKEND", raising=False)
+    assert isinstance(get_backend(), SubprocessBackend)
+    assert isinstance(get_backend("fake"), FakeBackend)
+    assert isinstance(get_backend("inprocess"), InProcessBackend)
+
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    assert isinstance(LLMService().backend, FakeBackend)
+
+    with pytest.raises(ValueError):
+        get_backend("nope")
+
+    with pytest.raises(TypeError):
+        LLMBackend()  # stream() is abstract
+
+
+def test_fake_backend_is_deterministic_and_streams():
+    svc = LLMService(backend="fake")
+
+    first = svc.call_prompt("same prompt")
+    second = svc.call_prompt("same prompt")
+
+    assert first == second
+    assert first != svc.call_prompt("other prompt")
+    assert svc.last_metrics.ttft is not None
+    assert len(list(svc.stream_prompt("a b c"))) > 1
+
+
+def test_summaries_work_with_any_backend():
+    reply = json.dumps({"chat_summary": "chat", "project_summary": "project"})
+    backend = FakeBackend(reply=reply)
+    svc = LLMService(backend=backend)
+
+    msgs = [{"role": "user", "content": "hi"}]
+    assert svc.summarize_both(msgs, msgs) == ("chat", "project")
+    assert len(backend.prompts) == 1
+
+
+def test_inprocess_backend_caches_resolved_model(monkeypatch):
+    calls = []
+
+    class FakeModel:
+        def prompt(self, text, stream=True):
+            return iter(["in-", "process"])
+
+    def get_model(name):
+        calls.append(name)
+        return FakeModel()
+
+    fake_llm = types.SimpleNamespace(
+        get_model=get_model, get_default_model=lambda: "default-model"
+    )
+    monkeypatch.setitem(sys.modules, "llm", fake_llm)
+    monkeypatch.setattr(InProcessBackend, "_models", {})
+
+    svc = LLMService(backend=InProcessBackend())
+    assert svc.call_prompt("one") == "in-process"
+    assert LLMService(backend="inprocess").call_prompt("two") == "in-process"
+
+    assert calls == ["default-model"]
+
+
+def test_inprocess_backend_wraps_model_errors(monkeypatch):
+    class BrokenModel:
+        def prompt(self, text, stream=True):
+            raise RuntimeError("quota exceeded")
+
+    fake_llm = types.SimpleNamespace(
+        get_model=lambda name: BrokenModel(), get_default_model=lambda: "m"
+    )
+    monkeypatch.setitem(sys.modules, "llm", fake_llm)
+    monkeypatch.setattr(InProcessBackend, "_models", {})
+
+    with pytest.raises(LLMError, match="quota exceeded"):
+        list(InProcessBackend().stream("x"))
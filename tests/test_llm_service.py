@@ -1,5 +1,6 @@
 from unittest.mock import patch
 from core.services.llm_service import LLMService
+from core.services.response_cache import ResponseCache
 
 def test_llm_service_calls_llm_prompt():
     svc = LLMService()
@@ -8,3 +9,84 @@ def test_llm_service_calls_llm_prompt():
         mock_call.return_value = "ok"
         out = svc.call_prompt("hello")
         assert out == "ok"
+
+
+def _fake_llm(tmp_path, body):
+    script = tmp_path / "llm"
+    script.write_text("#!/bin/sh\ncat >/dev/null\n" + body)
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_stream_prompt_yields_chunks_and_records_metrics(tmp_path):
+    svc = LLMService(_fake_llm(tmp_path, "printf 'hel'; sleep 0.2; printf 'lo'\n"))
+
+    chunks = list(svc.stream_prompt("hello"))
+
+    assert "".join(chunks) == "hello"
+    assert len(chunks) >= 2
+    m = svc.last_metrics
+    assert m.ttft is not None and m.ttft < m.total
+    assert m.chars == 5
+
+
+def test_call_prompt_forwards_chunks(tmp_path):
+    svc = LLMService(_fake_llm(tmp_path, "printf ' answer \\n'\n"))
+    seen = []
+
+    out = svc.call_prompt("q", on_chunk=seen.append)
+
+    assert out == "answer"
+    assert "".join(seen) == " answer \n"
+
+
+def test_call_prompt_reports_failure(tmp_path, capsys):
+    svc = LLMService(_fake_llm(tmp_path, "echo 'no model' >&2; exit 3\n"))
+
+    assert svc.call_prompt("q") is None
+    assert "llm error: no model" in capsys.readouterr().out
+
+
+def test_call_prompt_timeout_kills_process(tmp_path, capsys):
+    svc = LLMService(_fake_llm(tmp_path, "sleep 5\n"))
+
+    assert svc.call_prompt("q", timeout=0.2) is None
+    assert "timed out" in capsys.readouterr().out
+    assert svc.last_metrics.total < 2
+
+
+def test_cache_follows_the_model_llm_actually_uses(tmp_path, temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_MODEL", raising=False)
+    monkeypatch.delenv("LLMCUI_LLM_BACKEND", raising=False)
+    default = tmp_path / "default"
+    default.write_text("model-a")
+    script = tmp_path / "llm"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"if [ \"$1\" = models ]; then cat {default}; exit 0; fi\n"
+        "cat >/dev/null\n"
+        f"if [ \"$2\" = -m ]; then echo \"$3\"; else cat {default}; fi\n"
+    )
+    script.chmod(0o755)
+    svc = LLMService(str(script), cache=ResponseCache(temp_db))
+
+    assert svc.call_prompt("q") == "model-a"
+    default.write_text("model-b")           # `llm models default model-b`
+    assert svc.call_prompt("q") == "model-b"
+    assert not svc.last_metrics.cached
+
+    monkeypatch.setenv("LLMCUI_LLM_MODEL", "model-c")
+    svc = LLMService(str(script), cache=ResponseCache(temp_db))
+    assert svc.call_prompt("q") == "model-c"  # passed as -m
+    assert svc.call_prompt("q") == "model-c"
+    assert svc.last_metrics.cached
+
+
+def test_nothing_is_cached_when_the_model_is_unknown(tmp_path, temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_MODEL", raising=False)
+    svc = LLMService(_fake_llm(tmp_path, "[ \"$1\" = models ] && exit 1\necho hi\n"),
+                     cache=ResponseCache(temp_db))
+
+    svc.call_prompt("q")
+    svc.call_prompt("q")
+    assert not svc.last_metrics.cached
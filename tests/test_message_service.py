@@ -16,3 +16,42 @@ def test_add_and_fetch_messages(temp_db):
     assert len(msgs) == 1
     assert msgs[0]["role"] == "user"
     assert msgs[0]["content"] == "hello world"
+
+
+def test_keyset_pages_and_iteration(temp_db):
+    csvc = ChatService(temp_db)
+    msvc = MessageService(temp_db)
+    chat_id = csvc.get_or_create_first(ProjectService(temp_db).get_or_create_default())
+    for i in range(7):
+        msvc.add_message(chat_id, "user", f"m{i}")
+
+    newest = msvc.page(chat_id, limit=3)
+    older = msvc.page(chat_id, before_id=newest[-1]["id"], limit=3)
+    oldest = msvc.page(chat_id, before_id=older[-1]["id"], limit=3)
+
+    assert [r["content"] for r in newest] == ["m6", "m5", "m4"]
+    assert [r["content"] for r in older] == ["m3", "m2", "m1"]
+    assert [r["content"] for r in oldest] == ["m0"]
+
+    it = msvc.iter_messages(chat_id, page_size=2)
+    assert next(it)["content"] == "m0"
+    assert [r["content"] for r in it] == [f"m{i}" for i in range(1, 7)]
+
+
+def test_views_mark_attached_files(temp_db, tmp_path):
+    from core.services.attachment_service import AttachmentService
+
+    (tmp_path / "app.log").write_text("boom")
+    (tmp_path / "b.py").write_text("x = 1")
+    store = AttachmentService(temp_db)
+    files = [store.add_file(str(tmp_path / "b.py")), store.add_file(str(tmp_path / "app.log"))]
+    msvc = MessageService(temp_db)
+    chat_id = ChatService(temp_db).get_or_create_first(ProjectService(temp_db).get_or_create_default())
+    msvc.add_message(chat_id, "user", "why?", files)
+    msvc.add_message(chat_id, "assistant", "because")
+
+    marked = f"why?\n[attached: {tmp_path / 'b.py'}]\n[attached: {tmp_path / 'app.log'}]"
+    assert msvc.page(chat_id)[-1]["content"] == marked
+    assert [r["content"] for r in msvc.iter_messages(chat_id)] == [marked, "because"]
+    assert msvc.messages_after(chat_id, 0)[0]["content"] == marked
+    assert msvc.get_messages(chat_id)[0]["content"] == "why?"  # the stored text is unchanged
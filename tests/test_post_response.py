@@ -29,7 +29,7 @@ class FakeSettings:
 
 # --- Helpers --------------------------------------------------------
 
-def run_menu(monkeypatch, inputs, db="DB", proj="projA", chat="chat1"):
+def run_menu(monkeypatch, inputs, db="DB", proj="projA", chat="chat1", restored=None):
     """
     Simulates multiple sequential user inputs.
     Each call to ask() returns the next item from inputs.
@@ -53,6 +53,10 @@ def run_menu(monkeypatch, inputs, db="DB", proj="projA", chat="chat1"):
         "cli.interactive.menu.show_chat_history",
         lambda msg_svc, chat: None
     )
+    monkeypatch.setattr(
+        "cli.interactive.menu.restore_chat",
+        lambda db, chat: (restored if restored is not None else []).append(chat)
+    )
 
     return post_response_menu(
         db,
@@ -87,19 +91,23 @@ def test_post_response_pipe_file(monkeypatch, tmp_path):
     result = run_menu(monkeypatch, ["f", str(f), "explain"])
     assert result["interactive_project"] == "projA"
     assert result["interactive_chat"] == "chat1"
-    assert "content123" in result["interactive_prompt"]
-    assert "explain" in result["interactive_prompt"]
+    assert result["interactive_prompt"] == "explain"
+    assert result["interactive_attachments"] == [str(f)]
 
 
 def test_post_response_switch_chat(monkeypatch):
-    result = run_menu(monkeypatch, ["c", "new question"])
+    restored = []
+    result = run_menu(monkeypatch, ["c", "new question"], restored=restored)
+    assert restored == ["chatB"]
     assert result["interactive_project"] == "projA"
     assert result["interactive_chat"] == "chatB"
     assert result["interactive_prompt"] == "new question"
 
 
 def test_post_response_switch_project(monkeypatch):
-    result = run_menu(monkeypatch, ["p", "new prompt"])
+    restored = []
+    result = run_menu(monkeypatch, ["p", "new prompt"], restored=restored)
+    assert restored == ["chatB"]
     assert result["interactive_project"] == "projB"
     assert result["interactive_chat"] == "chatB"
     assert result["interactive_prompt"] == "new prompt"
@@ -10,3 +10,36 @@ def test_create_named_project(temp_db):
     name = "research"
     proj = svc.get_or_create(name)
     assert proj == name
+
+def test_recent_messages_is_bounded_and_chronological(temp_db):
+    from core.services.chat_service import ChatService
+    from core.services.message_service import MessageService
+
+    svc = ProjectService(temp_db)
+    csvc = ChatService(temp_db)
+    msvc = MessageService(temp_db)
+    project = svc.get_or_create("p")
+    a = csvc.force_new_chat(project)
+    b = csvc.force_new_chat(project)
+    for i in range(5):
+        msvc.add_message(a if i % 2 else b, "user", f"m{i}")
+
+    rows = svc.recent_messages("p", limit=3)
+    assert [r["content"] for r in rows] == ["m2", "m3", "m4"]
+
+
+def test_latest_chat_summaries_one_row_per_chat(temp_db):
+    from core.services.chat_service import ChatService
+
+    svc = ProjectService(temp_db)
+    csvc = ChatService(temp_db)
+    project = svc.get_or_create("p")
+    a = csvc.force_new_chat(project)
+    b = csvc.force_new_chat(project)
+    csvc.force_new_chat(project)  # no summary yet → not listed
+    csvc.add_chat_summary(a, "a1", 1)
+    csvc.add_chat_summary(a, "a2", 2)
+    csvc.add_chat_summary(b, "b1", 3)
+
+    rows = svc.latest_chat_summaries("p")
+    assert sorted((r["chat_id"], r["summary"]) for r in rows) == sorted([(a, "a2"), (b, "b1")])
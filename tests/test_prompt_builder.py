@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from cli.commands.prompt_builder import build_prompt, build_prompt_with_report
+from core.services.chat_service import ChatService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.settings_service import SettingsService
+from core.utils import tokens
+
+
+def _args(prompt="what next?"):
+    return SimpleNamespace(prompt=prompt, filemode=False, selector=None)
+
+
+def _setup(db, turns=10):
+    psvc, csvc, msvc = ProjectService(db), ChatService(db), MessageService(db)
+    project = psvc.get_or_create("p")
+    chat_id = csvc.force_new_chat(project)
+    for i in range(turns):
+        msvc.add_message(chat_id, "user" if i % 2 == 0 else "assistant", f"turn {i} " + "x" * 200)
+    psvc.add_project_summary(project, "project summary")
+    csvc.add_chat_summary(chat_id, "chat summary", turns)
+    return project, chat_id, psvc, csvc, msvc
+
+
+def test_prompt_includes_summaries_recent_turns_and_message(temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_MODEL", raising=False)
+    project, chat_id, psvc, csvc, msvc = _setup(temp_db, turns=4)
+
+    prompt, report = build_prompt_with_report(
+        _args(), temp_db, project, chat_id, psvc, csvc, msg_svc=msvc
+    )
+
+    assert prompt.index("[PROJECT_CONTEXT]") < prompt.index("[CHAT_CONTEXT]")
+    assert prompt.index("[RECENT_TURNS]") < prompt.index("### CURRENT_USER_MESSAGE")
+    assert prompt.index("USER: turn 0") < prompt.index("ASSISTANT: turn 3")
+    assert report.turns_included == report.turns_available == 4
+    assert report.used <= report.budget
+
+
+def test_budget_keeps_most_recent_turns(temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_MODEL", raising=False)
+    project, chat_id, psvc, csvc, msvc = _setup(temp_db, turns=10)
+    settings = SettingsService(temp_db)
+    settings.set("context.budget", "400")
+
+    prompt, report = build_prompt_with_report(
+        _args(), temp_db, project, chat_id, psvc, csvc,
+        msg_svc=msvc, settings=settings,
+    )
+
+    assert 0 < report.turns_included < 10
+    assert "turn 9" in prompt
+    assert "turn 0" not in prompt
+    assert report.used <= 400
+    assert "turns" in report.summary()
+
+
+def test_required_parts_survive_a_tiny_budget(temp_db, monkeypatch):
+    monkeypatch.delenv("LLMCUI_LLM_MODEL", raising=False)
+    project, chat_id, psvc, csvc, msvc = _setup(temp_db)
+    settings = SettingsService(temp_db)
+    settings.set("context.budget", "10")
+
+    prompt, report = build_prompt_with_report(
+        _args(), temp_db, project, chat_id, psvc, csvc,
+        msg_svc=msvc, settings=settings,
+    )
+
+    assert "what next?" in prompt
+    assert "RESPONSE_STYLE_GUIDE" in prompt
+    assert "[PROJECT_CONTEXT]" not in prompt
+    assert set(report.dropped) == {"project", "chat", "turns"}
+
+
+def test_build_prompt_without_message_service(temp_db):
+    project, chat_id, psvc, csvc, _ = _setup(temp_db)
+
+    prompt = build_prompt(_args(), temp_db, project, chat_id, psvc, csvc)
+
+    assert "chat summary" in prompt
+    assert "[RECENT_TURNS]" not in prompt
+
+
+def test_context_budget_per_model(temp_db):
+    settings = SettingsService(temp_db)
+    assert tokens.context_budget() == tokens.DEFAULT_CONTEXT_BUDGET
+
+    settings.set("context.budget", "50000")
+    settings.set("context.budget.gpt-4o-mini", "20000")
+    assert tokens.context_budget("gpt-4o-mini", settings) == 20000
+    # capped at the model's window minus the output reserve
+    assert tokens.context_budget("gpt-4", settings) == 8192 - tokens.OUTPUT_RESERVE
+    assert tokens.context_budget("some-local-model", settings) == 50000
+
+
+def test_heuristic_estimator_without_tiktoken(monkeypatch):
+    import sys
+
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    monkeypatch.setattr(tokens, "_encodings", {})
+
+    assert tokens.estimator_name() == "heuristic"
+    assert tokens.estimate_tokens("abcdefgh") == 2
+    assert tokens.estimate_tokens("") == 0
@@ -0,0 +1,79 @@
+import cli.main
+from core.services.llm_backends import FakeBackend
+from core.services.llm_service import LLMService
+from core.services.message_service import MessageService
+from core.services.response_cache import ResponseCache, cache_key
+from core.services.settings_service import SettingsService
+
+
+def test_key_covers_backend_model_prompt_and_options():
+    base = cache_key("fake", "m", "hi")
+    assert base == cache_key("fake", "m", "hi", {})
+    assert len({base, cache_key("fake", "m2", "hi"), cache_key("llm", "m", "hi"),
+                cache_key("fake", "m", "hi!"), cache_key("fake", "m", "hi", {"t": 1})}) == 5
+
+
+def test_get_put_counts_and_lru_eviction(temp_db):
+    cache = ResponseCache(temp_db, max_entries=2)
+    assert cache.get("a") is None
+    cache.put("a", "answer a")
+    cache.put("b", "answer b")
+    assert cache.get("a") == "answer a"     # a is now more recent than b
+    cache.put("c", "answer c")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "answer c"
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 2}
+
+
+def test_expired_entries_are_misses(temp_db):
+    cache = ResponseCache(temp_db, ttl_seconds=-1)
+    cache.put("a", "old")
+    assert cache.get("a") is None
+
+
+def test_llm_service_answers_repeats_from_cache(temp_db):
+    backend = FakeBackend(reply="the answer")
+    llm = LLMService(backend=backend, cache=ResponseCache(temp_db))
+
+    assert llm.call_prompt("q") == "the answer"
+    assert not llm.last_metrics.cached
+    chunks = []
+    assert llm.call_prompt("q", on_chunk=chunks.append) == "the answer"
+    assert llm.last_metrics.cached and chunks == ["the answer"]
+    assert len(backend.prompts) == 1
+
+    assert llm.call_prompt("q", use_cache=False) == "the answer"
+    assert len(backend.prompts) == 2
+
+
+def test_cache_is_opt_in(temp_db, monkeypatch):
+    settings = SettingsService(temp_db)
+    monkeypatch.delenv("LLMCUI_CACHE", raising=False)
+    assert ResponseCache.from_settings(temp_db, settings) is None
+
+    settings.set("cache.enabled", "true")
+    settings.set("cache.max_entries", "7")
+    assert ResponseCache.from_settings(temp_db, settings).max_entries == 7
+
+    monkeypatch.setenv("LLMCUI_CACHE", "0")
+    assert ResponseCache.from_settings(temp_db, settings) is None
+
+
+def test_cached_answers_are_still_stored_as_messages(temp_db, monkeypatch, capsys):
+    monkeypatch.setattr(cli.main, "DB_PATH", temp_db.db_path)
+    monkeypatch.setenv("LLMCUI_LLM_BACKEND", "fake")
+    monkeypatch.setenv("LLMCUI_CACHE", "1")
+    monkeypatch.setattr(FakeBackend, "_reply", lambda self, prompt: "same answer")
+
+    assert cli.main.main(["--new-project", "ci"]) == 0
+    # a fresh chat each time, so the built prompt is identical
+    for _ in range(2):
+        assert cli.main.main(["-p", "ci", "--new-chat"]) == 0
+        chat_id = capsys.readouterr().out.split("Created new chat: ")[-1].strip()
+        assert cli.main.main(["-p", "ci", "-c", chat_id, "ping"]) == 0
+
+    assert "Cached response" in capsys.readouterr().out
+    msgs = MessageService(temp_db).get_messages(chat_id)
+    assert [m["content"] for m in msgs] == ["ping", "same answer"]
+    assert ResponseCache(temp_db).stats()["hits"] == 1
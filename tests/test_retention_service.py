@@ -0,0 +1,90 @@
+from core.services.chat_service import ChatService
+from core.services.project_service import ProjectService
+from core.services.retention_service import RetentionService, SUMMARY_HISTORY
+from core.services.settings_service import SettingsService
+
+
+def _chat(temp_db):
+    return ChatService(temp_db).get_or_create_first(ProjectService(temp_db).get_or_create_default())
+
+
+def _count(temp_db, sql, *params):
+    return temp_db.connect().execute(sql, params).fetchone()[0]
+
+
+def test_chat_summaries_are_bounded_and_deduplicated(temp_db):
+    csvc = ChatService(temp_db)
+    chat_id = _chat(temp_db)
+    for i in range(SUMMARY_HISTORY + 3):
+        csvc.add_chat_summary(chat_id, f"summary {i}", i)
+    last = csvc.add_chat_summary(chat_id, f"summary {SUMMARY_HISTORY + 2}", 99)
+
+    assert _count(temp_db, "SELECT COUNT(*) FROM chat_summaries") == SUMMARY_HISTORY
+    assert csvc.get_chat_summary_state(chat_id) == (f"summary {SUMMARY_HISTORY + 2}", 99)
+    assert _count(temp_db, "SELECT summary_id FROM latest_chat_summary WHERE chat_id = ?", chat_id) == last
+
+
+def test_project_summaries_follow_the_keep_setting(temp_db):
+    SettingsService(temp_db).set("summaries.keep", "2")
+    psvc = ProjectService(temp_db)
+    for text in ("a", "b", "b", "c"):
+        psvc.add_project_summary("default", text)
+
+    assert _count(temp_db, "SELECT COUNT(*) FROM project_summaries") == 2
+    assert psvc.get_distilled_project("default") == "c"
+
+
+def test_compact_cleans_up_existing_history(temp_db):
+    chat_id = _chat(temp_db)
+    conn = temp_db.connect()
+    # history written before retention existed
+    conn.executemany(
+        "INSERT INTO chat_summaries(chat_id, summary, distill_meta, created_at) VALUES (?, ?, ?, ?)",
+        [(chat_id, text, '{"upto_message_id": %d}' % i, f"2024-01-0{i + 1}")
+         for i, text in enumerate(["x", "x", "y", "y", "z", "z", "z"])]
+    )
+    conn.executemany(
+        "INSERT INTO project_summaries(project_name, summary, created_at) VALUES (?, ?, ?)",
+        [("default", f"p{i}", f"2024-01-0{i + 1}") for i in range(8)]
+    )
+    conn.executemany(
+        "INSERT INTO distilled(project_name, chat_id, summary, created_at) VALUES (?, ?, ?, ?)",
+        [("default", chat_id, "old", "2023"), ("default", "chat-legacy", "a", "2023-01"),
+         ("default", "chat-legacy", "b", "2023-02")]
+    )
+    conn.commit()
+
+    deleted = RetentionService(temp_db, keep=2).compact(vacuum=True)
+
+    assert deleted == {"chat_summaries": 5, "project_summaries": 6, "distilled": 2,
+                       "jobs": 0, "distill_decisions": 0}
+    rows = temp_db.connect().execute(
+        "SELECT summary, distill_meta FROM chat_summaries ORDER BY id"
+    ).fetchall()
+    assert [r["summary"] for r in rows] == ["y", "z"]
+    assert ChatService(temp_db).get_chat_summary_state(chat_id) == ("z", 6)
+    assert ProjectService(temp_db).get_distilled_project("default") == "p7"
+    assert ChatService(temp_db).get_distilled_chat("chat-legacy") == "b"
+
+
+def test_prune_history_keeps_open_jobs_and_the_policy_baseline(temp_db):
+    conn = temp_db.connect()
+    old, new = "2024-01-01T00:00:00Z", "2999-01-01T00:00:00Z"
+    conn.executemany(
+        "INSERT INTO jobs(id, kind, status, merged_into, created_at, finished_at) "
+        "VALUES (?, 'distill', ?, ?, ?, ?)",
+        [(1, "done", None, old, old), (2, "failed", None, old, old),
+         (3, "pending", None, old, None), (4, "merged", 3, old, old),
+         (5, "done", None, new, new)]
+    )
+    conn.executemany(
+        "INSERT INTO distill_decisions(chat_id, decision, created_at) VALUES (?, ?, ?)",
+        [("c1", "run", old), ("c1", "skip", old), ("c1", "run", old), ("c2", "skip", old)]
+    )
+    conn.commit()
+
+    assert RetentionService(temp_db).prune_history() == {"jobs": 2, "distill_decisions": 3}
+    assert [r[0] for r in conn.execute("SELECT id FROM jobs ORDER BY id")] == [3, 4, 5]
+    assert [tuple(r) for r in conn.execute("SELECT chat_id, decision FROM distill_decisions")] == [
+        ("c1", "run")
+    ]
@@ -0,0 +1,93 @@
+import sqlite3
+
+from cli.commands.admin import handle_admin_commands
+from core.db.database import Database, init_db, load_migrations, migrate
+from core.services.chat_service import ChatService
+from core.services.message_service import MessageService
+from core.services.project_service import ProjectService
+from core.services.search_service import SearchService, fts_query
+
+
+def _chat(db, project="p"):
+    psvc, csvc = ProjectService(db), ChatService(db)
+    return csvc.force_new_chat(psvc.get_or_create(project))
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query("foo bar") == '"foo" "bar"'
+    assert fts_query('"exact phrase" pre*') == '"exact phrase" "pre"*'
+    assert fts_query('a"b OR c:') == '"a" "b" "OR" "c:"'
+    assert fts_query("   ") == ""
+
+
+def test_search_ranks_and_reports_location(temp_db):
+    msvc = MessageService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "how do I rotate the sqlite wal file?")
+    msvc.add_message(chat_id, "assistant", "wal wal wal: checkpoint the wal with PRAGMA wal_checkpoint")
+    msvc.add_message(chat_id, "user", "unrelated question about tea")
+
+    hits = SearchService(temp_db).search("wal")
+
+    assert [h.role for h in hits] == ["assistant", "user"]
+    assert hits[0].project == "p"
+    assert hits[0].chat_id == chat_id
+    assert hits[0].ts
+    assert "[wal]" in hits[0].snippet
+
+
+def test_search_filters_by_project_and_handles_syntax(temp_db):
+    msvc = MessageService(temp_db)
+    msvc.add_message(_chat(temp_db, "a"), "user", "deploy the widget")
+    msvc.add_message(_chat(temp_db, "b"), "user", "deploy the gadget")
+
+    svc = SearchService(temp_db)
+    assert len(svc.search("deploy")) == 2
+    assert [h.project for h in svc.search("deploy", project="b")] == ["b"]
+    assert svc.search('deploy AND ("') == []  # operators are plain words
+    assert len(svc.search("dep*")) == 2
+
+
+def test_index_follows_deletes(temp_db):
+    msvc, csvc = MessageService(temp_db), ChatService(temp_db)
+    chat_id = _chat(temp_db)
+    msvc.add_message(chat_id, "user", "ephemeral note")
+
+    csvc.reset_chat(chat_id)
+
+    assert SearchService(temp_db).search("ephemeral") == []
+
+
+def test_migration_backfills_existing_messages(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    migrations = load_migrations()
+    migrate(conn, [m for m in migrations if m[0] < 6])
+    conn.execute("INSERT INTO projects(name, created_at) VALUES ('p', 'now')")
+    conn.execute("INSERT INTO chats(id, project_id, title) VALUES ('c', 1, 't')")
+    conn.execute("INSERT INTO messages(chat_id, role, content, ts) VALUES ('c', 'user', 'legacy text', 'now')")
+    conn.commit()
+    conn.close()
+
+    init_db(path)
+    db = Database(path)
+    try:
+        assert [h.chat_id for h in SearchService(db).search("legacy")] == ["c"]
+    finally:
+        db.close()
+
+
+def test_search_command(temp_db, capsys):
+    msvc = MessageService(temp_db)
+    msvc.add_message(_chat(temp_db), "user", "needle in a haystack")
+
+    args = type("Args", (), dict(
+        list_projects=False, list_chats=False, new_project=None,
+        new_chat=False, search="needle", project=None,
+    ))()
+    assert handle_admin_commands(args, temp_db, None, None)
+
+    out = capsys.readouterr().out
+    assert "[needle]" in out
+    assert "p / " in out
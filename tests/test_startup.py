@@ -0,0 +1,100 @@
+"""
+Startup budget for the `ai` entry point.
+
+Shell scripts call `ai` thousands of times a day, so the admin paths must
+not drag in services, menus, the LLM client or subprocess. These tests run
+the CLI in a fresh interpreter and fail when that regresses.
+
+LLMCUI_STARTUP_BUDGET_MS overrides the allowed overhead over a bare
+`python -c pass` (default 100 ms).
+"""
+import os
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must never load on the --list-projects path.
+HEAVY = {
+    "subprocess",
+    "json",
+    "uuid",
+    "shutil",
+    "traceback",
+    "core.services.llm_service",
+    "core.services.message_service",
+    "cli.commands.prompt_builder",
+    "cli.interactive.menu",
+    "cli.interactive.post_response",
+}
+
+
+def _env(tmp_path):
+    env = dict(os.environ)
+    env["HOME"] = str(tmp_path)
+    env.pop("LLMCUI_ROOT", None)
+    env.pop("PYTEST_CURRENT_TEST", None)
+    env["PYTHONPATH"] = REPO
+    return env
+
+
+def _run(args, tmp_path):
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=REPO,
+        env=_env(tmp_path),
+        capture_output=True,
+        text=True,
+    )
+
+
+def _best_of(args, tmp_path, runs=5):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(args, tmp_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _imported_modules(importtime_stderr):
+    mods = set()
+    for line in importtime_stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            mods.add(line.rsplit("|", 1)[1].strip())
+    return mods
+
+
+def test_import_cli_main_is_lean(tmp_path):
+    res = _run(["-X", "importtime", "-c", "import cli.main"], tmp_path)
+    assert res.returncode == 0, res.stderr
+
+    loaded = _imported_modules(res.stderr)
+    assert not (HEAVY & loaded), sorted(HEAVY & loaded)
+
+
+def test_list_projects_path_is_lean(tmp_path):
+    res = _run(["-X", "importtime", "-m", "cli.main", "--list-projects"], tmp_path)
+    assert res.returncode == 0, res.stderr
+    assert "No projects found." in res.stdout
+
+    loaded = _imported_modules(res.stderr)
+    assert not (HEAVY & loaded), sorted(HEAVY & loaded)
+
+
+def test_list_projects_startup_budget(tmp_path):
+    budget = float(os.environ.get("LLMCUI_STARTUP_BUDGET_MS", "100")) / 1000.0
+
+    # warm run creates ~/.llmcui and applies migrations once
+    _run(["-m", "cli.main", "--list-projects"], tmp_path)
+
+    baseline = _best_of(["-c", "pass"], tmp_path)
+    elapsed = _best_of(["-m", "cli.main", "--list-projects"], tmp_path)
+
+    overhead = elapsed - baseline
+    assert overhead < budget, (
+        f"ai --list-projects took {elapsed * 1000:.1f} ms "
+        f"({overhead * 1000:.1f} ms over interpreter start; "
+        f"budget {budget * 1000:.0f} ms)"
+    )